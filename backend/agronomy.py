@@ -0,0 +1,324 @@
+import asyncio
+import warnings
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .history import TIME_ATTRIBUTE, to_utc
+from .observation import Observation
+from .recommendations import document_column
+
+# --- Agronomic Derived Metrics ---
+# Daily growing degree days, FAO-56 reference evapotranspiration, dew point, vapour
+# pressure deficit and rolling temperature extremes over a farm's stored readings.
+#
+# Readings are reduced to one accumulator per UTC day (min/max/sum of the few metrics the
+# formulas need). History is loaded into these accumulators page by page with NumPy
+# (columns parsed once, grouped by day with reduceat), and each new reading from the
+# scheduler only updates the accumulator of its own day. Derived values are cached per day;
+# a new reading invalidates that day and the rolling windows that include it, and the next
+# query recomputes just those days in one vectorized pass. Compacted history (see
+# retention.py) is merged from its hourly/daily rollups, which carry the same min/max/sums.
+#
+# Formulas (FAO Irrigation and Drainage Paper 56):
+#   * saturation vapour pressure e°(T) (eq. 11), actual vapour pressure from RHmin/RHmax (eq. 17)
+#   * dew point from actual vapour pressure (inverse of eq. 14)
+#   * VPD = es - ea (eq. 12 for es)
+#   * ET0 by daily Penman-Monteith (eq. 6). No radiation is measured, so solar radiation is
+#     estimated from the temperature range (Hargreaves, eq. 50) and extraterrestrial radiation
+#     from latitude and day of year (eq. 21); wind is scaled from 10 m to 2 m (eq. 47).
+#   * GDD = max(0, (min(Tmax, cap) + max(Tmin, base)) / 2 - base)
+# All computation is metric; results are converted back to the farm's units.
+
+DAY_FIELDS = ("count", "t_min", "t_max", "t_sum", "rh_min", "rh_max", "rh_sum", "wind_sum", "p_sum", "p_count")
+DERIVED_FIELDS = ("dew_point", "vpd", "et0", "gdd", "t_rolling_min", "t_rolling_max")
+SOLAR_CONSTANT = 0.0820  # MJ m-2 min-1
+KRS = 0.16  # Hargreaves radiation adjustment coefficient for interior locations
+ALBEDO = 0.23
+STANDARD_PRESSURE_KPA = 101.3
+NAT_DAY = np.datetime64("NaT", "D").astype(np.int64)  # Day number of an unparseable timestamp
+
+
+def saturation_vapour_pressure(t: np.ndarray) -> np.ndarray:
+    # kPa, t in °C
+    return 0.6108 * np.exp(17.27 * t / (t + 237.3))
+
+def dew_point(ea: np.ndarray) -> np.ndarray:
+    # °C from actual vapour pressure in kPa
+    log_ea = np.log(ea)
+    return (116.91 + 237.3 * log_ea) / (16.78 - log_ea)
+
+def extraterrestrial_radiation(lat_rad: float, day_of_year: np.ndarray) -> np.ndarray:
+    # Ra in MJ m-2 day-1
+    dr = 1 + 0.033 * np.cos(2 * np.pi / 365 * day_of_year)
+    declination = 0.409 * np.sin(2 * np.pi / 365 * day_of_year - 1.39)
+    ws = np.arccos(np.clip(-np.tan(lat_rad) * np.tan(declination), -1.0, 1.0))
+    return (24 * 60 / np.pi) * SOLAR_CONSTANT * dr * (
+        ws * np.sin(lat_rad) * np.sin(declination) + np.cos(lat_rad) * np.cos(declination) * np.sin(ws)
+    )
+
+def reference_et0(t_min, t_max, rh_min, rh_max, wind_10m, pressure_kpa, lat_rad, day_of_year) -> np.ndarray:
+    # Daily FAO-56 Penman-Monteith ET0 in mm day-1 (soil heat flux G = 0 for daily steps)
+    t_mean = (t_min + t_max) / 2
+    es = (saturation_vapour_pressure(t_max) + saturation_vapour_pressure(t_min)) / 2
+    ea = (saturation_vapour_pressure(t_min) * rh_max / 100 + saturation_vapour_pressure(t_max) * rh_min / 100) / 2
+    delta = 4098 * saturation_vapour_pressure(t_mean) / (t_mean + 237.3) ** 2
+    gamma = 0.000665 * pressure_kpa
+    u2 = wind_10m * 4.87 / np.log(67.8 * 10 - 5.42)
+
+    ra = extraterrestrial_radiation(lat_rad, day_of_year)
+    rs = KRS * np.sqrt(np.maximum(t_max - t_min, 0.0)) * ra
+    rso = 0.75 * ra
+    rns = (1 - ALBEDO) * rs
+    sigma_t4 = 4.903e-9 * ((t_max + 273.16) ** 4 + (t_min + 273.16) ** 4) / 2
+    cloudiness = 1.35 * np.clip(np.divide(rs, rso, out=np.ones_like(rs), where=rso > 0), 0.0, 1.0) - 0.35
+    rnl = sigma_t4 * (0.34 - 0.14 * np.sqrt(np.maximum(ea, 0.0))) * cloudiness
+    rn = rns - rnl
+
+    numerator = 0.408 * delta * rn + gamma * (900 / (t_mean + 273)) * u2 * (es - ea)
+    return np.maximum(numerator / (delta + gamma * (1 + 0.34 * u2)), 0.0)
+
+def growing_degree_days(t_min, t_max, base: float, cap: float) -> np.ndarray:
+    return np.maximum((np.minimum(t_max, cap) + np.maximum(t_min, base)) / 2 - base, 0.0)
+
+
+def to_celsius(values: np.ndarray, units: str) -> np.ndarray:
+    return (values - 32) / 1.8 if units == "imperial" else values
+
+def from_celsius(values: np.ndarray, units: str) -> np.ndarray:
+    return values * 1.8 + 32 if units == "imperial" else values
+
+def to_metres_per_second(values: np.ndarray, units: str) -> np.ndarray:
+    return values * 0.44704 if units == "imperial" else values
+
+def day_number(value: datetime) -> int:
+    # Days since the Unix epoch (UTC)
+    return (to_utc(value).date() - date(1970, 1, 1)).days
+
+
+class FarmSeries:
+    # Daily accumulators and derived-metric cache of one farm
+    def __init__(self, rolling_days: int):
+        self.rolling_days = rolling_days
+        self.days: Dict[int, np.ndarray] = {}  # day number -> accumulator (DAY_FIELDS order)
+        self.derived: Dict[int, Tuple[float, ...]] = {}  # day number -> DERIVED_FIELDS values (metric)
+        self.loaded_from: Optional[int] = None  # First day covered by the history scan
+        self.recent_ids: Dict[str, int] = {}  # ID -> day of the last two days' readings, to skip readings counted twice
+        self.key: Optional[Tuple[float, str]] = None  # (latitude, units) the derived cache was built for
+        self.lock = asyncio.Lock()
+        self.loading = False
+        self.pending: List[Tuple[str, int, Tuple[float, ...]]] = []  # Readings received while loading
+
+    def _invalidate(self, day: int):
+        for affected in range(day, day + self.rolling_days):
+            self.derived.pop(affected, None)
+
+    def add_columns(self, ids: Sequence[str], days: np.ndarray, t: np.ndarray, rh: np.ndarray, wind: np.ndarray, p: np.ndarray,
+                    latest_day: Optional[int] = None):
+        # Merges a page of readings (metric units) into the day accumulators
+        valid = ~(np.isnan(t) | np.isnan(rh) | np.isnan(wind)) & (days != NAT_DAY)
+        if latest_day is not None:
+            for doc_id, day in zip(ids, days.tolist()):
+                if day >= latest_day - 1:
+                    self.recent_ids[doc_id] = day
+        if not valid.any():
+            return
+        days, t, rh, wind, p = days[valid], t[valid], rh[valid], wind[valid], p[valid]
+        order = np.argsort(days, kind="stable")
+        days, t, rh, wind, p = days[order], t[order], rh[order], wind[order], p[order]
+        unique_days, starts = np.unique(days, return_index=True)
+        has_p = ~np.isnan(p)
+        page = np.column_stack([
+            np.add.reduceat(np.ones_like(t), starts),
+            np.minimum.reduceat(t, starts),
+            np.maximum.reduceat(t, starts),
+            np.add.reduceat(t, starts),
+            np.minimum.reduceat(rh, starts),
+            np.maximum.reduceat(rh, starts),
+            np.add.reduceat(rh, starts),
+            np.add.reduceat(wind, starts),
+            np.add.reduceat(np.where(has_p, p, 0.0), starts),
+            np.add.reduceat(has_p.astype(np.float64), starts),
+        ])
+        for day, row in zip(unique_days.tolist(), page):
+            self._merge(day, row)
+
+    def _merge(self, day: int, row: np.ndarray):
+        current = self.days.get(day)
+        if current is None:
+            self.days[day] = row.copy()
+        else:
+            current[0] += row[0]
+            current[1] = min(current[1], row[1])
+            current[2] = max(current[2], row[2])
+            current[3] += row[3]
+            current[4] = min(current[4], row[4])
+            current[5] = max(current[5], row[5])
+            current[6:] += row[6:]
+        self._invalidate(day)
+
+    def add_rollups(self, days: Sequence[int], rows: Sequence[np.ndarray]):
+        # Merges hourly/daily rollups of compacted history, already in accumulator form
+        for day, row in zip(days, rows):
+            self._merge(day, row)
+
+    def add_reading(self, doc_id: str, day: int, values: Tuple[float, ...]):
+        # One new reading (temperature, humidity, wind, pressure; metric)
+        if self.loading:
+            self.pending.append((doc_id, day, values))
+            return
+        if doc_id in self.recent_ids:
+            return
+        if self.recent_ids and day > max(self.recent_ids.values()):
+            self.recent_ids = {i: d for i, d in self.recent_ids.items() if d >= day - 1}
+        self.recent_ids[doc_id] = day
+        t, rh, wind, p = values
+        has_p = p is not None and not np.isnan(p)
+        self._merge(day, np.array([1.0, t, t, t, rh, rh, rh, wind, p if has_p else 0.0, 1.0 if has_p else 0.0]))
+
+    def finish_loading(self):
+        self.loading = False
+        pending, self.pending = self.pending, []
+        for doc_id, day, values in pending:
+            self.add_reading(doc_id, day, values)
+
+    def compute(self, first_day: int, last_day: int, lat: float, units: str, gdd_base_c: float, gdd_cap_c: float) -> List[Dict[str, Any]]:
+        # Daily rows for [first_day, last_day], recomputing only days missing from the cache
+        if self.key != (lat, units):
+            self.derived.clear()
+            self.key = (lat, units)
+        wanted = [day for day in range(first_day, last_day + 1) if day in self.days]
+        missing = [day for day in wanted if day not in self.derived]
+        if missing:
+            self._compute_missing(missing, lat, gdd_base_c, gdd_cap_c)
+
+        # Temperatures (and degree days) go back to the farm's units; ET0 is mm, VPD kPa
+        degree_scale = 1.8 if units == "imperial" else 1.0
+        def finite(value: float) -> Optional[float]:
+            return float(value) if np.isfinite(value) else None
+        def temperature(value: float) -> Optional[float]:
+            return finite(from_celsius(value, units))
+        rows = []
+        gdd_total = 0.0
+        for day in wanted:
+            acc = self.days[day]
+            dew, vpd, et0, gdd, roll_min, roll_max = self.derived[day]
+            gdd_total += gdd * degree_scale
+            rows.append({
+                "date": date(1970, 1, 1) + timedelta(days=day),
+                "readings": int(acc[0]),
+                "temperature_min": temperature(acc[1]),
+                "temperature_max": temperature(acc[2]),
+                "temperature_mean": temperature(acc[3] / acc[0]),
+                "humidity_mean": float(acc[6] / acc[0]),
+                "dew_point": temperature(dew),
+                "vpd": finite(vpd),
+                "et0": finite(et0),
+                "gdd": gdd * degree_scale,
+                "gdd_cumulative": gdd_total,
+                "temperature_rolling_min": temperature(roll_min),
+                "temperature_rolling_max": temperature(roll_max),
+            })
+        return rows
+
+    def _compute_missing(self, missing: List[int], lat: float, gdd_base_c: float, gdd_cap_c: float):
+        # Dense arrays from the first trailing-window day to the last missing day; NaN for
+        # days without readings (they are skipped by the rolling extremes)
+        start = missing[0] - self.rolling_days + 1
+        span = missing[-1] - start + 1
+        dense = np.full((span, len(DAY_FIELDS)), np.nan)
+        for day in range(start, missing[-1] + 1):
+            acc = self.days.get(day)
+            if acc is not None:
+                dense[day - start] = acc
+        count = dense[:, 0]
+        t_min, t_max = dense[:, 1], dense[:, 2]
+        rh_min, rh_max = dense[:, 4], dense[:, 5]
+        wind = dense[:, 7] / count
+        pressure = np.where(dense[:, 9] > 0, dense[:, 8] / np.where(dense[:, 9] > 0, dense[:, 9], 1) / 10, STANDARD_PRESSURE_KPA)
+
+        day_numbers = np.arange(start, missing[-1] + 1)
+        day_of_year = np.array([(date(1970, 1, 1) + timedelta(days=int(d))).timetuple().tm_yday for d in day_numbers])
+        ea = (saturation_vapour_pressure(t_min) * rh_max / 100 + saturation_vapour_pressure(t_max) * rh_min / 100) / 2
+        es = (saturation_vapour_pressure(t_max) + saturation_vapour_pressure(t_min)) / 2
+        with np.errstate(invalid="ignore", divide="ignore"):
+            dew = dew_point(ea)
+            et0 = reference_et0(t_min, t_max, rh_min, rh_max, wind, pressure, np.radians(lat), day_of_year)
+            gdd = growing_degree_days(t_min, t_max, gdd_base_c, gdd_cap_c)
+            windows_min = np.lib.stride_tricks.sliding_window_view(t_min, self.rolling_days)
+            windows_max = np.lib.stride_tricks.sliding_window_view(t_max, self.rolling_days)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)  # All-NaN windows
+                roll_min = np.nanmin(windows_min, axis=1)
+                roll_max = np.nanmax(windows_max, axis=1)
+        offset = self.rolling_days - 1
+        for day in missing:
+            i = day - start
+            self.derived[day] = (
+                float(dew[i]), float(es[i] - ea[i]), float(et0[i]), float(gdd[i]),
+                float(roll_min[i - offset]), float(roll_max[i - offset]),
+            )
+
+
+class AgronomyCache:
+    # Per-farm series, shared by the scheduler (new readings) and the API (queries)
+    def __init__(self, rolling_days: int, gdd_base_c: float, gdd_cap_c: float):
+        self.rolling_days = rolling_days
+        self.gdd_base_c = gdd_base_c
+        self.gdd_cap_c = gdd_cap_c
+        self.farms: Dict[str, FarmSeries] = {}
+
+    def series(self, farm_id: str) -> FarmSeries:
+        series = self.farms.get(farm_id)
+        if series is None:
+            series = FarmSeries(self.rolling_days)
+            self.farms[farm_id] = series
+        return series
+
+    def add_observation(self, farm_id: str, observation: Observation, units: str):
+        # Incremental update from the scheduler; farms nobody has queried yet are skipped
+        series = self.farms.get(farm_id)
+        if series is None or observation.id is None:
+            return
+        values = (
+            float(to_celsius(np.float64(observation.temperature), units)),
+            observation.humidity,
+            float(to_metres_per_second(np.float64(observation.wind_speed), units)),
+            observation.pressure,
+        )
+        series.add_reading(observation.id, day_number(observation.timestamp), values)
+
+    @staticmethod
+    def page_columns(documents: Sequence[Dict[str, Any]], units: str):
+        # Columns (metric units) of a page of stored readings; unparseable values become NaN
+        ids = [doc.get("$id") for doc in documents]
+        # Stored times are UTC ISO strings, so [:10] is the day the reading was observed
+        days = np.array(
+            [(doc.get(TIME_ATTRIBUTE) or doc.get("$createdAt") or "")[:10] or "NaT" for doc in documents], dtype="datetime64[D]"
+        ).astype(np.int64)
+        t = to_celsius(document_column(documents, "temperature"), units)
+        rh = document_column(documents, "humidity")
+        wind = to_metres_per_second(document_column(documents, "wind_speed"), units)
+        p = document_column(documents, "pressure")
+        return ids, days, t, rh, wind, p
+
+    @staticmethod
+    def rollup_rows(documents: Sequence[Dict[str, Any]], units: str):
+        # (days, accumulator rows in metric units) of a page of rollups (see retention.py).
+        # Rollups without temperature, humidity or wind are skipped, like such readings are.
+        days, rows = [], []
+        for doc in documents:
+            count = doc.get("temperature_count") or 0
+            if not count or not doc.get("humidity_count") or not doc.get("wind_speed_count"):
+                continue
+            t_min, t_max, t_mean = (float(to_celsius(np.float64(doc[f"temperature_{key}"]), units)) for key in ("min", "max", "mean"))
+            wind_mean = float(to_metres_per_second(np.float64(doc["wind_speed_mean"]), units))
+            p_count = doc.get("pressure_count") or 0
+            days.append(int(np.datetime64(doc["bucket_start"][:10], "D").astype(np.int64)))
+            rows.append(np.array([
+                count, t_min, t_max, t_mean * count,
+                doc["humidity_min"], doc["humidity_max"], doc["humidity_mean"] * count,
+                wind_mean * count, doc["pressure_mean"] * p_count if p_count else 0.0, p_count,
+            ], dtype=np.float64))
+        return days, rows
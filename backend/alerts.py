@@ -0,0 +1,449 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from fastapi.concurrency import run_in_threadpool
+
+from .config import settings
+from .history import to_utc
+from .localstore import LocalStore
+from .observability import UPSTREAM_SECONDS, timer
+from .snapshot import WeatherSnapshot
+
+logger = logging.getLogger(__name__)
+
+# --- Extreme-Weather Alerts and Daily Reports ---
+# The engine is a snapshot listener: every reading the scheduler publishes updates a few
+# numbers of rolling state per farm and rule, and nothing is re-read from Appwrite.
+#   threshold: value past `trigger` (frost risk);
+#   duration:  value past `trigger` for `seconds`, timer kept through dips that do not
+#              reach `clear` (heat stress, sustained gusts);
+#   rate:      change over roughly `seconds` (falling pressure). Two anchors are kept: the
+#              change is measured against a reading between one and two windows old.
+# An alert is sent once when it triggers and once when it resolves. It resolves only when
+# the value is back past `clear` (hysteresis), and a resolved rule cannot trigger again
+# within ALERT_COOLDOWN_MINUTES, so readings hovering around a threshold do not flap.
+#
+# Each farm also keeps a running aggregate of the current UTC day; the daily-report job
+# sends the completed days. Rules and aggregates work in metric units; messages carry
+# values in the farm's units.
+#
+# Messages go through the outbox: it drops farms that have not opted in
+# (extreme_weather_alerts / daily_report), records each message in the local store
+# under a deterministic ID (so repeats are dropped), and delivers it to the sink in the
+# background, retrying with backoff until the sink accepts it.
+#
+# Only the scheduler leader evaluates readings (see coordination.py). A new leader
+# starts with empty rolling state.
+
+METRIC_UNITS = {"temperature": "°C", "wind_gust": "m/s", "pressure": "hPa"}
+
+
+@dataclass(frozen=True)
+class AlertRule:
+    name: str
+    title: str
+    metric: str  # "temperature" (°C), "wind_gust" (m/s) or "pressure" (hPa)
+    kind: str  # "threshold", "duration" or "rate"
+    direction: str  # "above" or "below"
+    trigger: float
+    clear: float  # An active alert resolves only once the value is back past this
+    seconds: float = 0.0  # duration: how long the condition must hold; rate: window of the change
+
+    def breached(self, value: float) -> bool:
+        return value >= self.trigger if self.direction == "above" else value <= self.trigger
+
+    def recovered(self, value: float) -> bool:
+        return value < self.clear if self.direction == "above" else value > self.clear
+
+
+def default_rules() -> List[AlertRule]:
+    frost = settings.ALERT_FROST_TEMPERATURE_C
+    heat = settings.ALERT_HEAT_TEMPERATURE_C
+    gust = settings.ALERT_GUST_SPEED_MS
+    drop = settings.ALERT_PRESSURE_DROP_HPA
+    return [
+        AlertRule("frost_risk", "Frost risk", "temperature", "threshold", "below", frost, frost + 2.0),
+        AlertRule("heat_stress", "Heat stress", "temperature", "duration", "above", heat, heat - 2.0,
+                  settings.ALERT_HEAT_MINUTES * 60),
+        AlertRule("strong_gusts", "Strong wind gusts", "wind_gust", "duration", "above", gust, gust - 3.0,
+                  settings.ALERT_GUST_MINUTES * 60),
+        AlertRule("pressure_drop", "Rapidly falling pressure", "pressure", "rate", "below", -drop, -drop / 2,
+                  settings.ALERT_PRESSURE_DROP_HOURS * 3600),
+    ]
+
+
+def metric_values(observation, units: str) -> Dict[str, Optional[float]]:
+    # Rule metrics of a reading, converted to metric units
+    imperial = units == "imperial"
+    gust = observation.wind_gust
+    return {
+        "temperature": (observation.temperature - 32) / 1.8 if imperial else observation.temperature,
+        "humidity": observation.humidity,
+        "wind_speed": observation.wind_speed * 0.44704 if imperial else observation.wind_speed,
+        "wind_gust": None if gust is None else (gust * 0.44704 if imperial else gust),
+        "pressure": observation.pressure,
+    }
+
+
+def to_farm_units(metric: str, value: Optional[float], units: str, change: bool = False) -> Optional[float]:
+    # Metric value (or difference, with change=True) in the farm's units
+    if value is None or units != "imperial":
+        return None if value is None else round(value, 2)
+    if metric == "temperature":
+        return round(value * 1.8 + (0 if change else 32), 2)
+    if metric in ("wind_speed", "wind_gust"):
+        return round(value / 0.44704, 2)
+    return round(value, 2)
+
+
+def _iso(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat(timespec="seconds")
+
+
+class _RuleState:
+    __slots__ = ("active", "since", "triggered_at", "cleared_at", "anchor_time", "anchor_value", "next_time", "next_value")
+
+    def __init__(self):
+        self.active = False
+        self.since: Optional[float] = None  # duration: when the condition started to hold
+        self.triggered_at: Optional[float] = None
+        self.cleared_at: Optional[float] = None
+        self.anchor_time: Optional[float] = None  # rate: reading the change is measured against
+        self.anchor_value = 0.0
+        self.next_time: Optional[float] = None  # rate: next anchor, once it is a window old
+        self.next_value = 0.0
+
+    def change(self, value: float, at: float, window: float) -> Optional[float]:
+        # Change per window against a reading one to two windows old; None until one exists
+        if self.next_time is None:
+            self.next_time, self.next_value = at, value
+        elif at - self.next_time >= window:
+            self.anchor_time, self.anchor_value = self.next_time, self.next_value
+            self.next_time, self.next_value = at, value
+        if self.anchor_time is None or at - self.anchor_time > 2 * window:
+            return None
+        return (value - self.anchor_value) * window / (at - self.anchor_time)
+
+
+class DayAggregate:
+    # Running summary of one farm's UTC day (metric units)
+    __slots__ = ("day", "units", "count", "t_min", "t_max", "t_sum", "rh_min", "rh_max", "rh_sum",
+                 "wind_max", "gust_max", "p_min", "p_max", "alerts")
+
+    def __init__(self, day: date, units: str):
+        self.day = day
+        self.units = units
+        self.count = 0
+        self.t_min = self.t_max = self.rh_min = self.rh_max = None
+        self.t_sum = self.rh_sum = 0.0
+        self.wind_max = self.gust_max = self.p_min = self.p_max = None
+        self.alerts = 0  # Alerts triggered during the day
+
+    def add(self, values: Dict[str, Optional[float]], units: str):
+        t, rh, wind, gust, p = (values[k] for k in ("temperature", "humidity", "wind_speed", "wind_gust", "pressure"))
+        self.units = units
+        self.count += 1
+        self.t_min = t if self.t_min is None else min(self.t_min, t)
+        self.t_max = t if self.t_max is None else max(self.t_max, t)
+        self.t_sum += t
+        self.rh_min = rh if self.rh_min is None else min(self.rh_min, rh)
+        self.rh_max = rh if self.rh_max is None else max(self.rh_max, rh)
+        self.rh_sum += rh
+        self.wind_max = wind if self.wind_max is None else max(self.wind_max, wind)
+        if gust is not None:
+            self.gust_max = gust if self.gust_max is None else max(self.gust_max, gust)
+        self.p_min = p if self.p_min is None else min(self.p_min, p)
+        self.p_max = p if self.p_max is None else max(self.p_max, p)
+
+    def report(self, farm_id: str) -> Dict[str, Any]:
+        units = self.units
+        def temperature(value):
+            return to_farm_units("temperature", value, units)
+        return {
+            "id": f"report-{farm_id}-{self.day.isoformat()}", "type": "daily_report", "farm_id": farm_id,
+            "date": self.day.isoformat(), "units": units, "readings": self.count,
+            "temperature": {"min": temperature(self.t_min), "mean": temperature(self.t_sum / self.count), "max": temperature(self.t_max)},
+            "humidity": {"min": self.rh_min, "mean": round(self.rh_sum / self.count, 1), "max": self.rh_max},
+            "wind_speed_max": to_farm_units("wind_speed", self.wind_max, units),
+            "wind_gust_max": to_farm_units("wind_gust", self.gust_max, units),
+            "pressure": {"min": self.p_min, "max": self.p_max},
+            "alerts": self.alerts,
+        }
+
+
+class _FarmState:
+    __slots__ = ("last_time", "rules", "day", "closed")
+
+    def __init__(self, rules: List[AlertRule]):
+        self.last_time: Optional[float] = None
+        self.rules = {rule.name: _RuleState() for rule in rules}
+        self.day: Optional[DayAggregate] = None
+        self.closed: List[DayAggregate] = []  # Completed days waiting for the daily-report job
+
+
+class AlertEngine:
+    def __init__(self, outbox: "AlertOutbox", rules: Optional[List[AlertRule]] = None,
+                 cooldown_seconds: float = 3600.0, coordinator=None):
+        self.outbox = outbox
+        self.rules = rules if rules is not None else default_rules()
+        self.cooldown_seconds = cooldown_seconds
+        self.coordinator = coordinator  # Only the scheduler leader evaluates readings (None: standalone)
+        self.farms: Dict[str, _FarmState] = {}
+        self.evaluated = 0
+        self.triggered = 0
+        self.resolved = 0
+
+    def observe(self, farm_id: str, snapshot: WeatherSnapshot):
+        # Snapshot listener; O(rules) per reading
+        observation = snapshot.observation
+        if observation is None or (self.coordinator is not None and not self.coordinator.is_leader):
+            return
+        at = to_utc(observation.timestamp).timestamp()
+        state = self.farms.get(farm_id)
+        if state is None:
+            state = self.farms[farm_id] = _FarmState(self.rules)
+        if state.last_time is not None and at <= state.last_time:
+            return  # Re-published or older reading
+        state.last_time = at
+        self.evaluated += 1
+
+        units = snapshot.units
+        values = metric_values(observation, units)
+        day = datetime.fromtimestamp(at, tz=timezone.utc).date()
+        if state.day is None or state.day.day != day:
+            if state.day is not None:
+                state.closed = state.closed[-6:] + [state.day]  # At most a week waits for the report job
+            state.day = DayAggregate(day, units)
+        state.day.add(values, units)
+
+        for rule in self.rules:
+            value = values.get(rule.metric)
+            if value is None:
+                continue
+            rule_state = state.rules[rule.name]
+            status, measured = self._evaluate(rule, rule_state, value, at)
+            if status is None:
+                continue
+            if status == "triggered":
+                self.triggered += 1
+                state.day.alerts += 1
+            else:
+                self.resolved += 1
+            self.outbox.submit(self._message(farm_id, rule, rule_state, status, measured, at, units))
+
+    def _evaluate(self, rule: AlertRule, state: _RuleState, value: float, at: float) -> Tuple[Optional[str], float]:
+        if rule.kind == "rate":
+            change = state.change(value, at, rule.seconds)
+            if change is None:
+                return None, value
+            value = change
+            breached = rule.breached(value)
+        elif rule.kind == "duration":
+            if rule.breached(value):
+                state.since = at if state.since is None else state.since
+            elif rule.recovered(value):
+                state.since = None
+            breached = state.since is not None and at - state.since >= rule.seconds
+        else:
+            breached = rule.breached(value)
+
+        if not state.active and breached:
+            if state.cleared_at is not None and at - state.cleared_at < self.cooldown_seconds:
+                return None, value
+            state.active = True
+            state.triggered_at = at
+            return "triggered", value
+        if state.active and rule.recovered(value):
+            state.active = False
+            state.cleared_at = at
+            return "resolved", value
+        return None, value
+
+    @staticmethod
+    def _message(farm_id: str, rule: AlertRule, state: _RuleState, status: str, value: float, at: float, units: str) -> Dict[str, Any]:
+        change = rule.kind == "rate"
+        suffix = "" if status == "triggered" else "-resolved"
+        return {
+            "id": f"alert-{farm_id}-{rule.name}-{int(state.triggered_at)}{suffix}", "type": "alert", "status": status,
+            "farm_id": farm_id, "rule": rule.name, "title": rule.title, "kind": rule.kind, "units": units,
+            "value": to_farm_units(rule.metric, value, units, change),
+            "threshold": to_farm_units(rule.metric, rule.trigger if status == "triggered" else rule.clear, units, change),
+            "window_seconds": rule.seconds or None, "since": _iso(state.triggered_at), "observed_at": _iso(at),
+        }
+
+    def send_reports(self, today: date) -> int:
+        # Queues a report for every completed day before `today`; returns how many
+        sent = 0
+        for farm_id, state in self.farms.items():
+            days, state.closed = state.closed, []
+            if state.day is not None and state.day.day < today:
+                days.append(state.day)  # No reading since midnight yet
+                state.day = None
+            for day in days:
+                self.outbox.submit(day.report(farm_id))
+                sent += 1
+        return sent
+
+    def stats(self) -> Dict[str, Any]:
+        active = [
+            {"farm_id": farm_id, "rule": name, "since": _iso(rule_state.triggered_at)}
+            for farm_id, state in self.farms.items() for name, rule_state in state.rules.items() if rule_state.active
+        ]
+        return {
+            "farms": len(self.farms), "evaluated": self.evaluated, "triggered": self.triggered,
+            "resolved": self.resolved, "active": active,
+        }
+
+
+# --- Sinks ---
+# A sink delivers one message and raises when it was not accepted; the outbox retries.
+
+class LogSink:
+    async def deliver(self, message: Dict[str, Any]):
+        logger.info(f"Alert sink: {message}")
+
+
+class WebhookSink:
+    # POSTs each message as JSON. The message ID is sent as Idempotency-Key, so a receiver
+    # can drop the repeat of a delivery whose response was lost.
+    def __init__(self, http_client: httpx.AsyncClient, url: str):
+        self.client = http_client
+        self.url = url
+
+    async def deliver(self, message: Dict[str, Any]):
+        with timer(UPSTREAM_SECONDS, upstream="webhook", operation=message["type"]):
+            response = await self.client.post(self.url, json=message, headers={"Idempotency-Key": message["id"]})
+        if response.status_code >= 400:
+            raise RuntimeError(f"webhook answered {response.status_code}")
+
+
+def build_sink(kind: str, http_client: httpx.AsyncClient):
+    if kind == "webhook":
+        if not settings.ALERT_WEBHOOK_URL:
+            raise ValueError("ALERT_SINK=webhook needs ALERT_WEBHOOK_URL")
+        return WebhookSink(http_client, settings.ALERT_WEBHOOK_URL)
+    if kind == "log":
+        return LogSink()
+    raise ValueError(f"Unknown alert sink '{kind}'")
+
+
+def farm_opt_in(settings_service) -> Callable[[Dict[str, Any]], Awaitable[bool]]:
+    # Outbox admission: only farms whose settings enable the message type
+    async def admit(message: Dict[str, Any]) -> bool:
+        farm_settings = await settings_service.get_settings(message["farm_id"])
+        if farm_settings is None:
+            return False
+        return farm_settings.extreme_weather_alerts if message["type"] == "alert" else farm_settings.daily_report
+    return admit
+
+
+_STOP = object()  # Sentinel that tells the outbox loop to exit
+
+
+class AlertOutbox:
+    # submit() is synchronous and never blocks the caller; a background task admits,
+    # records and delivers messages, and retries failed deliveries from the local store.
+    def __init__(self, store: LocalStore, sink, admit: Optional[Callable[[Dict[str, Any]], Awaitable[bool]]] = None,
+                 max_attempts: int = 8, retry_seconds: float = 30.0, retention_hours: float = 168.0, max_buffer: int = 1000):
+        self.store = store
+        self.sink = sink
+        self.admit = admit
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self.retention_seconds = retention_hours * 3600
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffer)
+        self._task: Optional[asyncio.Task] = None
+        self._pruned_at = 0.0
+
+        # Counters exposed for monitoring
+        self.submitted = 0
+        self.skipped = 0  # Farm has not opted in
+        self.duplicates = 0
+        self.delivered = 0
+        self.retries = 0
+        self.failed = 0
+        self.dropped = 0  # Buffer full
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def submit(self, message: Dict[str, Any]):
+        try:
+            self._queue.put_nowait(message)
+            self.submitted += 1
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"Outbox: buffer full, dropped {message['id']}.")
+
+    async def close(self):
+        # Records what is still buffered; undelivered messages are retried after a restart
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                message = await asyncio.wait_for(self._queue.get(), self.retry_seconds)
+            except asyncio.TimeoutError:
+                message = None
+            try:
+                if message is _STOP:
+                    while not self._queue.empty():
+                        item = self._queue.get_nowait()
+                        if item is not _STOP:
+                            await self._accept(item)
+                    return
+                if message is not None:
+                    await self._accept(message)
+                await self.deliver_due()
+                if time.time() - self._pruned_at >= 3600:
+                    self._pruned_at = time.time()
+                    await run_in_threadpool(self.store.outbox_prune, self.retention_seconds)
+            except Exception as e:
+                logger.exception(f"Outbox: unexpected error: {e}")
+
+    async def _accept(self, message: Dict[str, Any]):
+        if self.admit is not None and not await self.admit(message):
+            self.skipped += 1
+            return
+        if not await run_in_threadpool(self.store.outbox_add, message["id"], message):
+            self.duplicates += 1
+
+    async def deliver_due(self, limit: int = 100) -> int:
+        delivered = 0
+        for message_id, message, attempts in await run_in_threadpool(self.store.outbox_due, limit):
+            try:
+                await self.sink.deliver(message)
+            except Exception as e:
+                attempts += 1
+                if attempts >= self.max_attempts:
+                    self.failed += 1
+                    logger.error(f"Outbox: giving up on {message_id} after {attempts} attempts: {e}")
+                    await run_in_threadpool(self.store.outbox_settle, message_id, "failed", 0.0, str(e))
+                else:
+                    self.retries += 1
+                    delay = random.uniform(0.5, 1.0) * min(self.retry_seconds * 2 ** (attempts - 1), 3600)
+                    logger.warning(f"Outbox: delivery of {message_id} failed ({e}); retrying in {delay:.0f}s.")
+                    await run_in_threadpool(self.store.outbox_settle, message_id, "pending", time.time() + delay, str(e))
+                continue
+            await run_in_threadpool(self.store.outbox_settle, message_id, "delivered")
+            self.delivered += 1
+            delivered += 1
+        return delivered
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": self._queue.qsize(), "submitted": self.submitted, "skipped": self.skipped,
+            "duplicates": self.duplicates, "delivered": self.delivered, "retries": self.retries,
+            "failed": self.failed, "dropped": self.dropped, "store": self.store.outbox_counts(),
+        }
@@ -0,0 +1,12 @@
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# Benchmarks also run without a .env: the required settings get placeholders, so that the
+# backend modules can be imported. Values from the environment or backend/.env take precedence.
+load_dotenv(dotenv_path=Path(__file__).resolve().parents[1] / ".env")
+for _name in ("OPENWEATHERMAP_API_KEY", "APPWRITE_PROJECT_ID", "APPWRITE_DATABASE_ID", "APPWRITE_API_KEY",
+              "APPWRITE_COLLECTION_ID", "APPWRITE_COLLECTION_SETTINGS_ID", "APPWRITE_SETTINGS_DOCUMENT_ID"):
+    os.environ.setdefault(_name, "bench")
+os.environ.setdefault("APPWRITE_ENDPOINT", "http://127.0.0.1:1/v1")
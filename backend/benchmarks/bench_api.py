@@ -0,0 +1,143 @@
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from ..fakes import owm_payload
+from ..observation import Observation
+from .report import REPO_ROOT, emit, percentiles
+
+# --- API Load Test ---
+# Boots `backend.main:app` with uvicorn against the local Appwrite/OpenWeatherMap stand-ins
+# (backend/fakes.py, each in its own process, with injected latency), seeds the weather
+# history, then drives each endpoint with a fixed number of concurrent clients and reports
+# p50/p95/p99 latency and requests per second.
+#
+# The load generator, the API and the stand-ins share the machine, so absolute numbers
+# depend on it; compare runs made on the same host.
+#
+#   python -m backend.benchmarks.bench_api [--requests 1000] [--concurrency 20] [--appwrite-latency 0.02]
+#                                          [--owm-latency 0.05] [--history-documents 500] [--output FILE]
+
+ENDPOINTS = {
+    "current": "/api/weather/current",
+    "history": "/api/weather/history?limit=50",
+    "settings": "/api/settings",
+}
+COLLECTION = "weather"
+
+
+def start_process(args, env=None) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, *args], cwd=REPO_ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_until_up(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+async def seed_history(fake_url: str, documents: int):
+    # Readings spread around the default farm, written straight into the fake Appwrite
+    rng = random.Random(42)
+    url = f"{fake_url}/v1/databases/bench/collections/{COLLECTION}/documents"
+    async with httpx.AsyncClient() as client:
+        for index in range(documents):
+            lat, lon = 41.1579, -8.6291
+            document = Observation.from_owm(owm_payload(lat, lon, "metric", rng), lat, lon).to_document()
+            response = await client.post(url, json={"documentId": f"seed{index}", "data": document})
+            response.raise_for_status()
+
+
+async def drive(client: httpx.AsyncClient, path: str, requests: int, concurrency: int):
+    latencies = []
+    errors = 0
+    next_index = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in next_index:
+            start = time.perf_counter()
+            try:
+                response = await client.get(path)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    result = {name: round(value * 1000, 2) for name, value in percentiles(latencies).items()}
+    return {"latency_ms": result, "requests_per_second": round(requests / elapsed, 1), "errors": errors}
+
+
+async def run(api_url: str, requests: int, concurrency: int, warmup: int):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=api_url, limits=limits, timeout=30.0) as client:
+        for name, path in ENDPOINTS.items():
+            await drive(client, path, warmup, concurrency)
+            results[name] = await drive(client, path, requests, concurrency)
+    return results
+
+
+def main(args):
+    fake_url = f"http://127.0.0.1:{args.fake_port}"
+    api_url = f"http://127.0.0.1:{args.api_port}"
+    processes = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = {
+            **os.environ,
+            "OPENWEATHERMAP_API_KEY": "bench", "OPENWEATHERMAP_BASE_URL": f"{fake_url}/owm",
+            "APPWRITE_ENDPOINT": f"{fake_url}/v1", "APPWRITE_PROJECT_ID": "bench", "APPWRITE_API_KEY": "bench",
+            "APPWRITE_DATABASE_ID": "bench", "APPWRITE_COLLECTION_ID": COLLECTION,
+            "APPWRITE_COLLECTION_SETTINGS_ID": "settings", "APPWRITE_SETTINGS_DOCUMENT_ID": "default",
+            "LOCAL_STORE_PATH": os.path.join(data_dir, "local_store.sqlite3"), "LOG_LEVEL": "WARNING",
+        }
+        try:
+            processes.append(start_process([
+                "-m", "backend.fakes", "--port", str(args.fake_port),
+                "--appwrite-latency", str(args.appwrite_latency), "--owm-latency", str(args.owm_latency)
+            ]))
+            wait_until_up(f"{fake_url}/docs")
+            asyncio.run(seed_history(fake_url, args.history_documents))
+            processes.append(start_process([
+                "-m", "uvicorn", "backend.main:app", "--port", str(args.api_port), "--log-level", "warning"
+            ], env))
+            wait_until_up(f"{api_url}/")
+            return asyncio.run(run(api_url, args.requests, args.concurrency, args.warmup))
+        finally:
+            for process in reversed(processes):
+                process.terminate()
+                process.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the API against the local stand-ins.")
+    parser.add_argument("--requests", type=int, default=1000, help="Measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=100, help="Unmeasured requests per endpoint first")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent clients")
+    parser.add_argument("--appwrite-latency", type=float, default=0.02, help="Seconds the fake Appwrite adds to each call")
+    parser.add_argument("--owm-latency", type=float, default=0.05, help="Seconds the fake OWM adds to each call")
+    parser.add_argument("--history-documents", type=int, default=500, help="Readings seeded before the run")
+    parser.add_argument("--fake-port", type=int, default=8798)
+    parser.add_argument("--api-port", type=int, default=8797)
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+    params = {name: value for name, value in vars(args).items() if name not in ("output", "fake_port", "api_port")}
+    emit("api", params, main(args), args.output)
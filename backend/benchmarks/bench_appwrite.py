@@ -0,0 +1,105 @@
+import argparse
+import asyncio
+import subprocess
+import sys
+import time
+
+import httpx
+from starlette.concurrency import run_in_threadpool
+
+from ..config import settings
+from ..services import AppwriteService, AsyncAppwriteService
+from .report import emit
+
+# --- Appwrite Client Throughput Benchmark ---
+# Requests per second against the fake Appwrite server (run in its own process, with an
+# artificial per-request latency), for the blocking SDK client behind run_in_threadpool
+# (the previous data path, capped by AnyIO's 40 worker threads) and the async REST client,
+# at increasing numbers of concurrent callers. Alongside each run a probe measures how long
+# an unrelated run_in_threadpool call (what sync endpoints and file responses use) waits
+# for a worker thread while the Appwrite calls are in flight.
+#
+#   python -m backend.benchmarks.bench_appwrite [--requests 600] [--latency 0.25] [--concurrency 10 40 100] [--output FILE]
+
+COLLECTION = "bench"
+DOCUMENTS = 100
+
+PROBE_INTERVAL = 0.05
+
+async def throughput(call, requests: int, concurrency: int):
+    # -> (requests per second, worst threadpool wait of the probe in ms)
+    semaphore = asyncio.Semaphore(concurrency)
+    probe_waits = []
+    done = asyncio.Event()
+
+    async def one(index: int):
+        async with semaphore:
+            await call(index)
+
+    async def probe():
+        while not done.is_set():
+            start = time.perf_counter()
+            await run_in_threadpool(lambda: None)
+            probe_waits.append(time.perf_counter() - start)
+            await asyncio.sleep(PROBE_INTERVAL)
+    probe_task = asyncio.create_task(probe())
+    start = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(requests)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await probe_task
+    return requests / elapsed, max(probe_waits) * 1000
+
+async def run(requests: int, concurrency_levels, port: int):
+    settings.APPWRITE_ENDPOINT = f"http://127.0.0.1:{port}/v1"
+    sync_client = AppwriteService()
+    async_client = AsyncAppwriteService()
+    for index in range(DOCUMENTS):
+        await async_client.create_document(COLLECTION, f"doc{index}", {"value": str(index)})
+
+    calls = {
+        "threadpool_sdk": lambda index: run_in_threadpool(sync_client.get_document, COLLECTION, f"doc{index % DOCUMENTS}"),
+        "async_rest": lambda index: async_client.get_document(COLLECTION, f"doc{index % DOCUMENTS}"),
+    }
+    results = {}
+    for concurrency in concurrency_levels:
+        entry = {}
+        for name, call in calls.items():
+            rate, probe_ms = await throughput(call, requests, concurrency)
+            entry[name] = {"requests_per_second": round(rate, 1), "threadpool_wait_max_ms": round(probe_ms, 1)}
+        entry["speedup"] = round(entry["async_rest"]["requests_per_second"] / entry["threadpool_sdk"]["requests_per_second"], 2)
+        results[f"concurrency_{concurrency}"] = entry
+    await async_client.aclose()
+    return results
+
+def wait_for_server(port: int, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/docs", timeout=0.5)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError("Fake Appwrite server did not start")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark threadpool SDK vs async REST Appwrite access.")
+    parser.add_argument("--requests", type=int, default=600, help="get_document calls per measurement")
+    parser.add_argument("--latency", type=float, default=0.25, help="Seconds the fake server adds to each call")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 40, 100], help="Concurrent callers")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "backend.fakes", "--port", str(args.port), "--appwrite-latency", str(args.latency)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_for_server(args.port)
+        results = asyncio.run(run(args.requests, args.concurrency, args.port))
+        emit("appwrite", {"requests": args.requests, "latency": args.latency, "concurrency": args.concurrency},
+             results, args.output)
+    finally:
+        server.terminate()
+        server.wait()
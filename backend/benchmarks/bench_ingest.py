@@ -0,0 +1,280 @@
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import random
+import resource
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Dict, List, Tuple
+
+from appwrite.query import Query as AppwriteQuery
+
+from ..config import settings
+from ..container import ServiceContainer
+from ..fakes import OWM_EDGE_CASES, edge_case_payload, owm_payload
+from ..models import FarmSettingsData
+from ..observability import STAGE_SECONDS, UPSTREAM_SECONDS
+from ..recorder import read_recordings
+from ..services import OpenWeatherMapService, grid_cell
+from .bench_api import start_process, wait_until_up
+from .report import emit, percentiles
+
+# --- Ingestion Replay ---
+# Feeds OpenWeatherMap payloads through WeatherService.update_weather_data at a fixed rate
+# using the app's own services: settings cache, observation parsing, recommendations, the
+# buffered writer with its local store, and the snapshot listeners. Appwrite is the fake
+# server (backend/fakes.py, in its own process, with injected latency). Only the OWM call
+# is replaced: ReplayOWMService hands out recorded payloads (`--recording`, see recorder.py)
+# or synthetic ones with a share of edge cases (`--edge-fraction`), without network.
+#
+# Reports outcomes per farm update (updated; dropped: the payload was rejected; failed: an
+# error was raised), also per payload kind, latency percentiles, the achieved rate, updates
+# shed at the in-flight cap, call counts and time per stage from the app's metrics, the
+# writer's results after draining, and memory high-water marks.
+#
+#   python -m backend.benchmarks.bench_ingest [--farms 10000] [--rate 10000] [--duration 30]
+#                                             [--recording FILE ...] [--edge-fraction 0.02]
+#                                             [--appwrite-latency 0.02] [--tracemalloc] [--output FILE]
+
+SAMPLE_INTERVAL = 0.05
+
+
+class ReplayOWMService(OpenWeatherMapService):
+    # Serves the payloads in turn instead of calling OWM, and remembers which kind of
+    # payload each grid cell got last
+    def __init__(self, payloads: List[Tuple[str, Dict[str, Any]]]):
+        super().__init__()
+        self._payloads = itertools.cycle(payloads)
+        self.served: Dict[Tuple[float, float, str], str] = {}
+
+    async def get_current_weather(self, lat: float, lon: float, units: str = "metric"):
+        kind, payload = next(self._payloads)
+        self.served[(lat, lon, units)] = kind
+        return payload
+
+
+def load_payloads(recordings: List[str], count: int, edge_fraction: float, rng: random.Random):
+    if recordings:
+        payloads = [("recorded", record["payload"]) for record in read_recordings(recordings)]
+        if not payloads:
+            raise SystemExit("The recordings contain no payloads.")
+        return payloads
+    payloads = []
+    for _ in range(count):
+        lat, lon = round(rng.uniform(-60, 60), 4), round(rng.uniform(-180, 180), 4)
+        if rng.random() < edge_fraction:
+            kind = rng.choice(OWM_EDGE_CASES)
+            payloads.append((kind, edge_case_payload(kind, lat, lon, "metric", rng)))
+        else:
+            payloads.append(("valid", owm_payload(lat, lon, "metric", rng)))
+    return payloads
+
+
+def metric_totals() -> Dict[str, List[float]]:
+    # stage (or upstream:operation) -> [calls, seconds] so far
+    totals: Dict[str, List[float]] = {}
+    for histogram in (STAGE_SECONDS, UPSTREAM_SECONDS):
+        for metric in histogram.collect():
+            for sample in metric.samples:
+                if not sample.name.endswith(("_count", "_sum")):
+                    continue
+                labels = sample.labels
+                key = labels.get("stage") or f"{labels.get('upstream')}:{labels.get('operation')}"
+                entry = totals.setdefault(key, [0.0, 0.0])
+                entry[0 if sample.name.endswith("_count") else 1] += sample.value
+    return totals
+
+
+def stage_report(before, after, elapsed: float) -> Dict[str, Dict[str, float]]:
+    stages = {}
+    for key, (calls, seconds) in sorted(after.items()):
+        calls -= before.get(key, [0.0, 0.0])[0]
+        seconds -= before.get(key, [0.0, 0.0])[1]
+        if calls <= 0:
+            continue
+        stages[key] = {
+            "calls": int(calls),
+            "per_second": round(calls / elapsed, 1),
+            "mean_us": round(seconds / calls * 1e6, 1),
+            "busy_fraction": round(seconds / elapsed, 3),  # Time spent in the stage per wall-clock second
+        }
+    return stages
+
+
+async def seed_farms(services: ServiceContainer, farms: int, rng: random.Random):
+    # One settings document per farm, each in its own grid cell; also primes the settings cache
+    semaphore = asyncio.Semaphore(100)
+    seeded = []
+
+    async def seed(index: int):
+        farm_id = f"replay{index:06d}"
+        farm_settings = FarmSettingsData(farm_latitude=round(rng.uniform(-60, 60), 4),
+                                         farm_longitude=round(rng.uniform(-180, 180), 4), units="metric")
+        async with semaphore:
+            if await services.farm_settings.update_settings(farm_settings, farm_id, create=True):
+                cell = grid_cell(farm_settings.farm_latitude, farm_settings.farm_longitude, farm_settings.units)
+                seeded.append((farm_id, cell))
+
+    await asyncio.gather(*(seed(index) for index in range(farms)))
+    return seeded
+
+
+async def replay(services: ServiceContainer, owm: ReplayOWMService, farms, rate: float, duration: float,
+                 max_in_flight: int):
+    interval = 60.0 / rate
+    total = int(duration * rate / 60)
+    latencies: List[float] = []
+    outcomes: Dict[str, Dict[str, int]] = {}
+    tasks = set()
+    shed = 0
+    peaks = {"in_flight": 0, "writer_buffer": 0, "python_heap_bytes": 0}
+    done = asyncio.Event()
+
+    async def update(farm_id: str, cell):
+        start = time.perf_counter()
+        try:
+            outcome = "updated" if await services.weather.update_weather_data(farm_id) else "dropped"
+        except Exception:
+            outcome = "failed"
+        latencies.append(time.perf_counter() - start)
+        counts = outcomes.setdefault(owm.served.pop(cell, "unserved"), {"updated": 0, "dropped": 0, "failed": 0})
+        counts[outcome] += 1
+
+    async def sample():
+        while not done.is_set():
+            peaks["in_flight"] = max(peaks["in_flight"], len(tasks))
+            peaks["writer_buffer"] = max(peaks["writer_buffer"], services.writer.stats()["buffered"])
+            if tracemalloc.is_tracing():
+                peaks["python_heap_bytes"] = max(peaks["python_heap_bytes"], tracemalloc.get_traced_memory()[1])
+            await asyncio.sleep(SAMPLE_INTERVAL)
+
+    sampler = asyncio.create_task(sample())
+    farm_cycle = itertools.cycle(farms)
+    launched = 0
+    start = time.perf_counter()
+    # Open loop: updates start on schedule whether or not earlier ones have finished
+    while launched < total:
+        due = min(total, int((time.perf_counter() - start) / interval) + 1)
+        while launched < due:
+            launched += 1
+            farm_id, cell = next(farm_cycle)
+            if len(tasks) >= max_in_flight:
+                shed += 1
+                continue
+            task = asyncio.create_task(update(farm_id, cell))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.sleep(max(interval, 0.001))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    done.set()
+    await sampler
+
+    totals = {"updated": 0, "dropped": 0, "failed": 0}
+    for counts in outcomes.values():
+        for outcome, count in counts.items():
+            totals[outcome] += count
+    completed = sum(totals.values())
+    return elapsed, {
+        "updates": total,
+        "shed": shed,
+        "elapsed_seconds": round(elapsed, 2),
+        "offered_per_minute": round(rate, 1),
+        "achieved_per_minute": round(completed / elapsed * 60, 1),
+        "outcomes": totals,
+        "by_payload": outcomes,
+        "latency_ms": {name: round(value * 1000, 2) for name, value in percentiles(latencies).items()},
+        "in_flight_max": peaks["in_flight"],
+        "writer_buffer_max": peaks["writer_buffer"],
+    }, peaks
+
+
+def rss_peak_mb() -> float:
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)  # ru_maxrss is in KiB on Linux
+
+
+async def run(args, fake_url: str, data_dir: str):
+    settings.APPWRITE_ENDPOINT = f"{fake_url}/v1"
+    settings.APPWRITE_COLLECTION_ID = "weather"
+    settings.APPWRITE_COLLECTION_SETTINGS_ID = "settings"
+    settings.LOCAL_STORE_ENABLED = not args.no_local_store
+    settings.LOCAL_STORE_PATH = os.path.join(data_dir, "local_store.sqlite3")
+    settings.COORDINATION_ENABLED = False  # One process: no leader election
+    rng = random.Random(args.seed)
+
+    services = ServiceContainer()
+    services.start()
+    owm = ReplayOWMService(load_payloads(args.recording, args.payloads, args.edge_fraction, rng))
+    services.weather.owm = owm
+    try:
+        farms = await seed_farms(services, args.farms, rng)
+        if not farms:
+            raise SystemExit("No farm could be seeded; is the fake Appwrite reachable?")
+        memory = {"rss_peak_before_mb": rss_peak_mb()}
+        if args.tracemalloc:
+            tracemalloc.start()
+        before = metric_totals()
+        elapsed, results, peaks = await replay(services, owm, farms, args.rate, args.duration, args.max_in_flight)
+        stages = stage_report(before, metric_totals(), elapsed)
+
+        # Flush what the writer still holds; its stats show what reached Appwrite
+        drain_start = time.perf_counter()
+        await services.writer.close()
+        writer = services.writer.stats()
+        stored = await services.appwrite.list_documents(settings.APPWRITE_COLLECTION_ID, [AppwriteQuery.limit(1)])
+        memory["rss_peak_mb"] = rss_peak_mb()
+        if args.tracemalloc:
+            memory["python_heap_peak_mb"] = round(peaks["python_heap_bytes"] / 1024 / 1024, 1)
+            tracemalloc.stop()
+        results.update({
+            "farms": len(farms),
+            "stages": stages,
+            "writer": {
+                "written": writer["written"], "dropped": writer["dropped"], "deferred": writer["deferred"],
+                "retries": writer["retries"], "drain_ms": round((time.perf_counter() - drain_start) * 1000, 1),
+            },
+            "stored_documents": stored.get("total", 0),
+            "memory": memory,
+        })
+        return results
+    finally:
+        await services.aclose()
+        await owm.aclose()
+
+
+def main(args):
+    logging.getLogger("backend").setLevel(args.log_level)
+    fake_url = f"http://127.0.0.1:{args.fake_port}"
+    fake = start_process(["-m", "backend.fakes", "--port", str(args.fake_port),
+                          "--appwrite-latency", str(args.appwrite_latency)])
+    try:
+        wait_until_up(f"{fake_url}/docs")
+        with tempfile.TemporaryDirectory() as data_dir:
+            return asyncio.run(run(args, fake_url, data_dir))
+    finally:
+        fake.terminate()
+        fake.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay OWM payloads through the ingestion pipeline at a fixed rate.")
+    parser.add_argument("--farms", type=int, default=10000, help="Farms seeded and updated in turn")
+    parser.add_argument("--rate", type=float, default=10000, help="Farm updates started per minute")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds during which updates are started")
+    parser.add_argument("--recording", nargs="*", default=[], help="Recorded payload files or globs (default: synthetic)")
+    parser.add_argument("--payloads", type=int, default=5000, help="Distinct synthetic payloads")
+    parser.add_argument("--edge-fraction", type=float, default=0.02, help="Share of synthetic payloads that are edge cases")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="Updates running at once before new ones are shed")
+    parser.add_argument("--appwrite-latency", type=float, default=0.02, help="Seconds the fake Appwrite adds to each call")
+    parser.add_argument("--no-local-store", action="store_true", help="Write to Appwrite without the local write-ahead store")
+    parser.add_argument("--tracemalloc", action="store_true", help="Also track the Python heap peak (slows the run down)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--log-level", default="ERROR", help="Level of the backend loggers during the run")
+    parser.add_argument("--fake-port", type=int, default=8796)
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+    params = {name: value for name, value in vars(args).items() if name not in ("output", "fake_port", "log_level")}
+    emit("ingest", params, main(args), args.output)
@@ -0,0 +1,74 @@
+import argparse
+import random
+import timeit
+
+from ..fakes import owm_payload
+from ..models import WeatherData, WeatherHistoryRecord, WeatherHistoryResponse
+from ..observation import Observation
+from ..services import AsyncAppwriteService, FarmSettingsService, OpenWeatherMapService, WeatherService
+from .report import emit
+
+# --- Hot-Path Microbenchmarks ---
+# Per-call cost of the CPU-bound steps behind the API, on synthetic readings:
+#   transform_weather_data: OWM payload -> WeatherData (every refresh)
+#   weather_data_validate:  stored document -> WeatherData (cold /current)
+#   history_page:           one page of stored documents -> validated WeatherHistoryResponse
+#                           -> JSON body (/history)
+#
+#   python -m backend.benchmarks.bench_micro [--samples 2000] [--page-size 100] [--repeat 5] [--output FILE]
+
+
+def stored_document(raw, lat: float, lon: float, index: int):
+    # A weather document as Appwrite returns it
+    document = Observation.from_owm(raw, lat, lon).to_document()
+    return {**document, "$id": f"doc{index}", "$createdAt": "2024-05-01T12:00:00.000+00:00",
+            "$updatedAt": "2024-05-01T12:00:00.000+00:00", "$permissions": [], "$collectionId": "weather",
+            "$databaseId": "bench"}
+
+
+def best_us(fn, calls: int, repeat: int) -> float:
+    # Fastest of `repeat` runs, in microseconds per call
+    return min(timeit.repeat(fn, number=1, repeat=repeat)) / calls * 1e6
+
+
+def run(samples: int, page_size: int, repeat: int):
+    rng = random.Random(42)
+    readings = []
+    for _ in range(samples):
+        lat, lon = round(rng.uniform(-60, 60), 4), round(rng.uniform(-180, 180), 4)
+        readings.append((owm_payload(lat, lon, "metric", rng), lat, lon))
+    documents = [stored_document(raw, lat, lon, index) for index, (raw, lat, lon) in enumerate(readings)]
+    page = documents[:page_size]
+
+    appwrite = AsyncAppwriteService()
+    service = WeatherService(appwrite, OpenWeatherMapService(), FarmSettingsService(appwrite))
+
+    def transform():
+        for raw, lat, lon in readings:
+            service._transform_weather_data(raw, lat, lon)
+
+    def validate():
+        for document in documents:
+            WeatherData.model_validate(document)
+
+    def history_page():
+        records = [WeatherHistoryRecord.model_validate(document) for document in page]
+        WeatherHistoryResponse(total=len(documents), documents=records, next_cursor=page[-1]["$id"]).model_dump_json()
+
+    history_us = best_us(history_page, 1, repeat)
+    return {
+        "transform_weather_data": {"per_call_us": round(best_us(transform, samples, repeat), 2)},
+        "weather_data_validate": {"per_call_us": round(best_us(validate, samples, repeat), 2)},
+        "history_page": {"per_page_us": round(history_us, 2), "per_record_us": round(history_us / len(page), 2)},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmarks of the API's CPU-bound hot paths.")
+    parser.add_argument("--samples", type=int, default=2000, help="Readings per run")
+    parser.add_argument("--page-size", type=int, default=100, help="Records of the serialized history page")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs; the fastest is reported")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+    emit("micro", {"samples": args.samples, "page_size": args.page_size, "repeat": args.repeat},
+         run(args.samples, args.page_size, args.repeat), args.output)
@@ -0,0 +1,95 @@
+import argparse
+import json
+import random
+import timeit
+from datetime import datetime
+
+from ..fakes import owm_payload
+from ..models import SunData, WeatherData, WeatherLocation
+from ..observation import Observation
+from .report import emit
+
+# --- Observation Parsing Benchmark ---
+# Per-reading cost of the legacy string-typed path against the typed Observation record:
+#   ingest: OWM payload -> stored document + API model + recommendation inputs (every refresh)
+#   read:   stored document -> location check + recommendation inputs + API model (cold /current)
+#
+#   python -m backend.benchmarks.bench_observation [--samples 2000] [--repeat 5] [--output FILE]
+
+def legacy_ingest(raw, lat, lon):
+    # The pre-Observation `_transform_weather_data` + model_dump path
+    main = raw.get('main', {})
+    wind = raw.get('wind', {})
+    weather_info = raw.get('weather', [{}])[0]
+    sys_info = raw.get('sys', {})
+    location = WeatherLocation(lat=str(lat), lon=str(lon), name=raw.get('name', 'Unknown'))
+    sun_data = SunData(sunrise=str(sys_info.get('sunrise', '')), sunset=str(sys_info.get('sunset', '')))
+    weather = WeatherData(
+        temperature=str(main.get('temp', '0')),
+        humidity=str(main.get('humidity', '0')),
+        wind_speed=str(wind.get('speed', '0')),
+        description=weather_info.get('description', ''),
+        icon=weather_info.get('icon', ''),
+        feels_like=str(main.get('feels_like', '0')),
+        wind_gust=str(wind.get('gust', '0')) if 'gust' in wind else None,
+        wind_direction=str(wind.get('deg', '0')) if 'deg' in wind else None,
+        pressure=str(main.get('pressure', '0')),
+        visibility=str(raw.get('visibility', '0')),
+        location=location.model_dump_json(),
+        sun=sun_data.model_dump_json(),
+        timestamp=datetime.utcnow(),
+    )
+    numbers = (float(main.get('temp', 0)), float(main.get('humidity', 0)), float(wind.get('speed', 0)))
+    return weather.model_dump(mode='json', exclude_none=True), weather, numbers
+
+def typed_ingest(raw, lat, lon):
+    observation = Observation.from_owm(raw, lat, lon)
+    document = observation.to_document()
+    numbers = (observation.temperature, observation.humidity, observation.wind_speed)
+    return document, observation.to_weather_data(document), numbers
+
+def legacy_read(doc):
+    # The pre-Observation `_get_latest_weather_from_db` path
+    location = json.loads(doc.get('location', '{}'))
+    lat, lon = float(location.get('lat', 0.0)), float(location.get('lon', 0.0))
+    numbers = (float(doc.get('temperature', '0')), float(doc.get('humidity', '0')), float(doc.get('wind_speed', '0')))
+    return lat, lon, numbers, WeatherData.model_validate(doc)
+
+def typed_read(doc):
+    observation = Observation.from_document(doc)
+    numbers = (observation.temperature, observation.humidity, observation.wind_speed)
+    return observation.lat, observation.lon, numbers, WeatherData.model_validate(doc)
+
+def per_call_us(fn, inputs, repeat):
+    def run():
+        for args in inputs:
+            fn(*args)
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    return best / len(inputs) * 1e6
+
+def run(samples: int, repeat: int):
+    rng = random.Random(42)
+    readings = []
+    for _ in range(samples):
+        lat, lon = round(rng.uniform(-60, 60), 4), round(rng.uniform(-180, 180), 4)
+        readings.append((owm_payload(lat, lon, "metric", rng), lat, lon))
+    documents = [(dict(typed_ingest(*reading)[0], **{'$id': f"doc{i}"}),) for i, reading in enumerate(readings)]
+
+    results = {
+        "ingest": {"legacy_us": per_call_us(legacy_ingest, readings, repeat), "typed_us": per_call_us(typed_ingest, readings, repeat)},
+        "read": {"legacy_us": per_call_us(legacy_read, documents, repeat), "typed_us": per_call_us(typed_read, documents, repeat)},
+    }
+    for name, entry in results.items():
+        entry["speedup"] = round(entry["legacy_us"] / entry["typed_us"], 2)
+        entry["legacy_us"] = round(entry["legacy_us"], 2)
+        entry["typed_us"] = round(entry["typed_us"], 2)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark legacy vs typed observation parsing.")
+    parser.add_argument("--samples", type=int, default=2000, help="Readings per run")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs; the fastest is reported")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+    emit("observation", {"samples": args.samples, "repeat": args.repeat}, run(args.samples, args.repeat), args.output)
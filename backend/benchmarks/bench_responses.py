@@ -0,0 +1,62 @@
+import argparse
+import random
+
+from ..fakes import owm_payload
+from ..history import parse_fields, project_documents
+from ..models import WeatherHistoryRecord, WeatherHistoryResponse
+from ..responses import compress, json_response, supported_encodings
+from .bench_micro import best_us, stored_document
+from .report import emit
+
+# --- History Response Encoding ---
+# Bytes on the wire and encode time of one /history page, per record shape and content coding:
+#   records: validated WeatherHistoryRecords with their Appwrite metadata (default response)
+#   slim:    `fields=` projection, encoded by orjson without model validation
+# encode_us covers building the body from the stored documents plus compression.
+#
+#   python -m backend.benchmarks.bench_responses [--page-size 100] [--fields timestamp,temperature,...]
+#                                                [--repeat 5] [--output FILE]
+
+
+def run(page_size: int, fields: str, repeat: int):
+    rng = random.Random(42)
+    page = []
+    for index in range(page_size):
+        lat, lon = round(rng.uniform(-60, 60), 4), round(rng.uniform(-180, 180), 4)
+        page.append(stored_document(owm_payload(lat, lon, "metric", rng), lat, lon, index))
+    selected = parse_fields(fields)
+
+    def records():
+        validated = [WeatherHistoryRecord.model_validate(document) for document in page]
+        return json_response(WeatherHistoryResponse(total=1000, documents=validated, next_cursor=page[-1]["$id"]),
+                             exclude={"documents": {"__all__": {"recommendations"}}}).body
+
+    def slim():
+        return json_response({"total": 1000, "documents": project_documents(page, selected), "next_cursor": page[-1]["$id"]}).body
+
+    results = {}
+    for shape, build in (("records", records), ("slim", slim)):
+        body = build()
+        for encoding in ("identity",) + supported_encodings():
+            if encoding == "identity":
+                encoded, encode = body, build
+            else:
+                encoded = compress(body, encoding)
+                encode = lambda build=build, encoding=encoding: compress(build(), encoding)
+            results[f"{shape}_{encoding}"] = {
+                "bytes": len(encoded),
+                "bytes_per_record": round(len(encoded) / page_size, 1),
+                "encode_us": round(best_us(encode, 1, repeat), 2),
+            }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Size and encode time of a /history page per shape and content coding.")
+    parser.add_argument("--page-size", type=int, default=100, help="Records per page")
+    parser.add_argument("--fields", default="timestamp,temperature,humidity,wind_speed,pressure", help="Columns of the slim page")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs; the fastest is reported")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+    emit("responses", {"page_size": args.page_size, "fields": args.fields, "repeat": args.repeat},
+         run(args.page_size, args.fields, args.repeat), args.output)
@@ -0,0 +1,77 @@
+import argparse
+import json
+import sys
+from typing import Any, Dict, Iterator, Tuple
+
+# --- Benchmark Comparison ---
+# Diffs two result files written with `--output` (same benchmark, e.g. before and after a
+# change) and exits with status 1 when a metric got worse by more than --threshold:
+#
+#   python -m backend.benchmarks.compare baseline.json candidate.json [--threshold 0.1]
+#
+# Latencies and per-call costs (anything under a *_ms or *_us key) and response sizes should
+# go down; throughput (requests_per_second) and speedups should go up. Other numbers are shown
+# but not judged.
+
+HIGHER_IS_BETTER = ("requests_per_second", "speedup")
+LOWER_IS_BETTER = ("bytes", "bytes_per_record")
+
+
+def leaves(tree: Dict[str, Any], prefix: str = "") -> Iterator[Tuple[str, float]]:
+    for key, value in tree.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from leaves(value, path)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield path, float(value)
+
+
+def direction(path: str) -> int:
+    # +1: higher is better, -1: lower is better, 0: not judged
+    parts = path.split(".")
+    if parts[-1] in HIGHER_IS_BETTER:
+        return 1
+    if parts[-1] in LOWER_IS_BETTER:
+        return -1
+    if any(part.endswith(("_ms", "_us")) for part in parts):
+        return -1
+    return 0
+
+
+def compare(baseline: Dict[str, Any], candidate: Dict[str, Any], threshold: float):
+    rows, regressions = [], []
+    old = dict(leaves(baseline["results"]))
+    for path, new_value in leaves(candidate["results"]):
+        if path not in old:
+            continue
+        old_value = old[path]
+        change = (new_value - old_value) / old_value if old_value else 0.0
+        sign = direction(path)
+        regressed = sign != 0 and -sign * change > threshold
+        rows.append((path, old_value, new_value, change, regressed))
+        if regressed:
+            regressions.append(path)
+    return rows, regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change that counts as a regression")
+    args = parser.parse_args()
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    if baseline.get("benchmark") != candidate.get("benchmark"):
+        sys.exit(f"Different benchmarks: {baseline.get('benchmark')} vs {candidate.get('benchmark')}")
+
+    rows, regressions = compare(baseline, candidate, args.threshold)
+    print(f"{baseline['benchmark']}: {baseline.get('commit')} -> {candidate.get('commit')}")
+    width = max((len(row[0]) for row in rows), default=10)
+    for path, old_value, new_value, change, regressed in rows:
+        print(f"  {path:<{width}}  {old_value:>12.2f}  {new_value:>12.2f}  {change:>+8.1%}{'  REGRESSION' if regressed else ''}")
+    if regressions:
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+        sys.exit(1)
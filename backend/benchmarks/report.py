@@ -0,0 +1,54 @@
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# --- Benchmark Results ---
+# Every benchmark prints its results as JSON; with `--output` they are also written to a
+# file together with the commit and environment they were measured on, so two runs can be
+# diffed with `python -m backend.benchmarks.compare`.
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if result.returncode != 0:
+        return None
+    dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT,
+                           capture_output=True, text=True, timeout=10).stdout.strip()
+    return result.stdout.strip() + ("-dirty" if dirty else "")
+
+
+def percentiles(samples: List[float], points=(50, 95, 99)) -> Dict[str, float]:
+    # Nearest-rank percentiles, in the unit of the samples
+    ordered = sorted(samples)
+    if not ordered:
+        return {f"p{point}": 0.0 for point in points}
+    return {f"p{point}": ordered[min(len(ordered) - 1, max(0, round(point / 100 * len(ordered)) - 1))] for point in points}
+
+
+def emit(benchmark: str, params: Dict[str, Any], results: Dict[str, Any], output: Optional[str] = None) -> Dict[str, Any]:
+    report = {
+        "benchmark": benchmark,
+        "commit": git_commit(),
+        "measured_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": params,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if output:
+        path = Path(output)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text + "\n")
+        print(f"Results written to {path}", file=sys.stderr)
+    return report
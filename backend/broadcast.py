@@ -0,0 +1,131 @@
+import asyncio
+from typing import Any, Dict, Optional, Set
+
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from .snapshot import WeatherSnapshot
+
+# --- Live Snapshot Broadcast ---
+# Fans each published WeatherSnapshot out to the open `/stream` connections of its farm.
+# Every subscriber owns a one-slot queue that always holds the newest frame only: when a
+# slow client has not consumed the previous frame yet, it is replaced rather than queued,
+# so a stalled dashboard never builds a backlog and never slows the publisher.
+# Publishing is a synchronous loop over in-memory queues, with no I/O per subscriber.
+
+class Subscription:
+    def __init__(self, broadcaster: "SnapshotBroadcaster", farm_id: str):
+        self.broadcaster = broadcaster
+        self.farm_id = farm_id
+        self.queue: "asyncio.Queue[Optional[WeatherSnapshot]]" = asyncio.Queue(maxsize=1)
+        self.dropped = 0  # Frames replaced before this subscriber read them
+
+    def offer(self, snapshot: Optional[WeatherSnapshot]):
+        # Keep only the newest frame (None is the shutdown signal)
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            self.broadcaster.dropped += 1
+        self.queue.put_nowait(snapshot)
+
+    async def next(self, timeout: float) -> Optional[WeatherSnapshot]:
+        # Next frame, or raises asyncio.TimeoutError when nothing arrives within `timeout`
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.broadcaster.unsubscribe(self)
+
+
+class SnapshotBroadcaster:
+    def __init__(self, max_subscribers: int = 1000):
+        self.max_subscribers = max_subscribers
+        self._topics: Dict[str, Set[Subscription]] = {}  # farm_id -> open subscriptions
+        self._last_etag: Dict[str, str] = {}
+        self.closed = False
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._topics.values())
+
+    def subscribe(self, farm_id: str) -> Optional[Subscription]:
+        # Returns None when the subscriber limit is reached or the broadcaster is shut down
+        if self.closed or self.subscriber_count >= self.max_subscribers:
+            return None
+        subscription = Subscription(self, farm_id)
+        self._topics.setdefault(farm_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self._topics.get(subscription.farm_id)
+        if subscriptions is None:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._topics[subscription.farm_id]
+
+    def publish(self, farm_id: str, snapshot: WeatherSnapshot):
+        # Re-publishing an unchanged reading (same ETag) is not sent again
+        if self._last_etag.get(farm_id) == snapshot.etag:
+            return
+        self._last_etag[farm_id] = snapshot.etag
+        self.published += 1
+        for subscription in self._topics.get(farm_id, ()):
+            subscription.offer(snapshot)
+            self.delivered += 1
+
+    def close(self):
+        # Ends every open stream; called during application shutdown
+        self.closed = True
+        for subscriptions in self._topics.values():
+            for subscription in subscriptions:
+                subscription.offer(None)
+
+    def stats(self):
+        return {
+            "subscribers": self.subscriber_count,
+            "farms": len(self._topics),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+
+async def sse_events(subscription: Subscription, heartbeat_seconds: float, retry_ms: int, is_disconnected):
+    # Server-Sent Events body for one subscription. The ETag is the event ID, so a client
+    # reconnecting with Last-Event-ID can skip the reading it already has. A comment line
+    # is sent when nothing was published for `heartbeat_seconds`, which keeps proxies from
+    # closing idle connections and lets us notice clients that went away.
+    try:
+        yield f"retry: {retry_ms}\n\n".encode()
+        while True:
+            try:
+                snapshot = await subscription.next(heartbeat_seconds)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    return
+                yield b": heartbeat\n\n"
+                continue
+            if snapshot is None:
+                return
+            yield b"id: " + snapshot.etag.encode() + b"\nevent: weather\ndata: " + snapshot.body + b"\n\n"
+    finally:
+        subscription.close()
+
+
+class SubscriptionResponse(StreamingResponse):
+    # Streaming response that owns a subscription and closes it however the response ends.
+    # The cleanup in sse_events only runs once the generator is iterated and closed: a
+    # client that disconnects cancels the iteration, and a response that fails before the
+    # first byte never starts the generator, which would leave the subscription behind.
+    def __init__(self, subscription: Subscription, content: Any, **kwargs):
+        super().__init__(content, **kwargs)
+        self.subscription = subscription
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.subscription.close()
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from .observability import record_cache
+from .singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# --- Async TTL Cache ---
+# Small in-process cache for values that are expensive to fetch but rarely change
+# (e.g. the farm settings document). Entries are served fresh until their TTL expires;
+# after that the stale value is still returned immediately while a single background
+# task reloads it (stale-while-revalidate). Only a cold miss waits on the loader.
+#
+# The loader returns None when it could not produce a trustworthy value; such results
+# are handed back to the caller but never stored, so a transient upstream error does
+# not get pinned in the cache for a whole TTL. It returns MISSING when the key is known
+# not to exist: that answer is remembered for `negative_ttl_seconds` (at most
+# `max_negative_entries` keys), so lookups of unknown keys do not each reach the upstream.
+#
+# set() and invalidate() bump the key's generation. A load stores its result only if the
+# generation it started with is still current, so a slow load or background refresh
+# cannot overwrite a newer write-through value (or resurrect an invalidated one).
+
+MISSING = object()  # Loader result for a key that does not exist
+
+
+class AsyncTTLCache:
+    def __init__(self, loader: Callable[[Hashable], Awaitable[Optional[Any]]], ttl_seconds: float, name: str = "cache",
+                 negative_ttl_seconds: float = 0.0, max_negative_entries: int = 1024):
+        self._loader = loader
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.max_negative_entries = max_negative_entries
+        self.name = name  # `cache` label of the lookup metrics
+        self._entries: Dict[Hashable, Tuple[Any, float]] = {}  # key -> (value, expires_at)
+        self._missing: Dict[Hashable, float] = {}  # key -> expires_at, for keys known not to exist
+        self._generations: Dict[Hashable, int] = {}  # Bumped by set() and invalidate(key)
+        self._epoch = 0  # Bumped by invalidate() of every key
+        self._loads = SingleFlight()  # One cold-miss load per key; released when it finishes
+        self._refreshing: Dict[Hashable, asyncio.Task] = {}
+
+        # Counters exposed for monitoring
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    async def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if time.monotonic() < expires_at:
+                self.hits += 1
+                record_cache(self.name, "hit")
+            else:
+                # Serve the stale value and let one background task refresh it
+                self.stale_hits += 1
+                record_cache(self.name, "stale")
+                self._schedule_refresh(key)
+            return value
+
+        missing_until = self._missing.get(key)
+        if missing_until is not None:
+            if time.monotonic() < missing_until:
+                self.hits += 1
+                record_cache(self.name, "hit")
+                return None
+            del self._missing[key]
+
+        self.misses += 1
+        record_cache(self.name, "miss")
+        return await self._loads.do(key, lambda: self._load(key))
+
+    async def _load(self, key: Hashable) -> Optional[Any]:
+        generation = self._generation(key)
+        value = await self._loader(key)
+        if self._generation(key) != generation:
+            # Written or invalidated meanwhile: the loaded value may predate that
+            entry = self._entries.get(key)
+            return entry[0] if entry is not None else (None if value is MISSING else value)
+        if value is MISSING:
+            self._remember_missing(key)
+            return None
+        if value is not None:
+            self._store(key, value)
+        return value
+
+    def _generation(self, key: Hashable) -> Tuple[int, int]:
+        return self._epoch, self._generations.get(key, 0)
+
+    def _store(self, key: Hashable, value: Any):
+        self._missing.pop(key, None)
+        self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+
+    def _remember_missing(self, key: Hashable):
+        if self.negative_ttl_seconds <= 0:
+            return
+        now = time.monotonic()
+        if len(self._missing) >= self.max_negative_entries:
+            self._missing = {k: until for k, until in self._missing.items() if until > now}
+            while len(self._missing) >= self.max_negative_entries:
+                del self._missing[next(iter(self._missing))]  # Oldest first
+        self._missing[key] = now + self.negative_ttl_seconds
+
+    def set(self, key: Hashable, value: Any):
+        # Write-through: store a value we already know is current (e.g. right after an update)
+        self._generations[key] = self._generations.get(key, 0) + 1
+        self._store(key, value)
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        if key is None:
+            self._epoch += 1
+            self._entries.clear()
+            self._missing.clear()
+        else:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            self._entries.pop(key, None)
+            self._missing.pop(key, None)
+
+    def _schedule_refresh(self, key: Hashable):
+        task = self._refreshing.get(key)
+        if task is not None and not task.done():
+            return  # A refresh for this key is already in flight
+        self._refreshing[key] = asyncio.create_task(self._refresh(key))
+
+    async def _refresh(self, key: Hashable):
+        self.refreshes += 1
+        generation = self._generation(key)
+        try:
+            value = await self._loader(key)
+            if self._generation(key) != generation:
+                return  # Written or invalidated meanwhile; keep the newer state
+            if value is MISSING:
+                # Deleted since it was cached
+                self._entries.pop(key, None)
+                self._remember_missing(key)
+            elif value is not None:
+                self._store(key, value)
+            else:
+                self.refresh_errors += 1
+        except Exception as e:
+            self.refresh_errors += 1
+            logger.warning(f"Cache: Background refresh failed for {key!r}: {e}")
+        finally:
+            self._refreshing.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "missing_entries": len(self._missing),
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+        }
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 from pathlib import Path
@@ -28,9 +29,138 @@ class Settings(BaseSettings):
     DEFAULT_EXTREME_WEATHER_ALERTS: bool = False  # Enable or disable extreme weather notifications
     DEFAULT_DAILY_REPORT: bool = False  # Enable or disable daily weather reports
 
+    # In-process cache for the farm settings document
+    SETTINGS_CACHE_TTL_SECONDS: float = 300.0  # Seconds before a cached settings read is refreshed in the background
+    SETTINGS_CACHE_NEGATIVE_TTL_SECONDS: float = 30.0  # Seconds an unknown farm ID is answered without asking Appwrite again
+
+    # Multi-farm scheduling
+    FARM_GRID_PRECISION: int = 2  # Decimal places farms are rounded to; farms in the same cell share one OWM call (~1 km at 2)
+    SCHEDULER_MAX_CONCURRENCY: int = 20  # Grid cells refreshed in parallel on each scheduler tick
+    SCHEDULER_TICK_BUDGET_FRACTION: float = 0.9  # Share of the update interval a batch may run before unfinished farms are abandoned
+    SCHEDULER_TICK_SECONDS: int = 30  # How often the planner looks for grid cells that are due
+    SCHEDULER_SYNC_SECONDS: int = 300  # How often the farm list is re-read (saved settings re-plan immediately)
+    SCHEDULER_JITTER_FRACTION: float = 0.1  # Run times are spread by up to ±10% of the interval
+    SCHEDULER_MIN_INTERVAL_FACTOR: float = 0.5  # Volatile weather or near a threshold: poll at this share of update_frequency
+    SCHEDULER_MAX_INTERVAL_FACTOR: float = 3.0  # Stable weather: back off up to this multiple of update_frequency
+    SCHEDULER_STABLE_RUNS: int = 3  # Unchanged readings in a row before backing off
+    SCHEDULER_RATE_LIMIT_BACKOFF_SECONDS: int = 300  # Pause after an OWM 429 without Retry-After
+    # Change between readings (or distance to a recommendation threshold) that counts as significant, metric units
+    SCHEDULER_SENSITIVITY_TEMPERATURE: float = 2.0  # °C
+    SCHEDULER_SENSITIVITY_HUMIDITY: float = 10.0  # %
+    SCHEDULER_SENSITIVITY_PRESSURE: float = 3.0  # hPa
+    SCHEDULER_SENSITIVITY_WIND_SPEED: float = 3.0  # m/s
+
+    # Buffered writer for weather observations
+    WRITER_BATCH_SIZE: int = 50  # Observations written per flush
+    WRITER_FLUSH_INTERVAL_SECONDS: float = 2.0  # Longest time an observation waits in the buffer
+    WRITER_MAX_BUFFER: int = 10000  # Buffered observations before producers are made to wait
+    WRITER_MAX_RETRIES: int = 5  # Retries per batch before the remaining observations are dropped
+    WRITER_RETRY_BACKOFF_SECONDS: float = 0.5  # Base delay of the exponential retry backoff
+
+    # Local write-ahead store (SQLite) for observations and the Appwrite replay queue
+    LOCAL_STORE_ENABLED: bool = True
+    LOCAL_STORE_PATH: str = str(Path(__file__).resolve().parent / "data" / "local_store.sqlite3")
+    LOCAL_STORE_RETENTION_HOURS: float = 72.0  # Synced observations older than this are pruned
+    LOCAL_STORE_SYNC_INTERVAL_SECONDS: float = 30.0  # How often pending rows are replayed to Appwrite
+    LOCAL_STORE_SYNC_GRACE_SECONDS: float = 60.0  # Pending rows younger than this belong to an in-flight flush
+
+    # Multi-worker coordination (see coordination.py); workers of one host share this database
+    COORDINATION_ENABLED: bool = True  # When false every worker runs its own scheduler
+    COORDINATION_PATH: str = str(Path(__file__).resolve().parent / "data" / "coordination.sqlite3")
+    COORDINATION_INTERVAL_SECONDS: float = 2.0  # Lease renewal and snapshot exchange period
+    LEADER_LEASE_SECONDS: float = 15.0  # A silent leader is replaced after this long
+
+    # History queries
+    HISTORY_SCAN_PAGE_SIZE: int = 100  # Documents per Appwrite page when scanning a time range
+    HISTORY_DEFAULT_RANGE_DAYS: int = 30  # Range aggregated when `bucket` is given without `start`
+    HISTORY_MAX_SCAN_DOCUMENTS: int = 50000  # Upper bound on readings scanned for one aggregation
+
+    # Tiered retention (see retention.py): old readings are rolled up into hourly, then daily documents
+    RETENTION_ENABLED: bool = False  # Compact history in the background; the rollup collection must exist
+    APPWRITE_ROLLUP_COLLECTION_ID: str = "weather_rollups"  # Collection for hourly and daily rollups
+    RETENTION_RAW_DAYS: float = 30  # Readings older than this are rolled up into hourly documents and deleted
+    RETENTION_HOURLY_DAYS: float = 365  # Hourly rollups older than this are merged into daily ones and deleted
+    RETENTION_INTERVAL_SECONDS: int = 3600  # How often the compaction job runs
+    RETENTION_BATCH_DOCUMENTS: int = 5000  # Documents compacted per farm and tier on each run
+
+    # History export
+    EXPORT_BATCH_ROWS: int = 10000  # Rows per CSV chunk / Arrow record batch / Parquet row group
+
+    # Response compression (see responses.py)
+    RESPONSE_COMPRESSION_ENABLED: bool = True  # Compress JSON/CSV bodies for clients that accept brotli or gzip
+    RESPONSE_COMPRESSION_MIN_BYTES: int = 1024  # Smaller bodies are sent as-is
+    RESPONSE_GZIP_LEVEL: int = 5  # 1-9; higher levels barely shrink a history page further
+    RESPONSE_BROTLI_QUALITY: int = 4  # 0-11; above 5 compression gets much slower
+
+    # Live updates (Server-Sent Events)
+    STREAM_HEARTBEAT_SECONDS: float = 15.0  # Idle time before a keep-alive comment is sent
+    STREAM_RETRY_MS: int = 5000  # Reconnect delay suggested to EventSource clients
+    STREAM_MAX_SUBSCRIBERS: int = 1000  # Open streams across all farms; further clients get a 503
+
+    # Recommendation rules
+    RECOMMENDATIONS_REFRESH_SECONDS: int = 300  # How often the recommendations collection is reloaded
+    RECOMMENDATIONS_MAX_DOCUMENTS: int = 500  # Upper bound on recommendation documents loaded
+
+    # Agronomic metrics
+    AGRONOMY_GDD_BASE_C: float = 10.0  # Base temperature for growing degree days (°C)
+    AGRONOMY_GDD_CAP_C: float = 30.0  # Upper cut-off temperature for growing degree days (°C)
+    AGRONOMY_ROLLING_DAYS: int = 7  # Window of the rolling temperature min/max
+
+    # Forecasts
+    FORECAST_ENABLED: bool = True  # Refresh forecasts together with the current readings
+    FORECAST_DEFAULT_MAX_AGE_SECONDS: int = 3600  # Freshness of a forecast when the upstream sends no Cache-Control max-age
+
+    # Extreme-weather alerts and daily reports (see alerts.py); sent for farms that enable them in their settings
+    ALERTS_ENABLED: bool = True
+    ALERT_SINK: str = "log"  # "log" or "webhook"
+    ALERT_WEBHOOK_URL: Optional[str] = None  # Receives every message as a JSON POST when ALERT_SINK=webhook
+    ALERT_FROST_TEMPERATURE_C: float = 2.0  # Frost risk at or below this temperature
+    ALERT_HEAT_TEMPERATURE_C: float = 32.0  # Heat stress at or above this temperature...
+    ALERT_HEAT_MINUTES: float = 60  # ...held for this long
+    ALERT_GUST_SPEED_MS: float = 17.0  # Strong gusts at or above this speed...
+    ALERT_GUST_MINUTES: float = 30  # ...held for this long
+    ALERT_PRESSURE_DROP_HPA: float = 5.0  # Falling pressure: a drop of this much...
+    ALERT_PRESSURE_DROP_HOURS: float = 3.0  # ...within this window
+    ALERT_COOLDOWN_MINUTES: float = 60  # A resolved alert cannot trigger again before this
+    DAILY_REPORT_HOUR_UTC: int = 6  # Reports of the previous day are sent at this hour
+    ALERT_OUTBOX_MAX_ATTEMPTS: int = 8  # Deliveries tried before a message is marked failed
+    ALERT_OUTBOX_RETRY_SECONDS: float = 30.0  # Delay before the first retry (doubled each time, at most an hour)
+    ALERT_OUTBOX_RETENTION_HOURS: float = 168.0  # Delivered messages are remembered this long to drop repeats
+
     # Server and external API settings
     PORT: int = 8000
     OPENWEATHERMAP_BASE_URL: str = "https://api.openweathermap.org/data/2.5"
+    OPENWEATHERMAP_ONECALL_URL: Optional[str] = None  # e.g. https://api.openweathermap.org/data/3.0/onecall; when set, forecasts use One Call
+    OWM_RECORD_PATH: Optional[str] = None  # Record every /weather payload to this gzip JSON-lines file ({pid} = process ID)
+    OWM_RECORD_MAX_MB: float = 100.0  # Recording stops once the file reaches this size
+
+    # Shared HTTP client settings (one keep-alive pool for the whole app lifetime)
+    HTTP_MAX_CONNECTIONS: int = 20  # Upper bound on open connections in the pool
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10  # Idle connections kept around for reuse
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0  # Seconds an idle connection stays in the pool
+    HTTP_CONNECT_TIMEOUT: float = 5.0  # Seconds allowed to establish a connection
+    HTTP_TIMEOUT: float = 10.0  # Seconds allowed for read/write/pool acquisition
+    HTTP2_ENABLED: bool = True  # Negotiate HTTP/2 when the upstream supports it
+    APPWRITE_MAX_CONNECTIONS: int = 50  # Connection pool of the async Appwrite client; callers beyond it queue for a connection
+    APPWRITE_WRITE_CONCURRENCY: int = 8  # Documents of a write batch sent to Appwrite in parallel
+
+    # Upstream resilience (see resilience.py)
+    OWM_RATE_LIMIT_PER_MINUTE: float = 60  # Client-side limit matching the OWM plan (free plan: 60 calls/minute)
+    OWM_RATE_LIMIT_BURST: int = 10  # Calls that may go out back to back before the limit applies
+    OWM_DEADLINE_SECONDS: float = 20.0  # Whole OWM call, rate-limit wait and retries included
+    APPWRITE_DEADLINE_SECONDS: float = 20.0  # No Appwrite retry starts after this (the SDK has no request timeout)
+    RETRY_MAX_ATTEMPTS: int = 3  # Attempts per call, first one included
+    RETRY_BASE_DELAY_SECONDS: float = 0.2  # Backoff before the first retry (doubled each time, full jitter)
+    RETRY_MAX_DELAY_SECONDS: float = 2.0
+    RETRY_BUDGET_RATIO: float = 0.2  # Retries may add at most this share to the request volume (all upstreams together)
+    RETRY_BUDGET_MIN_PER_SECOND: float = 1.0  # Retries always allowed at this rate, for low traffic
+    BREAKER_FAILURE_THRESHOLD: int = 5  # Consecutive failures that open a circuit
+    BREAKER_RECOVERY_SECONDS: float = 30.0  # Time an open circuit fails fast before a trial call
+
+    # Observability (see observability.py)
+    METRICS_ENABLED: bool = True  # Serve GET /metrics and time hot paths; when false the timers are no-ops
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"  # "text" or "json" (one object per line)
 
     class Config:
         # Ignore unknown fields in the .env or environment variables
@@ -0,0 +1,119 @@
+import asyncio
+import time
+from typing import Optional
+
+import httpx
+
+from .config import settings
+from .services import (
+    AsyncAppwriteService,
+    OpenWeatherMapService,
+    FarmSettingsService,
+    WeatherService,
+    build_appwrite_policy,
+    build_http_client,
+    build_owm_policy,
+)
+from .writer import ObservationWriter
+from .localstore import LocalStore
+from .broadcast import SnapshotBroadcaster
+from .planner import RefreshPlanner
+from .resilience import RetryBudget
+from .coordination import CoordinationStore, Coordinator
+from .retention import RollupCompactor
+from .alerts import AlertEngine, AlertOutbox, build_sink, farm_opt_in
+from .recorder import PayloadRecorder
+
+# --- Service Container ---
+# Built once in the application lifespan and exposed through `app.state.services`.
+# Routers and the scheduler share the same instances, so the HTTP pool and the
+# Appwrite SDK client are created a single time instead of on every request/tick.
+class ServiceContainer:
+    def __init__(self, http_client: httpx.AsyncClient = None):
+        self.http_client = http_client or build_http_client()
+        self.retry_budget = RetryBudget(settings.RETRY_BUDGET_RATIO, settings.RETRY_BUDGET_MIN_PER_SECOND)  # Shared by all upstreams
+        self.appwrite = AsyncAppwriteService(policy=build_appwrite_policy(self.retry_budget))  # Owns its own connection pool
+        self.owm = OpenWeatherMapService(http_client=self.http_client, policy=build_owm_policy(self.retry_budget))
+        if settings.OWM_RECORD_PATH:
+            # Raw payloads for offline replay (see recorder.py)
+            self.owm.recorder = PayloadRecorder(settings.OWM_RECORD_PATH, max_bytes=int(settings.OWM_RECORD_MAX_MB * 1024 * 1024))
+        self.farm_settings = FarmSettingsService(appwrite_service=self.appwrite)
+        self.local_store = LocalStore(settings.LOCAL_STORE_PATH) if settings.LOCAL_STORE_ENABLED else None
+        self.writer = ObservationWriter(self.appwrite, settings.APPWRITE_COLLECTION_ID, store=self.local_store)
+        self.broadcaster = SnapshotBroadcaster(max_subscribers=settings.STREAM_MAX_SUBSCRIBERS)
+        self.weather = WeatherService(
+            appwrite_service=self.appwrite,
+            owm_service=self.owm,
+            settings_service=self.farm_settings,
+            writer=self.writer,
+            broadcaster=self.broadcaster
+        )
+        self.planner = RefreshPlanner(
+            sensitivities={
+                "temperature": settings.SCHEDULER_SENSITIVITY_TEMPERATURE,
+                "humidity": settings.SCHEDULER_SENSITIVITY_HUMIDITY,
+                "pressure": settings.SCHEDULER_SENSITIVITY_PRESSURE,
+                "wind_speed": settings.SCHEDULER_SENSITIVITY_WIND_SPEED,
+            },
+            jitter_fraction=settings.SCHEDULER_JITTER_FRACTION,
+            min_factor=settings.SCHEDULER_MIN_INTERVAL_FACTOR,
+            max_factor=settings.SCHEDULER_MAX_INTERVAL_FACTOR,
+            stable_runs=settings.SCHEDULER_STABLE_RUNS,
+        )
+        # Saved settings re-plan the farm's refreshes right away
+        self.farm_settings.listeners.append(self.planner.update_farm)
+        # History compaction into hourly/daily rollups, run by the scheduler (None: keep raw readings forever)
+        self.compactor = None
+        if settings.RETENTION_ENABLED:
+            self.compactor = RollupCompactor(
+                self.weather, settings.APPWRITE_ROLLUP_COLLECTION_ID, settings.RETENTION_RAW_DAYS,
+                settings.RETENTION_HOURLY_DAYS, batch_documents=settings.RETENTION_BATCH_DOCUMENTS
+            )
+        self.warmup_task: Optional[asyncio.Task] = None  # Startup loading, run in the background by the lifespan
+        self.started_at = time.time()
+        # Scheduler leadership and snapshot sharing between uvicorn workers (None: standalone)
+        self.coordinator = None
+        if settings.COORDINATION_ENABLED:
+            self.coordinator = Coordinator(
+                CoordinationStore(settings.COORDINATION_PATH), self.weather,
+                lease_seconds=settings.LEADER_LEASE_SECONDS, interval_seconds=settings.COORDINATION_INTERVAL_SECONDS
+            )
+            self.weather.snapshot_listeners.append(self.coordinator.snapshot_published)
+            self.farm_settings.listeners.append(self.coordinator.settings_saved)
+            # Settings saved by another worker: drop cached copies and re-read the farm list on the next tick
+            self.coordinator.on_settings_changed.append(self.farm_settings.cache.invalidate)
+            self.coordinator.on_settings_changed.append(self.planner.invalidate)
+        # Alerts and daily reports, evaluated on every published reading and sent through the outbox
+        self.outbox = None
+        self.alerts = None
+        if settings.ALERTS_ENABLED:
+            self.outbox = AlertOutbox(
+                self.local_store or LocalStore(":memory:"), build_sink(settings.ALERT_SINK, self.http_client),
+                admit=farm_opt_in(self.farm_settings), max_attempts=settings.ALERT_OUTBOX_MAX_ATTEMPTS,
+                retry_seconds=settings.ALERT_OUTBOX_RETRY_SECONDS, retention_hours=settings.ALERT_OUTBOX_RETENTION_HOURS
+            )
+            self.alerts = AlertEngine(self.outbox, cooldown_seconds=settings.ALERT_COOLDOWN_MINUTES * 60, coordinator=self.coordinator)
+            self.weather.snapshot_listeners.append(self.alerts.observe)
+
+    def start(self):
+        # Starts background workers; must be called from the running event loop.
+        self.writer.start()
+        if self.outbox is not None:
+            self.outbox.start()
+
+    async def aclose(self):
+        # End open streams, flush buffered writes and release pooled connections; called once during application shutdown.
+        if self.coordinator is not None:
+            await self.coordinator.close()  # Hands the scheduler lease over right away
+        self.broadcaster.close()
+        await self.writer.close()
+        if self.outbox is not None:
+            await self.outbox.close()
+            if self.outbox.store is not self.local_store:
+                self.outbox.store.close()
+        await self.appwrite.aclose()
+        await self.http_client.aclose()
+        if self.owm.recorder is not None:
+            self.owm.recorder.close()
+        if self.local_store is not None:
+            self.local_store.close()
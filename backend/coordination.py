@@ -0,0 +1,280 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from .models import FarmSettingsData, WeatherResponse
+from .observation import Observation
+from .snapshot import WeatherSnapshot
+
+logger = logging.getLogger(__name__)
+
+# --- Multi-Worker Coordination ---
+# With `uvicorn --workers N` every worker is a separate process with its own services. A
+# small SQLite database shared by the workers of one host lets them cooperate:
+#   - scheduler lease: one worker (the leader) runs the weather refreshes. It renews the
+#     lease on every step; when it stops (crash, shutdown) another worker takes over once
+#     the lease expires, after at most LEADER_LEASE_SECONDS. A leader that cannot renew
+#     for that long (store locked or failing) steps down, so two leaders never overlap;
+#   - published snapshots: the leader writes each snapshot it publishes, and followers
+#     poll for newer ones and serve them from memory exactly like the leader does, so N
+#     workers cost the upstreams what one does;
+#   - settings signal: saving settings on any worker bumps a counter; every worker then
+#     drops its cached settings and the leader re-plans its refreshes.
+#
+# CoordinationStore methods are blocking and called through run_in_threadpool.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    farm_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    body BLOB NOT NULL,
+    etag TEXT NOT NULL,
+    lat REAL NOT NULL,
+    lon REAL NOT NULL,
+    units TEXT NOT NULL,
+    observation TEXT,
+    published_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS signals (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+SCHEDULER_LEASE = "scheduler"
+SETTINGS_SIGNAL = "settings"
+
+
+class CoordinationStore:
+    def __init__(self, path: str):
+        self.path = path
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def acquire(self, name: str, holder: str, lease_seconds: float) -> bool:
+        # Takes or renews the lease; False while another holder's lease is still valid
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT holder, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+                if row is not None and row[0] != holder and row[1] > now:
+                    return False
+                self._conn.execute(
+                    "INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at",
+                    (name, holder, now + lease_seconds)
+                )
+                return True
+            finally:
+                self._conn.execute("COMMIT")
+
+    def release(self, name: str, holder: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder))
+
+    def holder(self, name: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT holder FROM leases WHERE name = ? AND expires_at > ?", (name, time.time())).fetchone()
+        return row[0] if row else None
+
+    def put_snapshots(self, snapshots: Dict[str, WeatherSnapshot]):
+        rows = []
+        for farm_id, snapshot in snapshots.items():
+            observation = snapshot.observation
+            document = json.dumps({**observation.to_document(), '$id': observation.id}) if observation is not None else None
+            rows.append((farm_id, snapshot.body, snapshot.etag, snapshot.lat, snapshot.lon, snapshot.units, document, snapshot.published_at))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            version = self._conn.execute("SELECT COALESCE(MAX(version), 0) FROM snapshots").fetchone()[0]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO snapshots (farm_id, version, body, etag, lat, lon, units, observation, published_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(row[0], version + index, *row[1:]) for index, row in enumerate(rows, start=1)]
+            )
+            self._conn.execute("COMMIT")
+
+    def snapshots_after(self, version: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT farm_id, version, body, etag, lat, lon, units, observation, published_at FROM snapshots "
+                "WHERE version > ? ORDER BY version", (version,)
+            ).fetchall()
+        columns = ("farm_id", "version", "body", "etag", "lat", "lon", "units", "observation", "published_at")
+        return [dict(zip(columns, row)) for row in rows]
+
+    def bump(self, name: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO signals (name, version) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET version = version + 1",
+                (name,)
+            )
+
+    def signal(self, name: str) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT version FROM signals WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+
+def snapshot_from_row(row: Dict[str, Any]) -> WeatherSnapshot:
+    observation = Observation.from_document(json.loads(row["observation"])) if row["observation"] else None
+    return WeatherSnapshot(
+        response=WeatherResponse.model_validate_json(row["body"]), body=bytes(row["body"]), etag=row["etag"],
+        lat=row["lat"], lon=row["lon"], units=row["units"], observation=observation, published_at=row["published_at"]
+    )
+
+
+class Coordinator:
+    # Runs in every worker. `on_elected`/`on_demoted` start and stop the leader-only jobs.
+    def __init__(self, store: CoordinationStore, weather, lease_seconds: float = 15.0, interval_seconds: float = 2.0):
+        self.store = store
+        self.weather = weather  # WeatherService whose snapshots are shared
+        self.lease_seconds = lease_seconds
+        self.interval_seconds = interval_seconds
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self.on_elected: List[Callable[[], None]] = []
+        self.on_demoted: List[Callable[[], None]] = []
+        self.on_settings_changed: List[Callable[[], None]] = []
+        self._outgoing: Dict[str, WeatherSnapshot] = {}  # Published here, not written to the store yet
+        self._settings_saved = False
+        self._snapshot_version = 0
+        self._settings_version: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._renewed_at = 0.0  # time.monotonic() of the last successful lease renewal
+        self.elections = 0
+        self.demotions = 0
+        self.snapshots_written = 0
+        self.snapshots_installed = 0
+
+    # Listeners (registered by the service container)
+
+    def snapshot_published(self, farm_id: str, snapshot: WeatherSnapshot):
+        # Only the leader's readings are shared; a follower's on-demand refreshes stay local
+        if self.is_leader:
+            self._outgoing[farm_id] = snapshot
+
+    def settings_saved(self, farm_id: str, farm_settings: FarmSettingsData):
+        self._settings_saved = True
+
+    # Loop
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await self.step()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Coordination: step failed: {e}")
+                self._check_lease()
+            await asyncio.sleep(self.interval_seconds)
+
+    def _check_lease(self):
+        # A leader that has not renewed its lease for a whole lease period (e.g. the store
+        # stays locked) must assume another worker took over and stop its leader-only jobs
+        if self.is_leader and time.monotonic() - self._renewed_at >= self.lease_seconds:
+            logger.warning(f"Coordination: {self.holder} could not renew the scheduler lease in {self.lease_seconds}s.")
+            self._set_leader(False)
+
+    def _set_leader(self, leader: bool):
+        if leader == self.is_leader:
+            return
+        self.is_leader = leader
+        if leader:
+            self.elections += 1
+            logger.info(f"Coordination: {self.holder} is now the scheduler leader.")
+        else:
+            self.demotions += 1
+            self._outgoing.clear()  # The new leader's snapshots are newer than these
+            logger.warning(f"Coordination: {self.holder} lost the scheduler lease.")
+        for callback in (self.on_elected if leader else self.on_demoted):
+            callback()
+
+    async def step(self):
+        started = time.monotonic()  # The lease runs from before the renewal was requested
+        leader = await run_in_threadpool(self.store.acquire, SCHEDULER_LEASE, self.holder, self.lease_seconds)
+        if leader:
+            self._renewed_at = started
+        self._set_leader(leader)
+
+        if self._settings_saved:
+            self._settings_saved = False
+            await run_in_threadpool(self.store.bump, SETTINGS_SIGNAL)
+        version = await run_in_threadpool(self.store.signal, SETTINGS_SIGNAL)
+        if self._settings_version is not None and version != self._settings_version:
+            for callback in self.on_settings_changed:
+                callback()
+        self._settings_version = version
+
+        if self.is_leader:
+            await self._flush()
+        else:
+            await self._pull()
+
+    async def _flush(self):
+        if not self._outgoing:
+            return
+        outgoing, self._outgoing = self._outgoing, {}
+        await run_in_threadpool(self.store.put_snapshots, outgoing)
+        self.snapshots_written += len(outgoing)
+
+    async def _pull(self):
+        rows = await run_in_threadpool(self.store.snapshots_after, self._snapshot_version)
+        for row in rows:
+            self._snapshot_version = row["version"]
+            current = self.weather.latest_snapshots.get(row["farm_id"])
+            if current is not None and current.published_at >= row["published_at"]:
+                continue
+            try:
+                snapshot = snapshot_from_row(row)
+            except (ValueError, TypeError, KeyError) as e:
+                logger.warning(f"Coordination: unreadable snapshot of farm {row['farm_id']}: {e}")
+                continue
+            self.weather.install_snapshot(row["farm_id"], snapshot)
+            self.snapshots_installed += 1
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self.is_leader:
+            await self._flush()
+            await run_in_threadpool(self.store.release, SCHEDULER_LEASE, self.holder)
+            self.is_leader = False
+        self.store.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "role": "leader" if self.is_leader else "follower", "holder": self.holder,
+            "leader": self.store.holder(SCHEDULER_LEASE), "elections": self.elections, "demotions": self.demotions,
+            "snapshots_written": self.snapshots_written, "snapshots_installed": self.snapshots_installed,
+        }
@@ -0,0 +1,192 @@
+import csv
+import io
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from .history import AGGREGATED_METRICS, parse_appwrite_datetime, to_utc
+from .observation import Observation
+
+logger = logging.getLogger(__name__)
+
+# --- Columnar History Export ---
+# Streams a time range of readings as CSV, an Arrow IPC stream or Parquet. Documents are
+# paged in from Appwrite, parsed into Observation rows and encoded in batches of
+# EXPORT_BATCH_ROWS rows. Each batch is flushed to the client before the next page is read,
+# so memory stays bounded by one batch whatever the length of the range.
+# Compacted periods are exported from their rollups (see retention.py): one row per hourly or
+# daily bucket, stamped with the bucket start and carrying the bucket means. The `tier`
+# column tells them apart from raw readings.
+# pyarrow is imported lazily, only for the Arrow and Parquet formats.
+
+EXPORT_FORMATS = {
+    # format: (media type, file extension)
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+EXPORT_COLUMNS = Observation._fields + ("tier",)
+# Only the attributes the rows are built from; Appwrite metadata is left out of the pages
+EXPORT_SELECT = [
+    "$id", "$createdAt", "timestamp", "farm_id", "temperature", "feels_like", "humidity", "pressure",
+    "wind_speed", "wind_gust", "wind_direction", "visibility", "description", "icon", "location", "sun",
+]
+
+
+def _to_row(tier: str, document: Dict[str, Any]) -> Tuple:
+    if tier != "raw":
+        return _rollup_row(tier, document)
+    observation = Observation.from_document(document)
+    return (*observation._replace(timestamp=to_utc(observation.timestamp)), tier)
+
+
+def _rollup_row(tier: str, document: Dict[str, Any]) -> Tuple:
+    # Row of an hourly/daily rollup: the bucket start and the means of the aggregated metrics
+    start = parse_appwrite_datetime(document["bucket_start"])
+    if start is None:
+        raise ValueError(f"Rollup without bucket_start: {document.get('$id')}")
+    row: Dict[str, Any] = dict.fromkeys(Observation._fields)
+    row.update({metric: document.get(f"{metric}_mean") for metric in AGGREGATED_METRICS})
+    row.update(timestamp=to_utc(start), farm_id=document.get("farm_id"), id=document.get("$id"))
+    return (*row.values(), tier)
+
+
+class _ChunkSink(io.RawIOBase):
+    # Write-only file object that collects encoder output until it is drained
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class _CsvEncoder:
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self._writer.writerow(EXPORT_COLUMNS)
+
+    def _drain(self) -> bytes:
+        data = self._buffer.getvalue().encode("utf-8")
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def write(self, rows: List[Tuple]) -> bytes:
+        self._writer.writerows(
+            (row[0].isoformat(timespec="milliseconds"), *("" if value is None else value for value in row[1:]))
+            for row in rows
+        )
+        return self._drain()
+
+    def close(self) -> bytes:
+        return self._drain()
+
+
+class _ArrowEncoder:
+    def __init__(self):
+        import pyarrow as pa
+        self._pa = pa
+        self.schema = pa.schema([
+            ("timestamp", pa.timestamp("ms", tz="UTC")),
+            ("lat", pa.float64()),
+            ("lon", pa.float64()),
+            ("location_name", pa.string()),
+            ("temperature", pa.float64()),
+            ("feels_like", pa.float64()),
+            ("humidity", pa.float64()),
+            ("pressure", pa.float64()),
+            ("wind_speed", pa.float64()),
+            ("visibility", pa.float64()),
+            ("description", pa.string()),
+            ("icon", pa.string()),
+            ("wind_gust", pa.float64()),
+            ("wind_direction", pa.float64()),
+            ("sunrise", pa.int64()),
+            ("sunset", pa.int64()),
+            ("farm_id", pa.string()),
+            ("id", pa.string()),
+            ("tier", pa.string()),
+        ])
+        self._sink = _ChunkSink()
+        self._writer = self._open_writer()
+
+    def _open_writer(self):
+        return self._pa.ipc.new_stream(self._sink, self.schema)
+
+    def _table(self, rows: List[Tuple]):
+        columns = list(zip(*rows))
+        return self._pa.Table.from_arrays(
+            [self._pa.array(column, type=field.type) for column, field in zip(columns, self.schema)],
+            schema=self.schema
+        )
+
+    def write(self, rows: List[Tuple]) -> bytes:
+        self._writer.write_table(self._table(rows))
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+
+class _ParquetEncoder(_ArrowEncoder):
+    # Each batch becomes one row group; the footer is written on close()
+    def _open_writer(self):
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(self._sink, self.schema, compression="zstd")
+
+
+_ENCODERS = {"csv": _CsvEncoder, "arrow": _ArrowEncoder, "parquet": _ParquetEncoder}
+
+
+async def stream_export(fmt: str, pages: AsyncIterator[Tuple[str, List[Dict[str, Any]]]], batch_rows: int,
+                        healthy: Optional[Callable[[], bool]] = None) -> AsyncIterator[bytes]:
+    # Encodes (tier, documents) pages of WeatherService.iter_history into `fmt`, yielding bytes
+    # as each batch is ready.
+    # If `healthy` reports a failed source once the pages run out, the stream is aborted
+    # rather than finished, so clients never receive a silently truncated file.
+    encoder = await run_in_threadpool(_ENCODERS[fmt])
+    rows: List[Tuple] = []
+    skipped = 0
+    async for tier, documents in pages:
+        for document in documents:
+            try:
+                rows.append(_to_row(tier, document))
+            except (ValueError, TypeError, AttributeError):
+                skipped += 1
+        if len(rows) >= batch_rows:
+            yield await run_in_threadpool(encoder.write, rows)
+            rows = []
+    if healthy is not None and not healthy():
+        raise RuntimeError("Weather source became unavailable during export")
+    if rows:
+        yield await run_in_threadpool(encoder.write, rows)
+    yield await run_in_threadpool(encoder.close)
+    if skipped:
+        logger.warning(f"Export: skipped {skipped} unparseable documents.")
+
+
+async def prepend_page(first_page: Optional[Any], pages: AsyncIterator[Any]):
+    # Re-attaches a page that was read ahead (to check the source before the response starts)
+    if first_page is not None:
+        yield first_page
+    async for documents in pages:
+        yield documents
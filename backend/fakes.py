@@ -0,0 +1,368 @@
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+# --- Local Stand-ins for Appwrite and OpenWeatherMap ---
+# Small in-memory servers that speak enough of the Appwrite Databases REST API and the
+# OpenWeatherMap /weather, /forecast and One Call endpoints to run the backend completely offline,
+# plus /hooks/alerts, a webhook receiver for the alert sink:
+#
+#   python -m backend.fakes --port 8765
+#   APPWRITE_ENDPOINT=http://127.0.0.1:8765/v1 OPENWEATHERMAP_BASE_URL=http://127.0.0.1:8765/owm ...
+#
+# Both live on one ASGI app. `FakeState` exposes knobs to inject latency or make Appwrite
+# unavailable (503) so outage handling can be exercised, plus counters for assertions.
+#
+# Tests can skip the socket entirely: `asgi_client()` returns an httpx client bound to the
+# fake app in-process, to pass as `http_client` to AsyncAppwriteService/OpenWeatherMapService.
+
+class FakeState:
+    def __init__(self):
+        self.collections: Dict[str, Dict[str, Dict[str, Any]]] = {}  # collection -> id -> document
+        self.appwrite_latency = 0.0  # Seconds added to every Appwrite call
+        self.owm_latency = 0.0  # Seconds added to every OWM call
+        self.appwrite_down = False  # When True every Appwrite call answers 503
+        self.appwrite_calls = 0
+        self.owm_calls = 0
+        self.owm_rate_limit_retry_after = 0  # When > 0 /weather answers 429 with this Retry-After
+        self.owm_failures = 0  # /weather answers 503 to this many calls before recovering
+        self.forecast_calls = 0  # /forecast and /onecall requests, including 304s
+        self.forecast_not_modified = 0  # Of which answered 304
+        self.forecast_version = 0  # Bump to make the forecast payloads change
+        self.forecast_max_age = 600  # Cache-Control max-age sent with forecasts (0 = no header)
+        self.forecast_html = False  # When True forecasts answer 200 with an HTML page, like a captive proxy
+        self.webhook_deliveries: List[Dict[str, Any]] = []  # Bodies accepted by /hooks/alerts
+        self.webhook_failures = 0  # /hooks/alerts answers 503 to this many calls before recovering
+
+    def reset(self):
+        self.__init__()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+
+# Attributes stored as Appwrite datetimes, which the server normalizes to UTC with milliseconds
+DATETIME_ATTRIBUTES = ("timestamp", "bucket_start")
+
+def _normalize(data: Dict[str, Any]) -> Dict[str, Any]:
+    data = dict(data)
+    for name in DATETIME_ATTRIBUTES:
+        value = data.get(name)
+        if isinstance(value, str) and value:
+            moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            if moment.tzinfo is None:
+                moment = moment.replace(tzinfo=timezone.utc)
+            data[name] = moment.astimezone(timezone.utc).isoformat(timespec="milliseconds")
+    return data
+
+def _error(code: int, message: str, error_type: str) -> JSONResponse:
+    return JSONResponse({"message": message, "code": code, "type": error_type}, status_code=code)
+
+def _apply_queries(documents: List[Dict[str, Any]], queries: List[Dict[str, Any]]):
+    # Evaluates the subset of Appwrite queries used by the backend; returns (total, page)
+    limit, offset, cursor, selected = 25, 0, None, None
+    for query in queries:
+        method, attribute, values = query.get("method"), query.get("attribute"), query.get("values") or []
+        if method == "limit":
+            limit = values[0]
+        elif method == "offset":
+            offset = values[0]
+        elif method == "cursorAfter":
+            cursor = values[0]
+        elif method == "select":
+            selected = values
+        elif method == "orderAsc":
+            documents = sorted(documents, key=lambda d: (d.get(attribute) is None, d.get(attribute)))
+        elif method == "orderDesc":
+            documents = sorted(documents, key=lambda d: (d.get(attribute) is not None, d.get(attribute) or ""), reverse=True)
+        elif method == "equal":
+            documents = [d for d in documents if d.get(attribute) in values]
+        elif method == "isNull":
+            documents = [d for d in documents if d.get(attribute) is None]
+        elif method == "isNotNull":
+            documents = [d for d in documents if d.get(attribute) is not None]
+        elif method in ("greaterThan", "greaterThanEqual", "lessThan", "lessThanEqual", "between"):
+            documents = [d for d in documents if d.get(attribute) is not None and _compare(method, d.get(attribute), values)]
+    total = len(documents)
+    if cursor is not None:
+        ids = [d["$id"] for d in documents]
+        documents = documents[ids.index(cursor) + 1:] if cursor in ids else []
+    page = documents[offset:offset + limit]
+    if selected:
+        page = [{k: v for k, v in d.items() if k in selected or k.startswith("$")} for d in page]
+    return total, page
+
+def _compare(method: str, value: Any, values: List[Any]) -> bool:
+    if method == "greaterThan":
+        return value > values[0]
+    if method == "greaterThanEqual":
+        return value >= values[0]
+    if method == "lessThan":
+        return value < values[0]
+    if method == "lessThanEqual":
+        return value <= values[0]
+    return values[0] <= value <= values[1]
+
+def owm_payload(lat: float, lon: float, units: str = "metric", rng: Optional[random.Random] = None) -> Dict[str, Any]:
+    # Synthetic /weather response with the fields the backend reads
+    rng = rng or random
+    temp = round(rng.uniform(-5, 38), 2) if units == "metric" else round(rng.uniform(23, 100), 2)
+    return {
+        "coord": {"lat": lat, "lon": lon},
+        "weather": [{"id": 800, "main": "Clear", "description": "clear sky", "icon": "01d"}],
+        "main": {"temp": temp, "feels_like": temp, "pressure": rng.randint(990, 1030), "humidity": rng.randint(15, 95)},
+        "visibility": 10000,
+        "wind": {"speed": round(rng.uniform(0, 15), 2), "deg": rng.randint(0, 359), "gust": round(rng.uniform(0, 20), 2)},
+        "dt": int(time.time()),
+        "sys": {"sunrise": 1700000000, "sunset": 1700040000},
+        "name": "Fake Farm",
+    }
+
+# Defective /weather payloads for replay runs (benchmarks/bench_ingest.py). The parser must
+# reject the first three; the others are accepted with defaults or out-of-range values.
+OWM_EDGE_CASES = ("non_numeric", "null_main", "empty", "missing_wind", "extreme")
+
+def edge_case_payload(kind: str, lat: float, lon: float, units: str = "metric",
+                      rng: Optional[random.Random] = None) -> Dict[str, Any]:
+    payload = owm_payload(lat, lon, units, rng)
+    if kind == "non_numeric":
+        payload["main"]["temp"] = "n/a"
+    elif kind == "null_main":
+        payload["main"] = None
+    elif kind == "empty":
+        return {}
+    elif kind == "missing_wind":
+        del payload["wind"]
+    elif kind == "extreme":
+        payload["main"].update(temp=58.0 if units == "metric" else 136.4, pressure=870, humidity=100)
+        payload["wind"].update(speed=70.0, gust=95.0)
+    else:
+        raise ValueError(f"Unknown edge case '{kind}'")
+    return payload
+
+
+def _forecast_point(dt: int, units: str, rng: random.Random, hourly: bool) -> Dict[str, Any]:
+    temp = round(rng.uniform(-5, 38), 2) if units == "metric" else round(rng.uniform(23, 100), 2)
+    weather = [{"id": 500, "main": "Rain", "description": "light rain", "icon": "10d"}] if rng.random() < 0.3 else \
+        [{"id": 800, "main": "Clear", "description": "clear sky", "icon": "01d"}]
+    rain = {"1h" if hourly else "3h": round(rng.uniform(0, 4), 2)} if weather[0]["id"] == 500 else None
+    wind = (round(rng.uniform(0, 15), 2), rng.randint(0, 359), round(rng.uniform(0, 20), 2))
+    if hourly:
+        point = {"dt": dt, "temp": temp, "feels_like": temp, "pressure": rng.randint(990, 1030), "humidity": rng.randint(15, 95),
+                 "wind_speed": wind[0], "wind_deg": wind[1], "wind_gust": wind[2], "pop": round(rng.random(), 2), "weather": weather}
+    else:
+        point = {"dt": dt, "main": {"temp": temp, "feels_like": temp, "pressure": rng.randint(990, 1030), "humidity": rng.randint(15, 95)},
+                 "wind": {"speed": wind[0], "deg": wind[1], "gust": wind[2]}, "pop": round(rng.random(), 2), "weather": weather}
+    if rain:
+        point["rain"] = rain
+    return point
+
+def forecast_payload(lat: float, lon: float, units: str = "metric", version: int = 0) -> Dict[str, Any]:
+    # Synthetic 5 day / 3 hour /forecast response; identical for the same arguments
+    rng = random.Random(f"{lat}:{lon}:{units}:{version}")
+    start = int(time.time()) // 10800 * 10800 + 10800
+    return {
+        "cod": "200", "cnt": 40,
+        "list": [_forecast_point(start + i * 10800, units, rng, hourly=False) for i in range(40)],
+        "city": {"name": "Fake Farm", "coord": {"lat": lat, "lon": lon}},
+    }
+
+def onecall_payload(lat: float, lon: float, units: str = "metric", version: int = 0) -> Dict[str, Any]:
+    # Synthetic One Call 3.0 response (hourly + alerts); identical for the same arguments
+    rng = random.Random(f"onecall:{lat}:{lon}:{units}:{version}")
+    start = int(time.time()) // 3600 * 3600 + 3600
+    return {
+        "lat": lat, "lon": lon,
+        "hourly": [_forecast_point(start + i * 3600, units, rng, hourly=True) for i in range(48)],
+        "alerts": [{"sender_name": "Fake Met Office", "event": "Frost warning", "start": start, "end": start + 43200,
+                    "description": "Ground frost expected overnight.", "tags": ["Frost"]}] if version % 2 else [],
+    }
+
+
+def create_fake_app(state: Optional[FakeState] = None) -> FastAPI:
+    state = state or FakeState()
+    app = FastAPI(title="Fake Appwrite + OpenWeatherMap")
+    app.state.fake = state
+    documents_path = "/v1/databases/{database_id}/collections/{collection_id}/documents"
+
+    async def appwrite_gate() -> Optional[Response]:
+        state.appwrite_calls += 1
+        if state.appwrite_latency:
+            await asyncio.sleep(state.appwrite_latency)
+        if state.appwrite_down:
+            return _error(503, "Service unavailable", "general_server_error")
+        return None
+
+    @app.get(documents_path)
+    async def list_documents(database_id: str, collection_id: str, request: Request):
+        if (blocked := await appwrite_gate()) is not None:
+            return blocked
+        queries = [json.loads(v) for k, v in request.query_params.multi_items() if k.startswith("queries")]
+        total, page = _apply_queries(list(state.collections.get(collection_id, {}).values()), queries)
+        return {"total": total, "documents": page}
+
+    @app.post(documents_path)
+    async def create_document(database_id: str, collection_id: str, request: Request):
+        if (blocked := await appwrite_gate()) is not None:
+            return blocked
+        body = await request.json()
+        document_id = body.get("documentId") or "unique()"
+        if document_id == "unique()":
+            document_id = uuid.uuid4().hex[:20]
+        collection = state.collections.setdefault(collection_id, {})
+        if document_id in collection:
+            return _error(409, "Document with the requested ID already exists.", "document_already_exists")
+        now = _now()
+        document = {
+            **_normalize(body.get("data", {})),
+            "$id": document_id, "$collectionId": collection_id, "$databaseId": database_id,
+            "$createdAt": now, "$updatedAt": now, "$permissions": body.get("permissions") or [],
+        }
+        collection[document_id] = document
+        return JSONResponse(document, status_code=201)
+
+    @app.get(documents_path + "/{document_id}")
+    async def get_document(database_id: str, collection_id: str, document_id: str):
+        if (blocked := await appwrite_gate()) is not None:
+            return blocked
+        document = state.collections.get(collection_id, {}).get(document_id)
+        if document is None:
+            return _error(404, "Document with the requested ID could not be found.", "document_not_found")
+        return document
+
+    @app.patch(documents_path + "/{document_id}")
+    async def update_document(database_id: str, collection_id: str, document_id: str, request: Request):
+        if (blocked := await appwrite_gate()) is not None:
+            return blocked
+        document = state.collections.get(collection_id, {}).get(document_id)
+        if document is None:
+            return _error(404, "Document with the requested ID could not be found.", "document_not_found")
+        body = await request.json()
+        document.update(_normalize(body.get("data") or {}))
+        document["$updatedAt"] = _now()
+        return document
+
+    @app.delete(documents_path + "/{document_id}")
+    async def delete_document(database_id: str, collection_id: str, document_id: str):
+        if (blocked := await appwrite_gate()) is not None:
+            return blocked
+        if state.collections.get(collection_id, {}).pop(document_id, None) is None:
+            return _error(404, "Document with the requested ID could not be found.", "document_not_found")
+        return Response(status_code=204)
+
+    @app.post("/hooks/alerts")
+    async def alert_webhook(request: Request):
+        # Stand-in for an alert receiver (ALERT_SINK=webhook, ALERT_WEBHOOK_URL=.../hooks/alerts)
+        if state.webhook_failures > 0:
+            state.webhook_failures -= 1
+            return _error(503, "Service unavailable", "general_server_error")
+        state.webhook_deliveries.append(await request.json())
+        return Response(status_code=204)
+
+    @app.get("/owm/weather")
+    async def owm_current_weather(lat: float, lon: float, units: str = "metric", appid: str = ""):
+        state.owm_calls += 1
+        if state.owm_latency:
+            await asyncio.sleep(state.owm_latency)
+        if state.owm_failures:
+            state.owm_failures -= 1
+            return JSONResponse({"cod": 503, "message": "Service unavailable"}, status_code=503)
+        if state.owm_rate_limit_retry_after:
+            return JSONResponse({"cod": 429, "message": "Too many requests"}, status_code=429,
+                                headers={"Retry-After": str(state.owm_rate_limit_retry_after)})
+        return owm_payload(lat, lon, units)
+
+    async def conditional_forecast(request: Request, payload: Dict[str, Any]) -> Response:
+        # ETag + Cache-Control like a well-behaved upstream; If-None-Match gets a 304
+        state.forecast_calls += 1
+        if state.owm_latency:
+            await asyncio.sleep(state.owm_latency)
+        if state.forecast_html:
+            return Response(content="<html><body>Gateway maintenance</body></html>", media_type="text/html")
+        body = json.dumps(payload).encode("utf-8")
+        etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+        headers = {"ETag": etag}
+        if state.forecast_max_age:
+            headers["Cache-Control"] = f"max-age={state.forecast_max_age}"
+        if request.headers.get("if-none-match") == etag:
+            state.forecast_not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    @app.get("/owm/forecast")
+    async def owm_forecast(request: Request, lat: float, lon: float, units: str = "metric", appid: str = ""):
+        return await conditional_forecast(request, forecast_payload(lat, lon, units, state.forecast_version))
+
+    @app.get("/owm/onecall")
+    async def owm_onecall(request: Request, lat: float, lon: float, units: str = "metric", appid: str = "", exclude: str = ""):
+        return await conditional_forecast(request, onecall_payload(lat, lon, units, state.forecast_version))
+
+    return app
+
+
+def asgi_client(state: Optional[FakeState] = None) -> httpx.AsyncClient:
+    # In-process client for the fake app (no port, no thread); any host name routes to it
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=create_fake_app(state)))
+
+
+class FakeServer:
+    # Runs the fake app with uvicorn on a background thread (usable from sync or async code)
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, state: Optional[FakeState] = None):
+        self.state = state or FakeState()
+        self.app = create_fake_app(self.state)
+        self.host = host
+        self.port = port
+        self._server = uvicorn.Server(uvicorn.Config(self.app, host=host, port=port, log_level="warning"))
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def appwrite_endpoint(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    @property
+    def owm_base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/owm"
+
+    def start(self) -> "FakeServer":
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run local Appwrite/OpenWeatherMap stand-ins.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--appwrite-latency", type=float, default=0.0, help="Seconds added to each Appwrite call")
+    parser.add_argument("--owm-latency", type=float, default=0.0, help="Seconds added to each OWM call")
+    args = parser.parse_args()
+    fake_state = FakeState()
+    fake_state.appwrite_latency = args.appwrite_latency
+    fake_state.owm_latency = args.owm_latency
+    print(f"Appwrite endpoint: http://{args.host}:{args.port}/v1  OWM base URL: http://{args.host}:{args.port}/owm")
+    uvicorn.run(create_fake_app(fake_state), host=args.host, port=args.port, log_level="warning")
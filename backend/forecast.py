@@ -0,0 +1,144 @@
+import hashlib
+import re
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .models import ForecastResponse
+
+# --- Forecast Store ---
+# Upcoming readings per grid cell (farms in the same cell share one forecast, like they
+# share the current reading). Each cell owns a ForecastSeries with fixed-capacity NumPy
+# columns that every refresh overwrites in place, so steady-state refreshes allocate no
+# new arrays. The API body and its ETag are built once per refresh and served from memory.
+#
+# Upstream freshness is honored: no request is made while the last payload is within its
+# Cache-Control max-age, and the upstream ETag is sent back as If-None-Match so an
+# unchanged forecast costs a 304 instead of a download and a re-parse.
+
+CAPACITY = 64  # 40 points for 5 day / 3 hour, 48 for One Call hourly
+NUMERIC_COLUMNS = ("temperature", "feels_like", "humidity", "pressure", "wind_speed", "wind_gust", "pop", "precipitation")
+_MAX_AGE = re.compile(r"(?:^|,)\s*max-age\s*=\s*(\d+)", re.IGNORECASE)
+
+
+def parse_max_age(cache_control: Optional[str]) -> Optional[int]:
+    # max-age of a Cache-Control header; 0 for no-store/no-cache, None when absent
+    if not cache_control:
+        return None
+    lowered = cache_control.lower()
+    if "no-store" in lowered or "no-cache" in lowered:
+        return 0
+    match = _MAX_AGE.search(cache_control)
+    return int(match.group(1)) if match else None
+
+
+def _number(value: Any) -> float:
+    return float(value) if value is not None else np.nan
+
+def points_from_forecast(payload: Dict[str, Any]) -> List[Tuple]:
+    # 5 day / 3 hour /forecast entries -> (dt, numeric columns..., description, icon)
+    points = []
+    for entry in payload.get("list", []):
+        main, wind = entry.get("main", {}), entry.get("wind", {})
+        weather_info = (entry.get("weather") or [{}])[0]
+        precipitation = (entry.get("rain") or {}).get("3h", 0) + (entry.get("snow") or {}).get("3h", 0)
+        points.append((
+            int(entry["dt"]), _number(main.get("temp")), _number(main.get("feels_like")), _number(main.get("humidity")),
+            _number(main.get("pressure")), _number(wind.get("speed")), _number(wind.get("gust")), _number(entry.get("pop")),
+            float(precipitation), weather_info.get("description", ""), weather_info.get("icon", ""),
+        ))
+    return points
+
+def points_from_onecall(payload: Dict[str, Any]) -> List[Tuple]:
+    # One Call hourly entries -> same tuple layout as points_from_forecast
+    points = []
+    for entry in payload.get("hourly", []):
+        weather_info = (entry.get("weather") or [{}])[0]
+        precipitation = (entry.get("rain") or {}).get("1h", 0) + (entry.get("snow") or {}).get("1h", 0)
+        points.append((
+            int(entry["dt"]), _number(entry.get("temp")), _number(entry.get("feels_like")), _number(entry.get("humidity")),
+            _number(entry.get("pressure")), _number(entry.get("wind_speed")), _number(entry.get("wind_gust")), _number(entry.get("pop")),
+            float(precipitation), weather_info.get("description", ""), weather_info.get("icon", ""),
+        ))
+    return points
+
+def alerts_from_onecall(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "sender": alert.get("sender_name", ""), "event": alert.get("event", ""),
+            "start": datetime.fromtimestamp(alert.get("start", 0), tz=timezone.utc),
+            "end": datetime.fromtimestamp(alert.get("end", 0), tz=timezone.utc),
+            "description": alert.get("description", ""),
+        }
+        for alert in payload.get("alerts", [])
+    ]
+
+
+class ForecastSeries:
+    def __init__(self, lat: float, lon: float, units: str):
+        self.lat = lat
+        self.lon = lon
+        self.units = units
+        self.size = 0
+        self.time = np.zeros(CAPACITY, dtype=np.int64)  # Unix time of each point
+        self.columns = {name: np.full(CAPACITY, np.nan) for name in NUMERIC_COLUMNS}
+        self.descriptions: List[str] = [""] * CAPACITY
+        self.icons: List[str] = [""] * CAPACITY
+        self.alerts: List[Dict[str, Any]] = []
+        self.source: Optional[str] = None  # "forecast" or "onecall"
+        self.upstream_etag: Optional[str] = None
+        self.fetched_at = 0.0  # Unix time of the last 200 or 304
+        self.expires_at = 0.0  # No upstream request before this time
+        self.body = b""  # Pre-serialized ForecastResponse
+        self.etag = ""  # ETag of `body`
+
+    @property
+    def ready(self) -> bool:
+        return self.size > 0
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return self.ready and (now or time.time()) < self.expires_at
+
+    def revalidated(self, max_age: float):
+        # Upstream answered 304: same data, new freshness window
+        self.fetched_at = time.time()
+        self.expires_at = self.fetched_at + max_age
+
+    def overwrite(self, source: str, points: List[Tuple], alerts: List[Dict[str, Any]], upstream_etag: Optional[str], max_age: float):
+        size = min(len(points), CAPACITY)
+        if size:
+            columns = list(zip(*points[:size]))
+            self.time[:size] = columns[0]
+            for index, name in enumerate(NUMERIC_COLUMNS, start=1):
+                self.columns[name][:size] = columns[index]
+            self.descriptions[:size] = columns[-2]
+            self.icons[:size] = columns[-1]
+        self.size = size
+        self.alerts = alerts
+        self.source = source
+        self.upstream_etag = upstream_etag
+        self.revalidated(max_age)
+        self._serialize()
+
+    def points(self) -> List[Dict[str, Any]]:
+        numeric = {name: self.columns[name][:self.size].tolist() for name in NUMERIC_COLUMNS}
+        return [
+            {
+                "time": datetime.fromtimestamp(int(self.time[i]), tz=timezone.utc),
+                **{name: (None if values[i] != values[i] else values[i]) for name, values in numeric.items()},
+                "description": self.descriptions[i], "icon": self.icons[i],
+            }
+            for i in range(self.size)
+        ]
+
+    def _serialize(self):
+        response = ForecastResponse(
+            source=self.source, lat=self.lat, lon=self.lon, units=self.units,
+            fetched_at=datetime.fromtimestamp(self.fetched_at, tz=timezone.utc),
+            points=self.points(), alerts=self.alerts
+        )
+        # fetched_at is left out of the ETag so a 304 from upstream keeps clients' copies valid
+        self.body = response.model_dump_json().encode("utf-8")
+        self.etag = '"' + hashlib.blake2b(response.model_dump_json(exclude={"fetched_at"}).encode("utf-8"), digest_size=12).hexdigest() + '"'
@@ -0,0 +1,186 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .models import WeatherHistoryRecord
+
+# --- History Helpers ---
+# Time handling for range queries and the streaming min/mean/max aggregation behind
+# `/api/weather/history?bucket=...`. Aggregation keeps one small accumulator per bucket,
+# so a month of readings is reduced while it is paged in rather than held in memory.
+# It also holds the slim projection of `/history?fields=...`.
+
+BUCKET_SIZES = {
+    "hourly": timedelta(hours=1),
+    "daily": timedelta(days=1),
+}
+AGGREGATED_METRICS = ("temperature", "humidity", "wind_speed", "pressure")
+# When a reading was observed; history is filtered, ordered and grouped on it. $createdAt is
+# only when Appwrite inserted the document, which for readings buffered during an outage is
+# the replay time. Appwrite needs an index on (farm_id, timestamp).
+TIME_ATTRIBUTE = "timestamp"
+TIERS = ("raw", "hourly", "daily")  # Storage tiers, finest first (see retention.py)
+# Columns `fields=` can select; the Appwrite $-metadata is always left out
+HISTORY_FIELDS = tuple(
+    name for name, field in WeatherHistoryRecord.model_fields.items() if not (field.alias or "").startswith("$")
+)
+
+
+def to_utc(value: datetime) -> datetime:
+    # Naive datetimes are taken to be UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def to_appwrite_datetime(value: datetime) -> str:
+    # Same format Appwrite uses for datetimes, so string comparisons line up
+    return to_utc(value).isoformat(timespec="milliseconds")
+
+def parse_appwrite_datetime(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return to_utc(datetime.fromisoformat(value.replace("Z", "+00:00")))
+    except ValueError:
+        return None
+
+def document_time(document: Dict[str, Any]) -> Optional[datetime]:
+    # Observation time of a weather document; documents stored without one fall back to $createdAt
+    return parse_appwrite_datetime(document.get(TIME_ATTRIBUTE)) or parse_appwrite_datetime(document.get("$createdAt"))
+
+def bucket_start(value: datetime, bucket: str) -> datetime:
+    if bucket == "daily":
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+class _MetricAccumulator:
+    __slots__ = ("min", "max", "total", "count")
+
+    def __init__(self):
+        self.min = None
+        self.max = None
+        self.total = 0.0
+        self.count = 0
+
+    def add(self, value: float):
+        if self.count == 0 or value < self.min:
+            self.min = value
+        if self.count == 0 or value > self.max:
+            self.max = value
+        self.total += value
+        self.count += 1
+
+    def merge(self, low: float, high: float, total: float, count: int):
+        # Folds in an already aggregated group of `count` values
+        if count <= 0:
+            return
+        if self.count == 0 or low < self.min:
+            self.min = low
+        if self.count == 0 or high > self.max:
+            self.max = high
+        self.total += total
+        self.count += count
+
+    def result(self) -> Dict[str, Optional[float]]:
+        if not self.count:
+            return {"min": None, "mean": None, "max": None}
+        return {"min": self.min, "mean": round(self.total / self.count, 3), "max": self.max}
+
+
+class BucketAggregator:
+    # Feed weather documents with add() and rollup documents with add_rollup(); read the
+    # buckets (oldest first) with result(). `total` counts the readings represented,
+    # `scanned` the documents read. With track_ids the $id of every document is kept per bucket.
+    def __init__(self, bucket: str, track_ids: bool = False):
+        if bucket not in BUCKET_SIZES:
+            raise ValueError(f"Unknown bucket '{bucket}'")
+        self.bucket = bucket
+        self.total = 0
+        self.scanned = 0
+        self.ids: Optional[Dict[datetime, List[str]]] = {} if track_ids else None
+        self._buckets: Dict[datetime, Dict[str, Any]] = {}
+
+    def _entry(self, start: datetime, document: Dict[str, Any], tier: str) -> Dict[str, Any]:
+        key = bucket_start(start, self.bucket)
+        entry = self._buckets.get(key)
+        if entry is None:
+            entry = {"count": 0, "tier": tier, **{metric: _MetricAccumulator() for metric in AGGREGATED_METRICS}}
+            self._buckets[key] = entry
+        elif TIERS.index(tier) > TIERS.index(entry["tier"]):
+            entry["tier"] = tier  # A bucket is as coarse as its coarsest source
+        if self.ids is not None:
+            self.ids.setdefault(key, []).append(document["$id"])
+        self.scanned += 1
+        return entry
+
+    def add(self, document: Dict[str, Any]):
+        observed_at = document_time(document)
+        if observed_at is None:
+            return
+        entry = self._entry(observed_at, document, "raw")
+        entry["count"] += 1
+        self.total += 1
+        for metric in AGGREGATED_METRICS:
+            raw = document.get(metric)
+            if raw is None or raw == "":
+                continue
+            try:
+                entry[metric].add(float(raw))
+            except (TypeError, ValueError):
+                continue
+
+    def add_rollup(self, document: Dict[str, Any]):
+        # An hourly or daily rollup document (see retention.rollup_document)
+        start = parse_appwrite_datetime(document.get("bucket_start"))
+        if start is None or document.get("tier") not in TIERS:
+            return
+        entry = self._entry(start, document, document["tier"])
+        count = int(document.get("count") or 0)
+        entry["count"] += count
+        self.total += count
+        for metric in AGGREGATED_METRICS:
+            metric_count = int(document.get(f"{metric}_count") or 0)
+            if metric_count:
+                entry[metric].merge(document[f"{metric}_min"], document[f"{metric}_max"],
+                                    document[f"{metric}_mean"] * metric_count, metric_count)
+
+    def extend(self, documents: Iterable[Dict[str, Any]], tier: str = "raw"):
+        add = self.add if tier == "raw" else self.add_rollup
+        for document in documents:
+            add(document)
+
+    def items(self) -> List[Tuple[datetime, Dict[str, Any]]]:
+        # (bucket start, entry) pairs, oldest first; entries hold one _MetricAccumulator per metric
+        return sorted(self._buckets.items())
+
+    def result(self) -> List[Dict[str, Any]]:
+        return [
+            {"start": start, "count": entry["count"], "tier": entry["tier"],
+             **{metric: entry[metric].result() for metric in AGGREGATED_METRICS}}
+            for start, entry in self.items()
+        ]
+
+
+def parse_fields(value: str) -> List[str]:
+    # Comma-separated `fields=` value -> column names, in request order
+    fields = list(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    unknown = [name for name in fields if name not in HISTORY_FIELDS]
+    if not fields or unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown) or '(none given)'}. Valid fields: {', '.join(HISTORY_FIELDS)}.")
+    return fields
+
+
+def project_documents(documents: Iterable[Dict[str, Any]], fields: List[str]) -> List[Dict[str, Any]]:
+    # The requested columns of each stored document, copied without model validation.
+    # `timestamp` is parsed so it is written the same way as in full records.
+    rows = []
+    for document in documents:
+        row = {name: document.get(name) for name in fields}
+        timestamp = row.get("timestamp")
+        if isinstance(timestamp, str):
+            try:
+                row["timestamp"] = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+            except ValueError:
+                pass
+        rows.append(row)
+    return rows
@@ -0,0 +1,202 @@
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# --- Local Write-Ahead Store ---
+# Embedded SQLite database (WAL mode) that keeps every recent observation next to the
+# process. Each batch is written here before it is sent to Appwrite, and rows stay
+# marked as pending until Appwrite confirms them. That gives us:
+#   * a replay queue: pending rows are re-sent by a background task once Appwrite is back;
+#   * a read fallback: latest/history can be served locally while Appwrite is unavailable.
+# Synced rows are pruned after the retention window; pending rows are never pruned.
+# `created_at` is when a row was stored here (sync and pruning); history reads filter and
+# order on `observed_at`, the reading's own timestamp, like the Appwrite queries do.
+# The `outbox` table holds alert and report messages until their sink accepts them (see alerts.py).
+#
+# All methods are blocking and meant to be called through run_in_threadpool.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS observations (
+    id TEXT PRIMARY KEY,
+    collection_id TEXT NOT NULL,
+    farm_id TEXT,
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    synced INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    observed_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_observations_pending ON observations (synced, created_at);
+CREATE TABLE IF NOT EXISTS outbox (
+    id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (state, next_attempt_at);
+"""
+
+def observed_at(data: Dict[str, Any], default: float) -> float:
+    # Unix time of a document's `timestamp` (naive values are UTC); `default` when it has none
+    value = data.get('timestamp')
+    if not value:
+        return default
+    try:
+        moment = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return default
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+class LocalStore:
+    def __init__(self, path: str):
+        self.path = path
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # One connection shared by the worker threads, serialized by a lock
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")  # Durable across app crashes; fsync only at checkpoints
+            self._conn.executescript(SCHEMA)
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(observations)")]
+            if "observed_at" not in columns:
+                # Store created before observed_at: backfill it from the stored documents
+                self._conn.execute("ALTER TABLE observations ADD COLUMN observed_at REAL")
+                rows = self._conn.execute("SELECT id, data, created_at FROM observations").fetchall()
+                self._conn.executemany(
+                    "UPDATE observations SET observed_at = ? WHERE id = ?",
+                    [(observed_at(json.loads(data), created_at), doc_id) for doc_id, data, created_at in rows]
+                )
+            self._conn.execute("DROP INDEX IF EXISTS idx_observations_farm_created")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_observations_farm_observed ON observations (farm_id, observed_at)")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def append(self, collection_id: str, documents: List[Tuple[str, Dict[str, Any]]]):
+        # Records a batch as pending; re-appending an existing ID is a no-op
+        now = time.time()
+        rows = [
+            (doc_id, collection_id, data.get('farm_id'), json.dumps(data), now, observed_at(data, now)) for doc_id, data in documents
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO observations (id, collection_id, farm_id, data, created_at, observed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.execute("COMMIT")
+
+    def mark_synced(self, document_ids: List[str]):
+        if not document_ids:
+            return
+        with self._lock:
+            self._conn.executemany("UPDATE observations SET synced = 1 WHERE id = ?", [(i,) for i in document_ids])
+
+    def mark_failed(self, document_ids: List[str]):
+        if not document_ids:
+            return
+        with self._lock:
+            self._conn.executemany("UPDATE observations SET attempts = attempts + 1 WHERE id = ?", [(i,) for i in document_ids])
+
+    def pending(self, older_than_seconds: float, limit: int) -> List[Tuple[str, str, Dict[str, Any]]]:
+        # Unsynced rows old enough that no in-flight flush is still handling them
+        cutoff = time.time() - older_than_seconds
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, collection_id, data FROM observations WHERE synced = 0 AND created_at <= ? ORDER BY created_at LIMIT ?",
+                (cutoff, limit)
+            ).fetchall()
+        return [(doc_id, collection_id, json.loads(data)) for doc_id, collection_id, data in rows]
+
+    def prune(self, retention_seconds: float) -> int:
+        cutoff = time.time() - retention_seconds
+        with self._lock:
+            return self._conn.execute("DELETE FROM observations WHERE synced = 1 AND created_at < ?", (cutoff,)).rowcount
+
+    def history(self, collection_id: str, farm_id: Optional[str], limit: int, offset: int = 0,
+                start: Optional[float] = None, end: Optional[float] = None, cursor: Optional[str] = None) -> Dict[str, Any]:
+        # Newest-first page (by observation time) in the same shape as AsyncAppwriteService.list_documents.
+        # `start`/`end` are Unix times; `cursor` is the last ID of the previous page.
+        where = "collection_id = ? AND farm_id IS ?"
+        params: List[Any] = [collection_id, farm_id]
+        if start is not None:
+            where += " AND observed_at >= ?"
+            params.append(start)
+        if end is not None:
+            where += " AND observed_at < ?"
+            params.append(end)
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM observations WHERE {where}", params).fetchone()[0]
+            if cursor:
+                row = self._conn.execute("SELECT observed_at FROM observations WHERE id = ?", (cursor,)).fetchone()
+                if row is None:
+                    return {'total': total, 'documents': []}
+                where += " AND (observed_at < ? OR (observed_at = ? AND id < ?))"
+                params.extend([row[0], row[0], cursor])
+                offset = 0
+            rows = self._conn.execute(
+                f"SELECT id, data, created_at FROM observations WHERE {where} ORDER BY observed_at DESC, id DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return {'total': total, 'documents': [self._to_document(collection_id, *row) for row in rows]}
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            pending, synced = self._conn.execute(
+                "SELECT COALESCE(SUM(synced = 0), 0), COALESCE(SUM(synced = 1), 0) FROM observations"
+            ).fetchone()
+        return {"pending": pending, "synced": synced}
+
+    def outbox_add(self, message_id: str, payload: Dict[str, Any]) -> bool:
+        # False when the message is already known (delivered or not), so repeats are dropped
+        now = time.time()
+        with self._lock:
+            return self._conn.execute(
+                "INSERT OR IGNORE INTO outbox (id, payload, created_at, next_attempt_at) VALUES (?, ?, ?, ?)",
+                (message_id, json.dumps(payload, default=str), now, now)
+            ).rowcount == 1
+
+    def outbox_due(self, limit: int) -> List[Tuple[str, Dict[str, Any], int]]:
+        # (id, payload, attempts) of pending messages whose next attempt is due, oldest first
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, payload, attempts FROM outbox WHERE state = 'pending' AND next_attempt_at <= ? "
+                "ORDER BY created_at LIMIT ?", (time.time(), limit)
+            ).fetchall()
+        return [(message_id, json.loads(payload), attempts) for message_id, payload, attempts in rows]
+
+    def outbox_settle(self, message_id: str, state: str, next_attempt_at: float = 0.0, error: Optional[str] = None):
+        # state: 'delivered', 'pending' (retry at next_attempt_at) or 'failed' (attempts exhausted)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET state = ?, attempts = attempts + 1, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (state, next_attempt_at, error, message_id)
+            )
+
+    def outbox_prune(self, retention_seconds: float) -> int:
+        # Delivered and failed messages are kept for a while so late repeats are still recognized
+        cutoff = time.time() - retention_seconds
+        with self._lock:
+            return self._conn.execute("DELETE FROM outbox WHERE state != 'pending' AND created_at < ?", (cutoff,)).rowcount
+
+    def outbox_counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM outbox GROUP BY state").fetchall()
+        return {"pending": 0, "delivered": 0, "failed": 0, **dict(rows)}
+
+    @staticmethod
+    def _to_document(collection_id: str, doc_id: str, data: str, created_at: float) -> Dict[str, Any]:
+        created = datetime.fromtimestamp(created_at, tz=timezone.utc).isoformat(timespec="milliseconds")
+        return {**json.loads(data), '$id': doc_id, '$collectionId': collection_id, '$createdAt': created, '$updatedAt': created}
@@ -1,68 +1,173 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Response
 from fastapi.middleware.cors import CORSMiddleware
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+import asyncio
+import logging
+import time
 
 from .config import settings
-from .routers import settings_router, weather_router
-from .services import WeatherService, AppwriteService, OpenWeatherMapService, FarmSettingsService  # For scheduler
+from .routers import settings_router, weather_router, farms_router, admin_router, health_router
+from .container import ServiceContainer
+from .responses import CompressionMiddleware
+from .observability import (
+    SCHEDULER_RUN_SECONDS, RequestContextMiddleware, configure_logging, metrics_payload, new_request_id,
+    request_id_var, timer
+)
+
+configure_logging(settings.LOG_LEVEL, settings.LOG_FORMAT)
+logger = logging.getLogger(__name__)
 
 # --- Scheduler and Application Lifespan Management ---
 scheduler = AsyncIOScheduler()
 
-async def scheduled_update_weather():
-    # This function runs the scheduled weather update task
-    print("Scheduler: Running scheduled_update_weather...")
-    
-    # Create instances of services needed for the task
-    # This is a simplified approach; for more complex Dependency Injection (DI), consider exploring alternatives
-    appwrite_service = AppwriteService()
-    owm_service = OpenWeatherMapService()
-    
-    # FarmSettingsService needs the AppwriteService for fetching farm settings
-    # We assume the FarmSettingsService is instantiated here, but in a larger application,
-    # DI handling could be more complex.
-    farm_settings_serv = FarmSettingsService(appwrite_service=appwrite_service)
-
-    # Initialize WeatherService with the required dependencies
-    weather_service = WeatherService(
-        appwrite_service=appwrite_service,
-        owm_service=owm_service,
-        settings_service=farm_settings_serv  # Pass the instantiated FarmSettingsService
+async def scheduled_update_weather(services: ServiceContainer):
+    # Runs every SCHEDULER_TICK_SECONDS and refreshes the grid cells the planner reports as due
+
+    # The scheduler reuses the app-lifetime services (shared HTTP pool and Appwrite client)
+    weather_service = services.weather
+    planner = services.planner
+    token = request_id_var.set(new_request_id("tick-"))  # Log lines of one tick share an ID
+
+    with timer(SCHEDULER_RUN_SECONDS, job="update_weather") as run:
+        try:
+            # Pick up farms created or edited outside this process
+            if time.time() - planner.synced_at >= settings.SCHEDULER_SYNC_SECONDS:
+                planner.sync(await weather_service.settings_service.list_farms())
+            planner.rate_limited(services.owm.rate_limited_until)
+            due = planner.due()
+            if not due:
+                return
+            logger.info(f"Scheduler: Refreshing {len(due)} due grid cells...")
+
+            # A batch may use most of the shortest due interval, but never run into that cell's next refresh
+            deadline_seconds = min(plan.interval for plan in due) * settings.SCHEDULER_TICK_BUDGET_FRACTION
+            result = await weather_service.update_cells(
+                {plan.cell: planner.members(plan) for plan in due}, deadline_seconds=deadline_seconds,
+                on_cell_fetched=lambda cell, raw_weather: planner.record(cell, raw_weather, weather_service.rule_table)
+            )
+            planner.rate_limited(services.owm.rate_limited_until)
+            logger.info(
+                f"Scheduler: Updated {result['updated']}/{result['farms']} farms "
+                f"({result['cells']} OWM calls, {result['failed']} failed, {result['timed_out']} timed out); "
+                f"forecasts: {result['forecasts_updated']} updated, {result['forecasts_unchanged']} unchanged."
+            )
+        except Exception as e:
+            # Log errors in case of failure
+            run.outcome = "error"
+            logger.exception(f"Scheduler: Error during scheduled weather update: {e}")
+        finally:
+            request_id_var.reset(token)
+
+async def scheduled_reload_recommendations(services: ServiceContainer):
+    # Picks up edits to the recommendations collection without a restart
+    token = request_id_var.set(new_request_id("reload-"))
+    with timer(SCHEDULER_RUN_SECONDS, job="reload_recommendations") as run:
+        try:
+            await services.weather.load_recommendations()
+        except Exception as e:
+            run.outcome = "error"
+            logger.exception(f"Scheduler: Error reloading recommendations: {e}")
+        finally:
+            request_id_var.reset(token)
+
+async def scheduled_compact_history(services: ServiceContainer):
+    # Rolls old readings into hourly/daily rollups and prunes them (see retention.py)
+    token = request_id_var.set(new_request_id("compact-"))
+    with timer(SCHEDULER_RUN_SECONDS, job="compact_history") as run:
+        try:
+            farm_ids = [farm_id for farm_id, _ in await services.weather.settings_service.list_farms()]
+            result = await services.compactor.run(farm_ids)
+            logger.info(f"Retention: compacted {result['raw']} readings and {result['hourly']} hourly rollups of {len(farm_ids)} farms.")
+        except Exception as e:
+            run.outcome = "error"
+            logger.exception(f"Scheduler: Error compacting history: {e}")
+        finally:
+            request_id_var.reset(token)
+
+async def scheduled_daily_report(services: ServiceContainer):
+    # Sends the summaries of the days completed since the last run (see alerts.py)
+    token = request_id_var.set(new_request_id("report-"))
+    with timer(SCHEDULER_RUN_SECONDS, job="daily_report") as run:
+        try:
+            sent = services.alerts.send_reports(datetime.now(timezone.utc).date())
+            logger.info(f"Reports: queued {sent} daily reports.")
+        except Exception as e:
+            run.outcome = "error"
+            logger.exception(f"Scheduler: Error sending daily reports: {e}")
+        finally:
+            request_id_var.reset(token)
+
+def start_leader_jobs(services: ServiceContainer):
+    # Tick frequently; each farm's own (adaptive) update frequency is applied by the planner.
+    # The first tick runs right away.
+    scheduler.add_job(
+        scheduled_update_weather, 'interval', seconds=settings.SCHEDULER_TICK_SECONDS,
+        args=[services], id="update_weather_job", replace_existing=True, next_run_time=datetime.now(),
+        max_instances=1, coalesce=True  # Never overlap batches; skip missed ticks instead of stacking them
     )
-    
-    try:
-        # Perform the weather update
-        result = await weather_service.update_weather_data()
-        if result:
-            print(f"Scheduler: Weather data updated successfully at {result['weather'].timestamp}")
-        else:
-            print("Scheduler: Failed to update weather data.")
-    except Exception as e:
-        # Log errors in case of failure
-        print(f"Scheduler: Error during scheduled weather update: {e}")
+    logger.info(f"Weather updates scheduled (tick every {settings.SCHEDULER_TICK_SECONDS}s).")
+    if services.compactor is not None:
+        scheduler.add_job(
+            scheduled_compact_history, 'interval', seconds=settings.RETENTION_INTERVAL_SECONDS,
+            args=[services], id="compact_history_job", replace_existing=True, max_instances=1, coalesce=True
+        )
+        logger.info(f"History compaction scheduled (every {settings.RETENTION_INTERVAL_SECONDS}s).")
+    if services.alerts is not None:
+        scheduler.add_job(
+            scheduled_daily_report, 'cron', hour=settings.DAILY_REPORT_HOUR_UTC, timezone=timezone.utc,
+            args=[services], id="daily_report_job", replace_existing=True, max_instances=1, coalesce=True
+        )
+
+def stop_leader_jobs():
+    for job_id in ("update_weather_job", "compact_history_job", "daily_report_job"):
+        if scheduler.get_job(job_id) is not None:
+            scheduler.remove_job(job_id)
+    logger.info("Weather updates handed over to another worker.")
+
+async def warm_up(services: ServiceContainer):
+    # Runs in the background so the app accepts traffic immediately; requests that arrive
+    # before the first snapshot fall back to Appwrite or an on-demand fetch.
+    # Load the recommendation rules before the first readings are annotated
+    await scheduled_reload_recommendations(services)
+    if services.coordinator is None:
+        start_leader_jobs(services)
+    else:
+        # Only the worker holding the scheduler lease refreshes; the others serve its snapshots
+        services.coordinator.on_elected.append(lambda: start_leader_jobs(services))
+        services.coordinator.on_demoted.append(stop_leader_jobs)
+        services.coordinator.start()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Application startup procedure
-    print("Application startup...")
-    
-    # Fetch initial weather data
-    print("Fetching initial weather data...")
-    await scheduled_update_weather()  # Direct call to update weather initially
-
-    # Schedule regular weather updates based on the configured interval
-    # The update frequency is fetched from settings or defaults to the value in the config
-    update_interval_minutes = settings.DEFAULT_UPDATE_FREQUENCY
-    scheduler.add_job(scheduled_update_weather, 'interval', minutes=update_interval_minutes, id="update_weather_job")
-    scheduler.start()
-    print(f"Weather updates scheduled every {update_interval_minutes} minutes.")
-    
-    yield  # Application runtime
+    logger.info("Application startup...")
+
+    # Build the service container once and expose it to the routers via app.state
+    services = ServiceContainer()
+    services.start()
+    app.state.services = services
     
-    # Application shutdown procedure
-    print("Application shutdown...")
-    scheduler.shutdown()
+    try:
+        # Every worker keeps its own copy of the rules
+        scheduler.add_job(
+            scheduled_reload_recommendations, 'interval', seconds=settings.RECOMMENDATIONS_REFRESH_SECONDS,
+            args=[services], id="reload_recommendations_job", replace_existing=True,
+            max_instances=1, coalesce=True
+        )
+        scheduler.start()
+        services.warmup_task = asyncio.create_task(warm_up(services))
+        
+        yield  # Application runtime
+    finally:
+        # Application shutdown procedure
+        logger.info("Application shutdown...")
+        if services.warmup_task is not None:
+            services.warmup_task.cancel()
+        if scheduler.running:
+            scheduler.shutdown()
+        await services.aclose()
 
 # --- FastAPI App Initialization ---
 app = FastAPI(
@@ -72,6 +177,14 @@ app = FastAPI(
     lifespan=lifespan  # Lifespan management using the async context manager
 )
 
+# Brotli/gzip for complete JSON and CSV bodies (see responses.py); inside the request
+# context, so the measured latency includes compression
+if settings.RESPONSE_COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.RESPONSE_COMPRESSION_MIN_BYTES)
+
+# Request IDs and per-route latency (see observability.py)
+app.add_middleware(RequestContextMiddleware)
+
 # CORS Configuration
 app.add_middleware(
     CORSMiddleware,
@@ -81,14 +194,25 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
-# Include routers for settings and weather endpoints
+# Include routers for settings, weather, farm-scoped, admin and health endpoints
 app.include_router(settings_router)
 app.include_router(weather_router)
+app.include_router(farms_router)
+app.include_router(admin_router)
+app.include_router(health_router)
+
+# Prometheus scrape endpoint
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        body, content_type = metrics_payload()
+        return Response(content=body, media_type=content_type)
 
 # Root endpoint for basic app information
 @app.get("/", tags=["Root"])
 async def read_root():
     return {"message": "Welcome to the Farm Weather API!"}
 
-# To run the app: uvicorn backend.main:app --reload --port 8000
+# To run the app: uvicorn backend.main:app --reload --port 8000 --timeout-graceful-shutdown 5
+# (the timeout lets shutdown proceed while /api/weather/stream clients are connected)
 # (Assuming your files are in a directory named 'backend')
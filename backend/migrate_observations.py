@@ -0,0 +1,79 @@
+import argparse
+from typing import Any, Dict, List
+
+from appwrite.query import Query as AppwriteQuery
+
+from .config import settings
+from .observation import Observation
+from .services import AppwriteService
+
+# --- Observation Document Migration ---
+# Rewrites stored weather documents into the canonical string form produced by
+# `Observation.to_document()`: numbers formatted consistently ("11" rather than "11.0")
+# and compact JSON for location/sun. After the migration every document round-trips
+# through the typed record unchanged.
+#
+# Dry run by default; pass --apply to write. Documents that cannot be parsed are reported
+# and left untouched.
+#
+#   python -m backend.migrate_observations            # report only
+#   python -m backend.migrate_observations --apply    # rewrite non-canonical documents
+
+LEGACY_FIELDS = (
+    'temperature', 'humidity', 'wind_speed', 'description', 'icon', 'feels_like',
+    'wind_gust', 'wind_direction', 'pressure', 'visibility', 'location', 'sun',
+)
+
+def canonical_changes(doc: Dict[str, Any]) -> Dict[str, Any]:
+    # Fields of `doc` whose stored value differs from the canonical form
+    canonical = Observation.from_document(doc).to_document()
+    return {
+        field: canonical.get(field)
+        for field in LEGACY_FIELDS
+        if field in canonical and doc.get(field) != canonical[field]
+    }
+
+def migrate(appwrite: AppwriteService, collection_id: str, apply: bool, page_size: int = 100) -> Dict[str, Any]:
+    stats: Dict[str, Any] = {"scanned": 0, "canonical": 0, "rewritten": 0, "failed": 0, "unparseable": []}
+    cursor = None
+    while True:
+        queries: List[str] = [AppwriteQuery.order_asc("$createdAt"), AppwriteQuery.limit(page_size)]
+        if cursor:
+            queries.append(AppwriteQuery.cursor_after(cursor))
+        page = appwrite.list_documents(collection_id, queries)
+        documents = page.get('documents', [])
+        if not appwrite.healthy:
+            raise RuntimeError(f"Appwrite unavailable: {appwrite.last_error}")
+        for doc in documents:
+            stats["scanned"] += 1
+            try:
+                changes = canonical_changes(doc)
+            except (ValueError, TypeError, AttributeError) as e:
+                stats["unparseable"].append({"id": doc.get('$id'), "error": str(e)})
+                continue
+            if not changes:
+                stats["canonical"] += 1
+                continue
+            if apply:
+                if appwrite.update_document(collection_id, doc['$id'], changes):
+                    stats["rewritten"] += 1
+                else:
+                    stats["failed"] += 1
+            else:
+                stats["rewritten"] += 1  # Would be rewritten
+        if len(documents) < page_size:
+            return stats
+        cursor = documents[-1]['$id']
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Normalize stored weather documents to the canonical observation form.")
+    parser.add_argument("--apply", action="store_true", help="Write the changes (default is a dry run)")
+    parser.add_argument("--collection", default=settings.APPWRITE_COLLECTION_ID, help="Weather collection ID")
+    args = parser.parse_args()
+    result = migrate(AppwriteService(), args.collection, apply=args.apply)
+    verb = "Rewrote" if args.apply else "Would rewrite"
+    print(f"Scanned {result['scanned']} documents: {result['canonical']} already canonical, "
+          f"{verb} {result['rewritten']}, {result['failed']} failed, {len(result['unparseable'])} unparseable.")
+    for entry in result["unparseable"]:
+        print(f"  {entry['id']}: {entry['error']}")
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, validator, HttpUrl
 from typing import Optional, List, Dict, Any
-from datetime import datetime
+from datetime import date, datetime
 
 from .config import settings  # Import the settings object for default configuration values
 
@@ -63,6 +63,7 @@ class WeatherData(BaseModel):
     location: str  # Location name as a string (could be a WeatherLocation object)
     sun: str  # Sun data (could be a SunData object)
     timestamp: Optional[datetime] = None  # Timestamp of when the data was recorded (Appwrite will handle $createdAt and $updatedAt)
+    farm_id: Optional[str] = None  # Farm the reading belongs to (unset for the default farm)
 
     # Optional fields for Appwrite-specific document mapping
     id: Optional[str] = Field(alias="$id", default=None)  # Appwrite document ID
@@ -83,9 +84,95 @@ class WeatherResponse(BaseModel):
 
 class WeatherHistoryRecord(WeatherData):
     # Inherits all fields from WeatherData, extending them if necessary
-    pass
+    recommendations: Optional[List[str]] = None  # Only filled when requested with `recommendations=true`
 
 class WeatherHistoryResponse(BaseModel):
     # Response model for a collection of weather history records
     total: int  # Total number of records
     documents: List[WeatherHistoryRecord]  # List of weather history records
+    next_cursor: Optional[str] = None  # Pass as `cursor` to fetch the next page (None on the last page)
+
+class MetricAggregate(BaseModel):
+    # Summary of one metric over a time bucket (None when the bucket has no readings for it)
+    min: Optional[float] = None
+    mean: Optional[float] = None
+    max: Optional[float] = None
+
+class WeatherHistoryBucket(BaseModel):
+    # Aggregated readings for one hourly or daily bucket
+    start: datetime  # Start of the bucket (UTC)
+    count: int  # Number of readings in the bucket
+    tier: str = "raw"  # Source: "raw" readings, or "hourly"/"daily" rollups of compacted history
+    temperature: MetricAggregate
+    humidity: MetricAggregate
+    wind_speed: MetricAggregate
+    pressure: MetricAggregate
+
+class WeatherHistoryAggregateResponse(BaseModel):
+    # Response model for downsampled history (`bucket=hourly|daily`)
+    bucket: str  # Bucket size used
+    start: datetime  # Start of the requested range (UTC)
+    end: datetime  # End of the requested range (UTC)
+    total: int  # Number of raw readings aggregated (rollups count the readings they summarize)
+    truncated: bool = False  # True when the scan stopped at HISTORY_MAX_SCAN_DOCUMENTS documents
+    buckets: List[WeatherHistoryBucket]
+
+class AgronomyDay(BaseModel):
+    # Daily agronomic metrics; temperatures and degree days in the farm's units
+    date: date  # UTC day
+    readings: int  # Readings the day is based on
+    temperature_min: float
+    temperature_max: float
+    temperature_mean: float
+    humidity_mean: float  # %
+    dew_point: Optional[float] = None
+    vpd: Optional[float] = None  # Vapour pressure deficit (kPa)
+    et0: Optional[float] = None  # FAO-56 reference evapotranspiration (mm/day)
+    gdd: float  # Growing degree days of the day
+    gdd_cumulative: float  # Growing degree days since the start of the range
+    temperature_rolling_min: Optional[float] = None  # Lowest minimum over the trailing window
+    temperature_rolling_max: Optional[float] = None  # Highest maximum over the trailing window
+
+class AgronomyResponse(BaseModel):
+    # Response model for `/api/weather/agronomy`
+    farm_id: str
+    units: str
+    start: datetime
+    end: datetime
+    gdd_base: float  # Base temperature used for degree days (farm units)
+    gdd_cap: float  # Upper cut-off used for degree days (farm units)
+    rolling_days: int
+    days: List[AgronomyDay]
+
+class ForecastPoint(BaseModel):
+    # One upcoming reading (3-hourly from /forecast, hourly from One Call), in the farm's units
+    time: datetime
+    temperature: Optional[float] = None
+    feels_like: Optional[float] = None
+    humidity: Optional[float] = None
+    pressure: Optional[float] = None
+    wind_speed: Optional[float] = None
+    wind_gust: Optional[float] = None
+    pop: Optional[float] = None  # Probability of precipitation (0-1)
+    precipitation: Optional[float] = None  # Rain + snow over the step (mm)
+    description: str = ""
+    icon: str = ""
+
+class ForecastAlert(BaseModel):
+    # Government weather alert (One Call only)
+    sender: str
+    event: str
+    start: datetime
+    end: datetime
+    description: str
+
+class ForecastResponse(BaseModel):
+    # Response model for `/api/weather/forecast`
+    source: str  # "forecast" (5 day / 3 hour) or "onecall"
+    lat: float  # Grid cell the forecast was fetched for
+    lon: float
+    units: str
+    fetched_at: datetime  # Last time the upstream confirmed this data
+    points: List[ForecastPoint]
+    alerts: List[ForecastAlert] = []
+
@@ -0,0 +1,206 @@
+import functools
+import inspect
+import json
+import logging
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Callable, Dict
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+from .config import settings
+
+# --- Observability ---
+# Structured logs and Prometheus metrics for the API and its background jobs.
+#
+# Logs: every module logs through `logging.getLogger(__name__)`. Each record carries the
+# ID of the request (X-Request-ID, generated when absent) or scheduler run it belongs to,
+# so the lines of one slow /current can be pulled out of a busy log. LOG_FORMAT=json
+# writes one JSON object per line.
+#
+# Metrics (GET /metrics): latency histograms per route, per upstream call (each OWM and
+# Appwrite operation), per scheduler run and per step of request handling (settings
+# lookup, recommendations, validation), plus cache hit/miss counters. With
+# METRICS_ENABLED=false the timers below are no-ops and `timed` returns the function
+# unchanged, so the hot paths pay nothing.
+
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "farm_weather_http_request_seconds", "Time to handle an API request",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+UPSTREAM_SECONDS = Histogram(
+    "farm_weather_upstream_seconds", "Duration of an OpenWeatherMap or Appwrite call, retries included",
+    ["upstream", "operation", "outcome"], buckets=LATENCY_BUCKETS
+)
+SCHEDULER_RUN_SECONDS = Histogram(
+    "farm_weather_scheduler_run_seconds", "Duration of a scheduler job run",
+    ["job", "outcome"], buckets=LATENCY_BUCKETS
+)
+STAGE_SECONDS = Histogram(
+    "farm_weather_stage_seconds", "Time spent in one step of handling a request",
+    ["stage"], buckets=LATENCY_BUCKETS
+)
+CACHE_LOOKUPS = Counter(
+    "farm_weather_cache_lookups_total", "In-memory cache lookups",
+    ["cache", "result"]
+)
+
+# Histograms whose `outcome` label is filled in by the timer ("ok", or "error" when the block raised)
+_OUTCOME_HISTOGRAMS = (UPSTREAM_SECONDS, SCHEDULER_RUN_SECONDS)
+
+
+# Timing
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "outcome", "start")
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+        self.outcome = "ok"  # Callers that swallow their errors set "error" themselves
+        self.start = 0.0
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        elapsed = time.perf_counter() - self.start
+        labels = self.labels
+        if self.histogram in _OUTCOME_HISTOGRAMS:
+            labels = {**labels, "outcome": "error" if exc_type is not None else self.outcome}
+        self.histogram.labels(**labels).observe(elapsed)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ("outcome",)
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(histogram: Histogram, **labels: str):
+    # `with timer(STAGE_SECONDS, stage="validation"): ...`
+    if not settings.METRICS_ENABLED:
+        return _NULL_TIMER
+    return _Timer(histogram, labels)
+
+
+def timed(histogram: Histogram, **labels: str) -> Callable:
+    # Decorator form of `timer` for sync functions and coroutine functions
+    def decorate(fn: Callable) -> Callable:
+        if not settings.METRICS_ENABLED:
+            return fn
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with _Timer(histogram, labels):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Timer(histogram, labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def record_cache(cache: str, result: str):
+    # result: "hit", "stale" (served while revalidating) or "miss"
+    if settings.METRICS_ENABLED:
+        CACHE_LOOKUPS.labels(cache, result).inc()
+
+
+def metrics_payload():
+    # (body, content type) of the Prometheus text exposition
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+# Logging
+
+def new_request_id(prefix: str = "") -> str:
+    return prefix + uuid.uuid4().hex[:16]
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"), "level": record.levelname, "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"), "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def configure_logging(level: str = "INFO", log_format: str = "text"):
+    # Configures the `backend` logger tree only; uvicorn keeps its own access/error logs
+    handler = logging.StreamHandler()
+    handler.addFilter(RequestIdFilter())
+    if log_format == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+    root = logging.getLogger("backend")
+    root.handlers[:] = [handler]
+    root.setLevel(level.upper())
+    root.propagate = False
+
+
+# Requests
+
+class RequestContextMiddleware:
+    # Pure ASGI middleware (streaming responses pass through untouched): assigns the request
+    # ID, echoes it as X-Request-ID and observes the request duration per route template.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or new_request_id()
+        token = request_id_var.set(request_id)
+        status = 500
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            if settings.METRICS_ENABLED:
+                # The route template keeps the label set bounded (no farm IDs in it)
+                route = scope.get("route")
+                path = getattr(route, "path", None) or "unmatched"
+                HTTP_REQUEST_SECONDS.labels(scope["method"], path, str(status)).observe(time.perf_counter() - start)
+            request_id_var.reset(token)
@@ -0,0 +1,154 @@
+import json
+from datetime import datetime
+from json.encoder import encode_basestring
+from typing import Any, Dict, NamedTuple, Optional
+
+from .models import WeatherData
+
+# --- Typed Observation Record ---
+# Internal representation of one weather reading: plain numbers and a structured
+# location/sun, stored in an immutable NamedTuple (tuple-backed, no per-instance dict).
+# The string-typed `WeatherData` schema is only produced at the boundaries:
+#   * to_document()     -> the legacy Appwrite document (strings + JSON-encoded location/sun)
+#   * to_weather_data() -> the API model
+# Parsing happens once, in from_owm() (upstream payload) or from_document() (stored data).
+
+def format_number(value: Optional[float]) -> Optional[str]:
+    # Legacy string form: integral values without a trailing ".0" (as OWM sends them)
+    if value is None:
+        return None
+    value = float(value)
+    if value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+def _to_float(value: Any, default: Optional[float] = 0.0) -> Optional[float]:
+    if value is None or value == "":
+        return default
+    return float(value)
+
+def _to_int(value: Any) -> Optional[int]:
+    if value is None or value == "":
+        return None
+    return int(float(value))
+
+def _location_json(lat: float, lon: float, name: str) -> str:
+    # Same bytes as WeatherLocation.model_dump_json(), without building the model
+    return f'{{"lat":"{lat}","lon":"{lon}","name":{encode_basestring(name)}}}'
+
+def _sun_json(sunrise: Optional[int], sunset: Optional[int]) -> str:
+    # Same bytes as SunData.model_dump_json()
+    return f'{{"sunrise":"{"" if sunrise is None else sunrise}","sunset":"{"" if sunset is None else sunset}"}}'
+
+
+class Observation(NamedTuple):
+    timestamp: datetime
+    lat: float
+    lon: float
+    location_name: str
+    temperature: float
+    feels_like: float
+    humidity: float
+    pressure: float
+    wind_speed: float
+    visibility: float
+    description: str
+    icon: str
+    wind_gust: Optional[float] = None
+    wind_direction: Optional[float] = None
+    sunrise: Optional[int] = None  # Unix time
+    sunset: Optional[int] = None  # Unix time
+    farm_id: Optional[str] = None
+    id: Optional[str] = None  # Appwrite document ID, once assigned
+
+    @classmethod
+    def from_owm(cls, raw: Dict[str, Any], lat: float, lon: float, farm_id: Optional[str] = None,
+                 timestamp: Optional[datetime] = None) -> "Observation":
+        # Parses an OpenWeatherMap /weather payload; raises ValueError/TypeError/AttributeError when malformed
+        main = raw.get('main', {})
+        wind = raw.get('wind', {})
+        weather_info = (raw.get('weather') or [{}])[0]
+        sys_info = raw.get('sys', {})
+        # Positional _make() skips the keyword-argument __new__ (fields in declaration order)
+        return cls._make((
+            timestamp or datetime.utcnow(),
+            float(lat),
+            float(lon),
+            raw.get('name', 'Unknown'),
+            _to_float(main.get('temp')),
+            _to_float(main.get('feels_like')),
+            _to_float(main.get('humidity')),
+            _to_float(main.get('pressure')),
+            _to_float(wind.get('speed')),
+            _to_float(raw.get('visibility')),
+            weather_info.get('description', ''),
+            weather_info.get('icon', ''),
+            _to_float(wind.get('gust'), None),
+            _to_float(wind.get('deg'), None),
+            _to_int(sys_info.get('sunrise')),
+            _to_int(sys_info.get('sunset')),
+            farm_id,
+            None,
+        ))
+
+    @classmethod
+    def from_document(cls, doc: Dict[str, Any]) -> "Observation":
+        # Parses a stored (legacy string schema) weather document
+        location = json.loads(doc.get('location') or '{}')
+        sun = json.loads(doc.get('sun') or '{}')
+        timestamp = doc.get('timestamp') or doc.get('$createdAt')
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+        return cls._make((
+            timestamp,
+            _to_float(location.get('lat')),
+            _to_float(location.get('lon')),
+            location.get('name', 'Unknown'),
+            _to_float(doc.get('temperature')),
+            _to_float(doc.get('feels_like')),
+            _to_float(doc.get('humidity')),
+            _to_float(doc.get('pressure')),
+            _to_float(doc.get('wind_speed')),
+            _to_float(doc.get('visibility')),
+            doc.get('description', ''),
+            doc.get('icon', ''),
+            _to_float(doc.get('wind_gust'), None),
+            _to_float(doc.get('wind_direction'), None),
+            _to_int(sun.get('sunrise')),
+            _to_int(sun.get('sunset')),
+            doc.get('farm_id'),
+            doc.get('$id'),
+        ))
+
+    def _legacy_fields(self) -> Dict[str, Any]:
+        return {
+            'temperature': format_number(self.temperature),
+            'humidity': format_number(self.humidity),
+            'wind_speed': format_number(self.wind_speed),
+            'description': self.description,
+            'icon': self.icon,
+            'feels_like': format_number(self.feels_like),
+            'wind_gust': format_number(self.wind_gust),
+            'wind_direction': format_number(self.wind_direction),
+            'pressure': format_number(self.pressure),
+            'visibility': format_number(self.visibility),
+            'location': _location_json(self.lat, self.lon, self.location_name),
+            'sun': _sun_json(self.sunrise, self.sunset),
+        }
+
+    def to_document(self) -> Dict[str, Any]:
+        # Storage boundary: legacy Appwrite document (None fields omitted, like model_dump(exclude_none=True))
+        doc = self._legacy_fields()
+        doc['timestamp'] = self.timestamp.isoformat()
+        doc['farm_id'] = self.farm_id
+        return {k: v for k, v in doc.items() if v is not None}
+
+    def to_weather_data(self, document: Optional[Dict[str, Any]] = None) -> WeatherData:
+        # API boundary. Pass the result of to_document() to reuse its formatting. Every field
+        # is already a str, so validation is a single cheap pass in pydantic-core (faster than
+        # model_construct, which runs in Python).
+        data = dict(document) if document is not None else self._legacy_fields()
+        data['timestamp'] = self.timestamp
+        data['farm_id'] = self.farm_id
+        data['$id'] = self.id
+        return WeatherData.model_validate(data)
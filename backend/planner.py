@@ -0,0 +1,222 @@
+import random
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .models import FarmSettingsData
+from .recommendations import RuleTable
+from .services import grid_cell
+
+# --- Refresh Planner ---
+# Decides when each grid cell is fetched next. The scheduler ticks every
+# SCHEDULER_TICK_SECONDS and refreshes only the cells that are due, so a farm's saved
+# `update_frequency` takes effect immediately instead of after a restart.
+#
+# Cadence of a cell starts at the shortest `update_frequency` of its farms and adapts to
+# the readings:
+#   - volatile (a metric moved by more than its sensitivity since the previous reading)
+#     or near a recommendation threshold: poll at SCHEDULER_MIN_INTERVAL_FACTOR of it;
+#   - stable for SCHEDULER_STABLE_RUNS readings in a row: back off, doubling up to
+#     SCHEDULER_MAX_INTERVAL_FACTOR of it;
+#   - OWM answered 429: every cell waits until the rate limit is lifted.
+# Each run time is jittered so farms saved with the same frequency do not hit OWM in bursts.
+
+Cell = Tuple[float, float, str]
+
+# Sensitivities are configured in metric units; imperial readings are compared in their own units
+_IMPERIAL_SCALE = {"temperature": 1.8, "wind_speed": 2.23694, "humidity": 1.0, "pressure": 1.0}
+
+
+def reading_values(raw_weather: Dict[str, Any]) -> Dict[str, float]:
+    # Metrics the planner watches, from an OWM /weather payload
+    main, wind = raw_weather.get("main", {}), raw_weather.get("wind", {})
+    values = {"temperature": main.get("temp"), "humidity": main.get("humidity"),
+              "pressure": main.get("pressure"), "wind_speed": wind.get("speed")}
+    return {name: float(value) for name, value in values.items() if value is not None}
+
+
+class CellPlan:
+    def __init__(self, cell: Cell, base_interval: float, next_run: float):
+        self.cell = cell
+        self.farm_ids: List[str] = []
+        self.base_interval = base_interval  # Seconds, from the farms' update_frequency
+        self.interval = base_interval  # Seconds, after adaptation
+        self.next_run = next_run  # Unix time
+        self.last_run: Optional[float] = None
+        self.reason = "scheduled"  # Why the interval has its current value
+        self.stable_runs = 0
+        self.failures = 0
+        self.last_values: Dict[str, float] = {}
+
+    def as_dict(self) -> Dict[str, Any]:
+        lat, lon, units = self.cell
+        return {
+            "lat": lat, "lon": lon, "units": units, "farm_ids": sorted(self.farm_ids),
+            "base_interval_seconds": self.base_interval, "interval_seconds": round(self.interval, 1),
+            "next_run": self.next_run, "next_run_in_seconds": round(max(0.0, self.next_run - time.time()), 1),
+            "last_run": self.last_run, "reason": self.reason, "stable_runs": self.stable_runs, "failures": self.failures,
+        }
+
+
+class RefreshPlanner:
+    def __init__(self, sensitivities: Dict[str, float], jitter_fraction: float = 0.1, min_factor: float = 0.5,
+                 max_factor: float = 3.0, stable_runs: int = 3, rng: Optional[random.Random] = None):
+        self.sensitivities = sensitivities  # Metric -> change that counts as significant (metric units)
+        self.jitter_fraction = jitter_fraction
+        self.min_factor = min_factor
+        self.max_factor = max_factor
+        self.stable_runs = stable_runs
+        self.rng = rng or random.Random()
+        self.cells: Dict[Cell, CellPlan] = {}
+        self.farm_cells: Dict[str, Cell] = {}  # farm_id -> cell it is planned in
+        self.farm_settings: Dict[str, FarmSettingsData] = {}
+        self.paused_until = 0.0  # OWM rate limit: nothing is due before this time
+        self.synced_at = 0.0  # Last full sync with the settings collection
+
+    def _jittered(self, seconds: float) -> float:
+        return seconds * (1 + self.rng.uniform(-self.jitter_fraction, self.jitter_fraction))
+
+    def _sensitivity(self, metric: str, units: str) -> float:
+        sensitivity = self.sensitivities[metric]
+        return sensitivity * _IMPERIAL_SCALE[metric] if units == "imperial" else sensitivity
+
+    # Planning
+
+    def sync(self, farms: Iterable[Tuple[str, FarmSettingsData]], now: Optional[float] = None):
+        # Re-plans from the full farm list; farms that disappeared are dropped
+        now = now or time.time()
+        farms = list(farms)
+        seen = {farm_id for farm_id, _ in farms}
+        for farm_id in [farm_id for farm_id in self.farm_settings if farm_id not in seen]:
+            self.remove_farm(farm_id)
+        for farm_id, farm_settings in farms:
+            self.update_farm(farm_id, farm_settings, now)
+        self.synced_at = now
+
+    def invalidate(self):
+        # Farms changed elsewhere (another worker): re-read the full list on the next tick
+        self.synced_at = 0.0
+
+    def update_farm(self, farm_id: str, farm_settings: FarmSettingsData, now: Optional[float] = None):
+        # Called when a farm's settings are saved; takes effect on the next tick
+        now = now or time.time()
+        self.farm_settings[farm_id] = farm_settings
+        cell = grid_cell(farm_settings.farm_latitude, farm_settings.farm_longitude, farm_settings.units)
+        moved = self.farm_cells.get(farm_id) != cell
+        if moved:
+            self._detach(farm_id)
+            self.farm_cells[farm_id] = cell
+        plan = self.cells.get(cell)
+        if plan is None:
+            plan = self.cells[cell] = CellPlan(cell, max(1, farm_settings.update_frequency) * 60, now)
+        if farm_id not in plan.farm_ids:
+            plan.farm_ids.append(farm_id)
+        self._replan(plan, now)
+        if moved:
+            plan.next_run = min(plan.next_run, now)  # New farm or new location: fetch it right away
+
+    def remove_farm(self, farm_id: str):
+        self._detach(farm_id)
+        self.farm_cells.pop(farm_id, None)
+        self.farm_settings.pop(farm_id, None)
+
+    def _detach(self, farm_id: str):
+        cell = self.farm_cells.get(farm_id)
+        plan = self.cells.get(cell) if cell else None
+        if plan is None:
+            return
+        if farm_id in plan.farm_ids:
+            plan.farm_ids.remove(farm_id)
+        if plan.farm_ids:
+            self._replan(plan, time.time())
+        else:
+            del self.cells[cell]
+
+    def _replan(self, plan: CellPlan, now: float):
+        # The cell runs at the pace of its most demanding farm
+        base = min(max(1, self.farm_settings[farm_id].update_frequency) for farm_id in plan.farm_ids) * 60
+        if base == plan.base_interval:
+            return
+        ratio = plan.interval / plan.base_interval
+        plan.base_interval = base
+        plan.interval = base * ratio
+        plan.reason = "settings"
+        if plan.last_run is not None:
+            plan.next_run = min(plan.next_run, plan.last_run + self._jittered(plan.interval))
+        else:
+            plan.next_run = min(plan.next_run, now + self.rng.uniform(0, self.jitter_fraction * base))
+
+    # Ticks
+
+    def due(self, now: Optional[float] = None) -> List[CellPlan]:
+        now = now or time.time()
+        if now < self.paused_until:
+            return []
+        return sorted((plan for plan in self.cells.values() if plan.next_run <= now), key=lambda plan: plan.next_run)
+
+    def members(self, plan: CellPlan) -> List[Tuple[str, FarmSettingsData]]:
+        return [(farm_id, self.farm_settings[farm_id]) for farm_id in plan.farm_ids]
+
+    def record(self, cell: Cell, raw_weather: Optional[Dict[str, Any]], rule_table: Optional[RuleTable] = None,
+               now: Optional[float] = None):
+        # Adapts the cell's cadence to the reading it just got (None when the fetch failed)
+        plan = self.cells.get(cell)
+        if plan is None:
+            return
+        now = now or time.time()
+        plan.last_run = now
+        if not raw_weather:
+            # Retry sooner than a full interval, but back off on repeated failures
+            plan.failures += 1
+            plan.reason = "failed"
+            plan.next_run = now + self._jittered(min(plan.base_interval, plan.base_interval * self.min_factor * plan.failures))
+            return
+        plan.failures = 0
+        units = cell[2]
+        values = reading_values(raw_weather)
+        volatile = any(
+            abs(value - plan.last_values[name]) > self._sensitivity(name, units)
+            for name, value in values.items() if name in plan.last_values and name in self.sensitivities
+        )
+        near = rule_table is not None and self._near_threshold(rule_table, values, units)
+        plan.last_values = values
+        if volatile or near:
+            plan.stable_runs = 0
+            plan.interval = plan.base_interval * self.min_factor
+            plan.reason = "volatile" if volatile else "near_threshold"
+        else:
+            plan.stable_runs += 1
+            if plan.stable_runs >= self.stable_runs:
+                plan.interval = min(max(plan.interval, plan.base_interval) * 2, plan.base_interval * self.max_factor)
+                plan.reason = "stable"
+            else:
+                plan.interval = plan.base_interval
+                plan.reason = "scheduled"
+        plan.next_run = now + self._jittered(plan.interval)
+
+    def _near_threshold(self, rule_table: RuleTable, values: Dict[str, float], units: str) -> bool:
+        for rule in rule_table.rules:
+            value = values.get(rule.metric)
+            if value is not None and rule.metric in self.sensitivities:
+                if abs(value - rule.bound(units)) <= self._sensitivity(rule.metric, units):
+                    return True
+        return False
+
+    def rate_limited(self, until: float):
+        # OWM answered 429: hold every cell until `until`, then spread them out again
+        if until <= self.paused_until:
+            return
+        self.paused_until = until
+        for plan in self.cells.values():
+            if plan.next_run < until:
+                plan.next_run = until + self.rng.uniform(0, self.jitter_fraction * plan.base_interval)
+                plan.reason = "rate_limited"
+
+    def plan(self) -> Dict[str, Any]:
+        plans = sorted(self.cells.values(), key=lambda plan: plan.next_run)
+        return {
+            "cells": len(plans),
+            "farms": len(self.farm_cells),
+            "paused_until": self.paused_until if self.paused_until > time.time() else None,
+            "synced_at": self.synced_at or None,
+            "plan": [plan.as_dict() for plan in plans],
+        }
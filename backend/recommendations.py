@@ -0,0 +1,180 @@
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# --- Recommendation Rule Engine ---
+# Maps a reading to recommendation texts without touching Appwrite on the request path.
+# The recommendations collection is loaded into memory at startup (and on a timer) and
+# indexed by condition. A reading matches every rule whose threshold it crosses, so a
+# hot and dry day yields both texts. Texts are ordered by rule priority; "normal" is used
+# when no rule matches.
+#
+# Rules compare one metric against a threshold in the farm's units. A recommendation
+# document can define or override the rule of its condition with the optional attributes
+# `metric`, `operator` ("lt"/"gt"), `threshold`, `threshold_imperial` and `priority`.
+#
+# evaluate() is a plain Python loop for single readings; evaluate_batch() compares whole
+# columns at once with NumPy, for history pages and multi-farm runs.
+
+NORMAL_CONDITION = "normal"
+RULE_METRICS = ("temperature", "humidity", "wind_speed")
+OPERATORS = {"lt": np.less, "gt": np.greater}
+MAX_TEXTS_PER_CONDITION = 5
+
+@dataclass(frozen=True)
+class Rule:
+    condition: str
+    metric: str  # One of RULE_METRICS
+    operator: str  # "lt" or "gt"
+    threshold: float  # Metric units (°C, %, m/s)
+    threshold_imperial: Optional[float] = None  # Imperial units (°F, %, mph); defaults to `threshold`
+    priority: int = 100  # Lower comes first
+
+    def bound(self, units: str) -> float:
+        if units == "imperial" and self.threshold_imperial is not None:
+            return self.threshold_imperial
+        return self.threshold
+
+    def matches(self, value: float, units: str) -> bool:
+        bound = self.bound(units)
+        return value < bound if self.operator == "lt" else value > bound
+
+
+# Same thresholds (and precedence) as the original if-chain
+DEFAULT_RULES = (
+    Rule("cold", "temperature", "lt", 10, 50, priority=10),
+    Rule("hot", "temperature", "gt", 30, 86, priority=20),
+    Rule("dry", "humidity", "lt", 30, priority=30),
+    Rule("humid", "humidity", "gt", 80, priority=40),
+    Rule("windy", "wind_speed", "gt", 10, 22.4, priority=50),
+)
+DEFAULT_TEXTS = {
+    "cold": ["Cold weather: Consider protecting sensitive plants."],
+    "hot": ["Hot weather: Increase watering frequency."],
+    "dry": ["Low humidity: Monitor soil moisture."],
+    "humid": ["High humidity: Watch for fungal diseases."],
+    "windy": ["Strong winds: Check plant support systems."],
+    NORMAL_CONDITION: ["Weather conditions are optimal."],
+}
+
+
+def _rule_from_document(doc: Dict[str, Any], fallback: Optional[Rule]) -> Optional[Rule]:
+    # A document only defines a rule when it carries a complete threshold
+    metric, operator, threshold = doc.get("metric"), doc.get("operator"), doc.get("threshold")
+    if metric not in RULE_METRICS or operator not in OPERATORS or threshold is None:
+        return fallback
+    imperial = doc.get("threshold_imperial")
+    priority = doc.get("priority")
+    return Rule(
+        condition=doc["condition_value"], metric=metric, operator=operator, threshold=float(threshold),
+        threshold_imperial=float(imperial) if imperial is not None else None,
+        priority=int(priority) if priority is not None else (fallback.priority if fallback else 100),
+    )
+
+
+class RuleTable:
+    # Immutable rules + texts; a reload builds a new table and swaps it in
+    def __init__(self, rules: Iterable[Rule], texts: Dict[str, List[str]]):
+        self.rules: Tuple[Rule, ...] = tuple(sorted(rules, key=lambda rule: (rule.priority, rule.condition)))
+        self.texts = {condition: list(entries[:MAX_TEXTS_PER_CONDITION]) for condition, entries in texts.items()}
+        self._combination_cache: Dict[bytes, List[str]] = {}
+
+    @classmethod
+    def from_documents(cls, documents: Sequence[Dict[str, Any]]) -> "RuleTable":
+        # Builds the table from recommendation documents on top of the defaults. Conditions
+        # present in the collection replace the default texts; missing ones keep them.
+        rules = {rule.condition: rule for rule in DEFAULT_RULES}
+        texts: Dict[str, List[Tuple[int, str]]] = {}
+        for doc in documents:
+            condition = doc.get("condition_value")
+            text = doc.get("recommendation_text")
+            if not condition or not text:
+                continue
+            try:
+                rule = _rule_from_document(doc, rules.get(condition))
+                priority = int(doc.get("priority") or 0)
+            except (TypeError, ValueError) as e:
+                # One badly edited document must not fail the whole reload
+                logger.warning(f"Skipping recommendation {doc.get('$id')} ({condition}): {e}")
+                continue
+            if rule is not None:
+                rules[condition] = rule
+            texts.setdefault(condition, []).append((priority, text))
+        merged = dict(DEFAULT_TEXTS)
+        for condition, entries in texts.items():
+            merged[condition] = [text for _, text in sorted(entries, key=lambda entry: entry[0])]
+        return cls(rules.values(), merged)
+
+    def conditions(self, temperature: float, humidity: float, wind_speed: float, units: str = "metric") -> List[str]:
+        values = {"temperature": temperature, "humidity": humidity, "wind_speed": wind_speed}
+        matched = [rule.condition for rule in self.rules if rule.matches(values[rule.metric], units)]
+        return matched or [NORMAL_CONDITION]
+
+    def _texts_for(self, conditions: Iterable[str]) -> List[str]:
+        result: List[str] = []
+        for condition in conditions:
+            result.extend(self.texts.get(condition, ()))
+        return result
+
+    def evaluate(self, temperature: float, humidity: float, wind_speed: float, units: str = "metric") -> List[str]:
+        return self._texts_for(self.conditions(temperature, humidity, wind_speed, units))
+
+    def evaluate_batch(self, temperature: Sequence[float], humidity: Sequence[float], wind_speed: Sequence[float],
+                       units: str = "metric") -> List[List[str]]:
+        # One boolean row per rule; each reading's set of matching rules is packed into a
+        # bitmap of ceil(rules / 8) bytes, so the texts are assembled once per distinct
+        # combination, not per reading, for any number of rules.
+        columns = {
+            "temperature": np.asarray(temperature, dtype=np.float64),
+            "humidity": np.asarray(humidity, dtype=np.float64),
+            "wind_speed": np.asarray(wind_speed, dtype=np.float64),
+        }
+        size = len(columns["temperature"])
+        if size == 0:
+            return []
+        if not self.rules:
+            return [self._texts_for_bitmap(b"")] * size
+        hits = np.empty((len(self.rules), size), dtype=bool)
+        for index, rule in enumerate(self.rules):
+            hits[index] = OPERATORS[rule.operator](columns[rule.metric], rule.bound(units))  # NaN never matches
+        bitmaps = np.ascontiguousarray(np.packbits(hits, axis=0).T)  # One row of bytes per reading
+        keys = bitmaps.view(np.dtype((np.void, bitmaps.shape[1]))).reshape(-1)
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        texts = [self._texts_for_bitmap(key.tobytes()) for key in unique_keys]
+        return [texts[i] for i in inverse.reshape(-1).tolist()]
+
+    def _texts_for_bitmap(self, bitmap: bytes) -> List[str]:
+        # Bit i (most significant first, as np.packbits writes it) is set when self.rules[i] matched
+        cached = self._combination_cache.get(bitmap)
+        if cached is None:
+            matched = np.flatnonzero(np.unpackbits(np.frombuffer(bitmap, dtype=np.uint8))[:len(self.rules)])
+            cached = self._texts_for([self.rules[index].condition for index in matched.tolist()] or [NORMAL_CONDITION])
+            self._combination_cache[bitmap] = cached
+        return cached
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "rules": [
+                {"condition": rule.condition, "metric": rule.metric, "operator": rule.operator, "threshold": rule.threshold,
+                 "threshold_imperial": rule.threshold_imperial, "priority": rule.priority}
+                for rule in self.rules
+            ],
+            "texts": self.texts,
+        }
+
+
+DEFAULT_TABLE = RuleTable(DEFAULT_RULES, DEFAULT_TEXTS)
+
+
+def document_column(documents: Sequence[Dict[str, Any]], metric: str) -> np.ndarray:
+    # Numeric column of a stored (string-typed) attribute; missing or invalid values become NaN
+    def parse(raw: Any) -> float:
+        try:
+            return float(raw)
+        except (TypeError, ValueError):
+            return np.nan
+    return np.fromiter((parse(doc.get(metric)) for doc in documents), dtype=np.float64, count=len(documents))
@@ -0,0 +1,84 @@
+import glob
+import gzip
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# --- OpenWeatherMap Payload Recorder ---
+# With OWM_RECORD_PATH set, every /weather payload the app receives is appended to a
+# gzip-compressed JSON-lines log, one object per line:
+#   {"at": <unix time>, "lat": ..., "lon": ..., "units": ..., "payload": {<raw OWM body>}}
+# Recordings are replayed offline through the ingestion pipeline by
+# `python -m backend.benchmarks.bench_ingest --recording ...`.
+#
+# Writes go through GzipFile's buffer, so the event loop only occasionally makes a small
+# write. `{pid}` in the path is replaced by the process ID, which gives every uvicorn
+# worker its own file. Recording stops once the file reaches OWM_RECORD_MAX_MB.
+#
+#   python -m backend.recorder backend/data/owm-*.jsonl.gz   # Summary of recordings
+
+
+class PayloadRecorder:
+    def __init__(self, path: str, max_bytes: Optional[int] = None):
+        self.path = path.replace("{pid}", str(os.getpid()))
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.max_bytes = max_bytes
+        self._raw = open(self.path, "ab")  # Each session appends one gzip member
+        self._file = gzip.GzipFile(fileobj=self._raw, mode="ab")
+        self.recorded = 0
+        self.full = False
+
+    def record(self, lat: float, lon: float, units: str, payload: Dict[str, Any]):
+        if self.full or self._file is None:
+            return
+        line = json.dumps({"at": round(time.time(), 3), "lat": lat, "lon": lon, "units": units, "payload": payload},
+                          separators=(",", ":"))
+        self._file.write(line.encode("utf-8") + b"\n")
+        self.recorded += 1
+        if self.max_bytes and self._raw.tell() >= self.max_bytes:
+            self.full = True
+            logger.warning(f"OWM recording {self.path} reached its size limit; recording stopped.")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "recorded": self.recorded, "full": self.full}
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._raw.close()
+            self._file = None
+
+
+def read_recordings(patterns: List[str]) -> Iterator[Dict[str, Any]]:
+    # Records of every file matching the patterns, file by file; a truncated tail (a process
+    # killed while recording) ends that file instead of failing the read
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                try:
+                    for line in f:
+                        if line.strip():
+                            yield json.loads(line)
+                except (EOFError, gzip.BadGzipFile, json.JSONDecodeError) as e:
+                    logger.warning(f"Recording {path} ends early: {e}")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Summarize recorded OpenWeatherMap payloads.")
+    parser.add_argument("paths", nargs="+", help="Recording files or glob patterns")
+    args = parser.parse_args()
+    count, first, last, cells = 0, None, None, set()
+    for record in read_recordings(args.paths):
+        count += 1
+        first = record["at"] if first is None else min(first, record["at"])
+        last = record["at"] if last is None else max(last, record["at"])
+        cells.add((record["lat"], record["lon"], record["units"]))
+    size = sum(os.path.getsize(path) for pattern in args.paths for path in (glob.glob(pattern) or [pattern]))
+    print(f"{count} payloads, {len(cells)} locations, {size / 1024:.1f} KiB ({size / max(count, 1):.0f} bytes per payload)")
+    if count:
+        print(f"from {time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(first))} to {time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(last))} UTC")
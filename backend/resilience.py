@@ -0,0 +1,260 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+# --- Upstream Resilience ---
+# Policies wrapped around every OpenWeatherMap and Appwrite call:
+#   - TokenBucket: client-side rate limit, so we stay within the OWM plan instead of
+#     learning about it from 429s;
+#   - deadline: a bound on the whole call, rate-limit waits and retries included;
+#   - retries with exponential backoff and full jitter, drawn from a RetryBudget shared
+#     by all upstreams, so retries can never multiply the load during an outage;
+#   - CircuitBreaker: after repeated failures calls fail fast for a while instead of
+#     tying up workers; callers keep serving their last good value (snapshots, caches,
+#     the local store) meanwhile.
+#
+# `call` is for coroutines (OWM); `call_sync` is for blocking calls already running in a
+# worker thread (the Appwrite SDK). Everything here is safe to use from both.
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.waited = 0  # Calls that had to wait for a token
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        # Takes a token; returns how long to wait before using it (0 when one was available)
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            self.waited += 1
+            return -self.tokens / self.rate
+
+    def cancel(self):
+        # Gives back a reserved token that will not be used
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"rate_per_second": self.rate, "capacity": self.capacity, "tokens": round(max(0.0, self.tokens), 2), "waited": self.waited}
+
+
+class RetryBudget:
+    # Every request deposits `ratio` of a retry; every retry withdraws one. A small
+    # reserve refills at `min_per_second` so low-traffic callers can still retry.
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0, max_balance: float = 100.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_balance = max_balance
+        self.balance = 10.0
+        self.updated = time.monotonic()
+        self.granted = 0
+        self.denied = 0
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.balance = min(self.max_balance, self.balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self.balance = min(self.max_balance, self.balance + (now - self.updated) * self.min_per_second)
+            self.updated = now
+            if self.balance >= 1:
+                self.balance -= 1
+                self.granted += 1
+                return True
+            self.denied += 1
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"balance": round(self.balance, 2), "granted": self.granted, "denied": self.denied}
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_seconds: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.state = self.CLOSED
+        self.failures = 0  # Consecutive failures
+        self.opened_at = 0.0
+        self.trial_in_flight = False  # Half-open lets a single trial call through
+        self.trial_started_at = 0.0
+        self.opened = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def is_open(self) -> bool:
+        # Cheap check before queueing for a rate-limit token; allow() still decides
+        return self.state == self.OPEN and time.monotonic() - self.opened_at < self.recovery_seconds
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.recovery_seconds:
+                self.state = self.HALF_OPEN
+                self.trial_in_flight = False
+            if self.state == self.CLOSED:
+                return True
+            # A trial that never reported back (e.g. cancelled) is replaced after recovery_seconds
+            if self.state == self.HALF_OPEN and (not self.trial_in_flight or time.monotonic() - self.trial_started_at >= self.recovery_seconds):
+                self.trial_in_flight = True
+                self.trial_started_at = time.monotonic()
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.opened += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.trial_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        retry_in = self.recovery_seconds - (time.monotonic() - self.opened_at) if self.state == self.OPEN else 0.0
+        return {
+            "state": self.state, "consecutive_failures": self.failures, "opened": self.opened,
+            "rejected": self.rejected, "retry_in_seconds": round(max(0.0, retry_in), 1),
+        }
+
+
+class ResiliencePolicy:
+    def __init__(self, name: str, breaker: CircuitBreaker, budget: RetryBudget, deadline_seconds: float,
+                 limiter: Optional[TokenBucket] = None, max_attempts: int = 3, base_delay: float = 0.2,
+                 max_delay: float = 2.0, is_transient: Callable[[Exception], bool] = lambda e: True):
+        self.name = name
+        self.breaker = breaker
+        self.budget = budget
+        self.deadline_seconds = deadline_seconds
+        self.limiter = limiter
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.is_transient = is_transient  # Errors that count against the breaker and may be retried
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _admit(self):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+    def _should_retry(self, error: Exception, attempt: int, max_attempts: int, deadline: float) -> Optional[float]:
+        # Records the failure; returns the backoff delay when another attempt is allowed
+        transient = isinstance(error, asyncio.TimeoutError) or self.is_transient(error)
+        if not transient:
+            self.breaker.record_success()  # The upstream answered; the request itself was wrong
+            return None
+        self.breaker.record_failure()
+        self.failures += 1
+        delay = self._backoff(attempt)
+        if attempt + 1 >= max_attempts or time.monotonic() + delay >= deadline or not self.budget.withdraw():
+            return None
+        self.retries += 1
+        return delay
+
+    async def call(self, fn: Callable[[], Awaitable[T]], retry: bool = True) -> T:
+        self.calls += 1
+        self.budget.deposit()
+        deadline = time.monotonic() + self.deadline_seconds
+        max_attempts = self.max_attempts if retry else 1
+        attempt = 0
+        while True:
+            if self.breaker.is_open():
+                self.breaker.rejected += 1
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            if self.limiter is not None:
+                wait = self.limiter.reserve()
+                if time.monotonic() + wait >= deadline:
+                    self.limiter.cancel()
+                    raise DeadlineExceeded(f"{self.name}: rate limit wait exceeds the deadline")
+                if wait:
+                    await asyncio.sleep(wait)
+            self._admit()
+            try:
+                result = await asyncio.wait_for(fn(), max(0.0, deadline - time.monotonic()))
+            except Exception as e:
+                delay = self._should_retry(e, attempt, max_attempts, deadline)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    def call_sync(self, fn: Callable[[], T], retry: bool = True) -> T:
+        # Blocking variant; the deadline bounds retries but cannot interrupt an attempt in flight
+        self.calls += 1
+        self.budget.deposit()
+        deadline = time.monotonic() + self.deadline_seconds
+        max_attempts = self.max_attempts if retry else 1
+        attempt = 0
+        while True:
+            if self.breaker.is_open():
+                self.breaker.rejected += 1
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            if self.limiter is not None:
+                wait = self.limiter.reserve()
+                if time.monotonic() + wait >= deadline:
+                    self.limiter.cancel()
+                    raise DeadlineExceeded(f"{self.name}: rate limit wait exceeds the deadline")
+                if wait:
+                    time.sleep(wait)
+            self._admit()
+            try:
+                result = fn()
+            except Exception as e:
+                delay = self._should_retry(e, attempt, max_attempts, deadline)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "calls": self.calls, "retries": self.retries, "failures": self.failures,
+            "deadline_seconds": self.deadline_seconds, "breaker": self.breaker.stats(),
+        }
+        if self.limiter is not None:
+            stats["rate_limit"] = self.limiter.stats()
+        return stats
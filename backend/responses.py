@@ -0,0 +1,136 @@
+import gzip
+from typing import Any, Dict, Optional
+
+import orjson
+from fastapi import Response
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from starlette.datastructures import MutableHeaders
+
+from .config import settings
+from .observability import STAGE_SECONDS, timer
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip is offered
+    brotli = None
+
+# --- JSON Responses and Compression ---
+# Large JSON bodies (history pages and aggregations) are encoded here and returned as a
+# ready Response, instead of handing the model back to FastAPI to validate a second time
+# against the route's response_model:
+#   * models are encoded by pydantic-core (`model_dump_json`);
+#   * plain dicts, such as the slim `fields=` projection of /history, are encoded by orjson.
+#
+# CompressionMiddleware compresses JSON and CSV bodies of at least
+# RESPONSE_COMPRESSION_MIN_BYTES with brotli or gzip, whichever the client prefers in
+# Accept-Encoding (brotli on a tie). Only complete bodies are compressed: streamed
+# responses (SSE, exports) pass through untouched.
+
+JSON_OPTIONS = orjson.OPT_UTC_Z  # UTC datetimes end in "Z", as pydantic writes them
+COMPRESSIBLE_TYPES = ("application/json", "text/csv", "text/plain")
+THREAD_MINIMUM_BYTES = 256 * 1024  # Larger bodies are compressed off the event loop
+
+
+def json_response(content: Any, include: Optional[Dict[str, Any]] = None, exclude: Optional[Dict[str, Any]] = None,
+                  headers=None) -> Response:
+    # `include`/`exclude` restrict a model to some of its fields (pydantic include/exclude syntax)
+    with timer(STAGE_SECONDS, stage="serialization"):
+        if isinstance(content, BaseModel):
+            body = content.model_dump_json(by_alias=True, include=include, exclude=exclude).encode("utf-8")
+        else:
+            body = orjson.dumps(content, option=JSON_OPTIONS)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def supported_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    # Content coding to use for an Accept-Encoding header; None for identity
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        params = params.strip().replace(" ", "")
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+    best, best_weight = None, 0.0
+    for coding in supported_encodings():
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.RESPONSE_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=settings.RESPONSE_GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    # Pure ASGI middleware. The response start is held back until the body shows whether
+    # it is complete (compress) or streamed (send as-is).
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = negotiate_encoding(accept_encoding)
+        held = None
+
+        async def send_compressed(message):
+            nonlocal held
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=list(message.get("headers", [])))
+                media_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+                if media_type not in COMPRESSIBLE_TYPES or "content-encoding" in headers:
+                    await send(message)
+                    return
+                headers.add_vary_header("Accept-Encoding")
+                message["headers"] = headers.raw
+                held = message
+                return
+            if held is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+            start, held = held, None
+            body = message.get("body", b"")
+            if (encoding is not None and not message.get("more_body", False) and len(body) >= self.minimum_size
+                    and start["status"] not in (204, 206, 304)):
+                message = {**message, "body": await self._compress(body, encoding)}
+                headers = MutableHeaders(raw=start["headers"])
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(message["body"]))
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = "W/" + etag  # The compressed bytes are another representation
+                start["headers"] = headers.raw
+            await send(start)
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    async def _compress(body: bytes, encoding: str) -> bytes:
+        with timer(STAGE_SECONDS, stage="compression"):
+            if len(body) >= THREAD_MINIMUM_BYTES:
+                return await run_in_threadpool(compress, body, encoding)
+            return compress(body, encoding)
@@ -0,0 +1,148 @@
+import hashlib
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from appwrite.query import Query as AppwriteQuery
+
+from .history import AGGREGATED_METRICS, TIME_ATTRIBUTE, BucketAggregator, bucket_start, to_appwrite_datetime, to_utc
+
+logger = logging.getLogger(__name__)
+
+# --- Tiered Retention ---
+# Weather history is kept in three tiers:
+#   raw:    every reading, in APPWRITE_COLLECTION_ID, for RETENTION_RAW_DAYS;
+#   hourly: one rollup document per farm and hour, in APPWRITE_ROLLUP_COLLECTION_ID, for RETENTION_HOURLY_DAYS;
+#   daily:  one rollup document per farm and day, in the same collection, kept forever.
+# A rollup holds the reading count and min/mean/max/count of every aggregated metric, so
+# rollups merge exactly into coarser ones (and into the buckets of /history?bucket=...).
+#
+# The compaction job rolls complete hours (days) older than the tier's retention into the
+# next tier and deletes the sources. Rollup IDs are derived from farm, tier and bucket, and
+# a rollup is written before its sources are deleted: if a run stops halfway, the next run
+# finds the rollup already there (409) and only deletes the leftovers. Readers skip finer
+# documents of a bucket a coarser rollup already covers, so nothing is counted twice.
+#
+# Rollup attributes: farm_id (null for the default farm, like weather documents), tier,
+# bucket_start (datetime), count, and {metric}_min/_mean/_max/_count for every metric.
+
+
+def retention_cutoffs(raw_days: float, hourly_days: float, now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    # (raw cutoff, hourly cutoff): raw readings before the first and hourly rollups before
+    # the second are compacted. Aligned to whole hours/days so only complete buckets move.
+    now = to_utc(now) if now else datetime.now(timezone.utc)
+    raw_cutoff = bucket_start(now - timedelta(days=raw_days), "hourly")
+    hourly_cutoff = bucket_start(min(now - timedelta(days=hourly_days), raw_cutoff), "daily")
+    return raw_cutoff, hourly_cutoff
+
+
+def rollup_id(farm_id: Optional[str], tier: str, start: datetime) -> str:
+    # Stable per bucket, so writing the same rollup twice is a conflict rather than a duplicate
+    key = f"{farm_id or ''}|{tier}|{to_appwrite_datetime(start)}"
+    return hashlib.sha1(key.encode()).hexdigest()[:32]
+
+
+def rollup_document(farm_id: Optional[str], tier: str, start: datetime, entry: Dict[str, Any]) -> Dict[str, Any]:
+    # Rollup attributes of one BucketAggregator entry; means are kept unrounded so merges stay exact
+    document: Dict[str, Any] = {
+        "farm_id": farm_id, "tier": tier, "bucket_start": to_appwrite_datetime(start), "count": entry["count"],
+    }
+    for metric in AGGREGATED_METRICS:
+        accumulator = entry[metric]
+        document[f"{metric}_count"] = accumulator.count
+        document[f"{metric}_min"] = accumulator.min
+        document[f"{metric}_max"] = accumulator.max
+        document[f"{metric}_mean"] = accumulator.total / accumulator.count if accumulator.count else None
+    return document
+
+
+class RollupCompactor:
+    # Runs on the scheduler leader every RETENTION_INTERVAL_SECONDS. Each run moves at most
+    # `batch_documents` documents per farm and tier, so a long backlog is worked off over
+    # several runs instead of holding Appwrite busy in one.
+    def __init__(self, weather, rollup_collection_id: str, raw_days: float, hourly_days: float, batch_documents: int = 5000):
+        self.weather = weather  # WeatherService: Appwrite client, farm filters and document iterators
+        self.rollup_collection_id = rollup_collection_id
+        self.raw_days = raw_days
+        self.hourly_days = hourly_days
+        self.batch_documents = batch_documents
+        self.runs = 0
+        self.last_run_at: Optional[float] = None
+        self.compacted: Dict[str, int] = {"raw": 0, "hourly": 0}  # Source documents rolled up and deleted
+        self.rollups_written = 0
+        self.failed = 0  # Rollups not written; their sources are kept for the next run
+
+    async def run(self, farm_ids: List[str]) -> Dict[str, int]:
+        raw_cutoff, hourly_cutoff = retention_cutoffs(self.raw_days, self.hourly_days)
+        result = {"raw": 0, "hourly": 0}
+        for farm_id in farm_ids:
+            result["raw"] += await self.compact(farm_id, "raw", raw_cutoff)
+            result["hourly"] += await self.compact(farm_id, "hourly", hourly_cutoff)
+        self.runs += 1
+        self.last_run_at = time.time()
+        return result
+
+    async def compact(self, farm_id: str, tier: str, cutoff: datetime) -> int:
+        # Rolls `tier` documents of the farm before `cutoff` into the next tier; returns the
+        # number of source documents removed
+        target = "hourly" if tier == "raw" else "daily"
+        aggregator = BucketAggregator(target, track_ids=True)
+        complete = True
+        if tier == "raw":
+            select = ["$id", "$createdAt", TIME_ATTRIBUTE, *AGGREGATED_METRICS]
+            pages = self.weather.iter_weather_documents(farm_id, end=cutoff, select=select)
+        else:
+            pages = self.weather.iter_rollups(farm_id, tier, end=cutoff)
+        async for documents in pages:
+            aggregator.extend(documents, tier)
+            if aggregator.scanned >= self.batch_documents:
+                complete = False
+                break
+        if not self.weather.appwrite.healthy:
+            return 0  # A partial scan would roll up incomplete buckets
+        buckets = aggregator.items()
+        if not complete:
+            # The newest bucket may continue beyond this batch; it moves on the next run
+            buckets = buckets[:-1]
+            if not buckets:
+                logger.warning(f"Retention: one {target} bucket of farm {farm_id} exceeds the batch size; raise RETENTION_BATCH_DOCUMENTS.")
+                return 0
+        if not buckets:
+            return 0
+
+        stored_farm_id = None if farm_id == self.weather.default_farm_id else farm_id
+        rollups = {rollup_id(stored_farm_id, target, start): (start, rollup_document(stored_farm_id, target, start, entry))
+                   for start, entry in buckets}
+        failed = await self.weather.appwrite.create_documents(
+            self.rollup_collection_id, [(document_id, document) for document_id, (_, document) in rollups.items()]
+        )  # An existing rollup (409) counts as written: its sources are leftovers of an interrupted run
+        failed_starts = {rollups[document_id][0] for document_id, _ in failed}
+        self.rollups_written += len(rollups) - len(failed)
+        self.failed += len(failed)
+
+        source_ids = [document_id for start, _ in buckets if start not in failed_starts for document_id in aggregator.ids[start]]
+        source_collection = self.weather.weather_collection_id if tier == "raw" else self.rollup_collection_id
+        deleted = await self.weather.appwrite.delete_documents(source_collection, source_ids)
+        self.compacted[tier] += deleted
+        if deleted:
+            logger.info(f"Retention: farm {farm_id}: {deleted} {tier} documents rolled up into {len(rollups) - len(failed)} {target} rollups.")
+        return deleted
+
+    def stats(self) -> Dict[str, Any]:
+        raw_cutoff, hourly_cutoff = retention_cutoffs(self.raw_days, self.hourly_days)
+        return {
+            "raw_cutoff": raw_cutoff, "hourly_cutoff": hourly_cutoff, "runs": self.runs,
+            "last_run_seconds_ago": round(time.time() - self.last_run_at, 1) if self.last_run_at else None,
+            "compacted": dict(self.compacted), "rollups_written": self.rollups_written, "failed": self.failed,
+        }
+
+
+def rollup_queries(farm_filter: List[str], tier: str, start: Optional[datetime], end: Optional[datetime]) -> List[str]:
+    # Rollups of one tier whose bucket overlaps [start, end)
+    queries = farm_filter + [AppwriteQuery.equal("tier", tier)]
+    if start is not None:
+        queries.append(AppwriteQuery.greater_than_equal("bucket_start", to_appwrite_datetime(bucket_start(to_utc(start), tier))))
+    if end is not None:
+        queries.append(AppwriteQuery.less_than("bucket_start", to_appwrite_datetime(end)))
+    return queries
@@ -1,39 +1,64 @@
-from fastapi import APIRouter, Depends, HTTPException, Query as FastAPIQuery
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Query as FastAPIQuery
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional, Union
+from datetime import datetime
+import logging
+import time
 
-from .services import AppwriteService, OpenWeatherMapService, FarmSettingsService, WeatherService
-from .models import FarmSettingsData, FarmSettingsResponse, WeatherResponse, WeatherHistoryResponse, WeatherHistoryRecord
+from .services import AsyncAppwriteService, OpenWeatherMapService, FarmSettingsService, WeatherService
+from .container import ServiceContainer
+from .snapshot import etag_matches
+from .models import (
+    FarmSettingsData, FarmSettingsResponse, WeatherResponse, WeatherHistoryResponse, WeatherHistoryRecord,
+    WeatherHistoryAggregateResponse, AgronomyResponse, ForecastResponse
+)
+from .history import AGGREGATED_METRICS, parse_fields, project_documents, to_utc
+from .broadcast import SubscriptionResponse, sse_events
+from .export import EXPORT_FORMATS, EXPORT_SELECT, prepend_page, stream_export
+from .observability import STAGE_SECONDS, timer
+from .responses import json_response
 from .config import settings  # Importing settings, if needed directly for specific configurations
 
+logger = logging.getLogger(__name__)
+
 # --- Dependency Injection Setup ---
-# Dependency injection allows us to manage the lifecycle and dependencies of our services.
-# Each service is instantiated once per request. For stateless services or those that are inexpensive to instantiate,
-# this approach works fine. However, for expensive resources (e.g., DB pools), consider initializing them at app startup
-# and making them available globally via app state or a more advanced DI pattern.
-
-def get_appwrite_service():
-    # Returns an instance of the AppwriteService.
-    return AppwriteService()
-
-def get_owm_service():
-    # Returns an instance of the OpenWeatherMapService.
-    return OpenWeatherMapService()
-
-def get_farm_settings_service(appwrite_service: AppwriteService = Depends(get_appwrite_service)):
-    # Returns an instance of the FarmSettingsService, with the AppwriteService injected as a dependency.
-    return FarmSettingsService(appwrite_service)
-
-def get_weather_service(
-    appwrite_service: AppwriteService = Depends(get_appwrite_service),
-    owm_service: OpenWeatherMapService = Depends(get_owm_service),
-    settings_service: FarmSettingsService = Depends(get_farm_settings_service)
-):
-    # Returns an instance of the WeatherService with dependencies on AppwriteService, OpenWeatherMapService, and FarmSettingsService.
-    return WeatherService(appwrite_service, owm_service, settings_service)
+# Services are built once in the application lifespan (see `ServiceContainer` in container.py)
+# and stored on `app.state.services`. The dependencies below just hand out those shared
+# instances, so no request pays for a new HTTP pool or Appwrite SDK client.
+
+def get_services(request: Request) -> ServiceContainer:
+    # Returns the app-lifetime service container.
+    return request.app.state.services
+
+def get_appwrite_service(services: ServiceContainer = Depends(get_services)) -> AsyncAppwriteService:
+    # Returns the shared AsyncAppwriteService.
+    return services.appwrite
+
+def get_owm_service(services: ServiceContainer = Depends(get_services)) -> OpenWeatherMapService:
+    # Returns the shared OpenWeatherMapService.
+    return services.owm
+
+def get_farm_settings_service(services: ServiceContainer = Depends(get_services)) -> FarmSettingsService:
+    # Returns the shared FarmSettingsService.
+    return services.farm_settings
+
+def get_weather_service(services: ServiceContainer = Depends(get_services)) -> WeatherService:
+    # Returns the shared WeatherService.
+    return services.weather
+
+async def get_existing_farm_id(farm_id: str, service: FarmSettingsService = Depends(get_farm_settings_service)) -> str:
+    # Path farm ID of the farm-scoped weather endpoints; an unknown farm is the same 404 on every one
+    if not await service.get_settings(farm_id):
+        raise HTTPException(status_code=404, detail=f"Farm '{farm_id}' not found.")
+    return farm_id
 
 # --- Routers ---
 settings_router = APIRouter(prefix="/api/settings", tags=["Settings"])  # Router for settings-related endpoints
 weather_router = APIRouter(prefix="/api/weather", tags=["Weather"])  # Router for weather-related endpoints
+farms_router = APIRouter(prefix="/api/farms", tags=["Farms"])  # Router for farm-scoped settings and weather endpoints
+admin_router = APIRouter(prefix="/api/admin", tags=["Admin"])  # Router for operational endpoints
+health_router = APIRouter(prefix="/api/health", tags=["Health"])  # Router for liveness/readiness probes
 
 # --- Settings Endpoints ---
 @settings_router.get("", response_model=FarmSettingsResponse)
@@ -66,35 +91,416 @@ async def update_farm_settings(
     )
 
 
+@settings_router.get("/cache-stats")
+async def get_settings_cache_stats(service: FarmSettingsService = Depends(get_farm_settings_service)):
+    # Endpoint exposing hit/miss counters of the in-process settings cache.
+    return service.cache.stats()
+
+
 # --- Weather Endpoints ---
-@weather_router.get("/current", response_model=WeatherResponse)
-async def get_current_weather_data(service: WeatherService = Depends(get_weather_service)):
-    # Endpoint to fetch current weather data.
-    data = await service.get_latest_weather()
+def _snapshot_response(request: Request, snapshot) -> Response:
+    # The pre-serialized body is returned as-is; clients that already hold it get a 304
+    headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), snapshot.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+
+async def _current_weather_response(request: Request, service: WeatherService, farm_id: Optional[str] = None) -> Response:
+    # Served from the in-memory snapshot published by the scheduler; Appwrite is only a cold-start fallback.
+    snapshot = await service.get_latest_snapshot(farm_id)
     
-    # If no weather data is found in the database, attempt to fetch and update the data from the external service
-    if not data:  
-        print("No current weather in DB, attempting to update...")
-        data = await service.update_weather_data()
+    # If no weather data is available yet, attempt to fetch and update the data from the external service
+    if not snapshot:  
+        logger.info("No current weather in DB, attempting to update...")
+        if await service.update_weather_data(farm_id):
+            snapshot = service.latest_snapshots.get(farm_id or service.default_farm_id)
     
     # If weather data is still unavailable, raise a 404 HTTP exception
-    if not data:
+    if not snapshot:
         raise HTTPException(status_code=404, detail="Weather data not available.")
+    return _snapshot_response(request, snapshot)
+
+
+async def _weather_history_response(service: WeatherService, limit: int, offset: int, farm_id: Optional[str] = None,
+                                    start: Optional[datetime] = None, end: Optional[datetime] = None,
+                                    cursor: Optional[str] = None, bucket: Optional[str] = None,
+                                    recommendations: bool = False, fields: Optional[str] = None) -> Response:
+    if start and end and to_utc(start) >= to_utc(end):
+        raise HTTPException(status_code=400, detail="'start' must be earlier than 'end'.")
+    try:
+        selected = parse_fields(fields) if fields else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Ranges that end before the raw-reading retention only exist as rollups: answer with
+    # the finest aggregation left instead of an empty page
+    if not bucket and service.history_tier(end) != "raw":
+        bucket = service.history_tier(end)
+
+    # Downsampled series: min/mean/max per bucket, computed server-side over the whole range
+    if bucket:
+        aggregated = await service.aggregate_weather_history(bucket, farm_id=farm_id, start=start, end=end)
+        include = None
+        if selected:
+            # Keep only the aggregates of the selected metrics
+            kept = {"start", "count", "tier"} | {metric for metric in AGGREGATED_METRICS if metric in selected}
+            include = {"bucket": True, "start": True, "end": True, "total": True, "truncated": True,
+                       "buckets": {"__all__": kept}}
+        return json_response(WeatherHistoryAggregateResponse(**aggregated), include=include)
+
+    history_result = await service.get_weather_history(
+        limit=limit, offset=offset, farm_id=farm_id, start=start, end=end, cursor=cursor
+    )
+
+    # Slim records: only the selected columns, without Appwrite metadata or model validation
+    if selected:
+        documents = history_result.get('documents', [])
+        rows = project_documents(documents, selected)
+        if recommendations and rows:
+            annotations = await service.recommend_for_documents(documents, farm_id)
+            for row, texts in zip(rows, annotations):
+                row["recommendations"] = texts
+        return json_response({
+            "total": history_result.get('total', 0), "documents": rows, "next_cursor": history_result.get('next_cursor')
+        })
     
-    return data
+    # Validate the documents returned and convert them into WeatherHistoryRecord models
+    with timer(STAGE_SECONDS, stage="validation"):
+        validated_documents = [WeatherHistoryRecord.model_validate(doc) for doc in history_result.get('documents', [])]
+
+    # Optionally annotate every reading with its recommendations (one vectorized pass over the page)
+    if recommendations and validated_documents:
+        annotations = await service.recommend_for_documents(history_result['documents'], farm_id)
+        for record, texts in zip(validated_documents, annotations):
+            record.recommendations = texts
+    
+    # Return the total number of records and the list of validated weather history documents.
+    # Records only carry `recommendations` when they were asked for.
+    return json_response(WeatherHistoryResponse(
+        total=history_result.get('total', 0),
+        documents=validated_documents,
+        next_cursor=history_result.get('next_cursor')
+    ), exclude=None if recommendations else {"documents": {"__all__": {"recommendations"}}})
+
+
+async def _weather_export_response(service: WeatherService, fmt: str, farm_id: Optional[str] = None,
+                                   start: Optional[datetime] = None, end: Optional[datetime] = None) -> StreamingResponse:
+    if start and end and to_utc(start) >= to_utc(end):
+        raise HTTPException(status_code=400, detail="'start' must be earlier than 'end'.")
+
+    # Read the first page before answering, so an unavailable Appwrite is a 503 rather than an empty file.
+    # Compacted periods are exported from their rollups, marked by the `tier` column.
+    pages = service.iter_history(farm_id, start, end, select=EXPORT_SELECT)
+    first_page = await anext(pages, None)
+    if first_page is None and not service.appwrite.healthy:
+        raise HTTPException(status_code=503, detail="Weather history is temporarily unavailable.")
+
+    media_type, extension = EXPORT_FORMATS[fmt]
+    filename = f"weather-{farm_id or service.default_farm_id}.{extension}"
+    return StreamingResponse(
+        stream_export(fmt, prepend_page(first_page, pages), settings.EXPORT_BATCH_ROWS, lambda: service.appwrite.healthy),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+async def _weather_stream_response(request: Request, service: WeatherService, farm_id: Optional[str] = None) -> SubscriptionResponse:
+    farm_id = farm_id or service.default_farm_id
+    if not await service.settings_service.get_settings(farm_id):
+        raise HTTPException(status_code=404, detail=f"Farm '{farm_id}' not found.")
+
+    subscription = service.broadcaster.subscribe(farm_id)
+    if subscription is None:
+        raise HTTPException(status_code=503, detail="Too many open weather streams.")
+
+    # Start with the current reading, unless the client is reconnecting and already has it
+    current = service.latest_snapshots.get(farm_id)
+    if current and current.etag != request.headers.get("last-event-id"):
+        subscription.offer(current)
+
+    return SubscriptionResponse(
+        subscription,
+        sse_events(subscription, settings.STREAM_HEARTBEAT_SECONDS, settings.STREAM_RETRY_MS, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # Disable proxy buffering
+    )
+
+
+async def _agronomy_response(service: WeatherService, farm_id: Optional[str] = None,
+                             start: Optional[datetime] = None, end: Optional[datetime] = None) -> AgronomyResponse:
+    if start and end and to_utc(start) >= to_utc(end):
+        raise HTTPException(status_code=400, detail="'start' must be earlier than 'end'.")
+    try:
+        metrics = await service.agronomy_metrics(farm_id, start, end)
+    except RuntimeError:
+        raise HTTPException(status_code=503, detail="Weather history is temporarily unavailable.")
+    if metrics is None:
+        raise HTTPException(status_code=404, detail=f"Farm '{farm_id}' not found.")
+    return AgronomyResponse(**metrics)
+
+
+async def _forecast_response(request: Request, service: WeatherService, farm_id: Optional[str] = None) -> Response:
+    # Served from the in-memory forecast of the farm's grid cell (same ETag/304 handling as /current)
+    try:
+        series = await service.get_forecast(farm_id)
+    except RuntimeError:
+        raise HTTPException(status_code=503, detail="Forecast is temporarily unavailable.")
+    if series is None:
+        raise HTTPException(status_code=404, detail=f"Farm '{farm_id}' not found.")
+    return _snapshot_response(request, series)
+
+
+@weather_router.get("/current", response_model=WeatherResponse)
+async def get_current_weather_data(request: Request, service: WeatherService = Depends(get_weather_service)):
+    # Endpoint to fetch current weather data for the default farm.
+    return await _current_weather_response(request, service)
 
 
-@weather_router.get("/history", response_model=WeatherHistoryResponse)
+@weather_router.get("/stream")
+async def stream_weather_data(request: Request, service: WeatherService = Depends(get_weather_service)):
+    # Server-Sent Events stream of the default farm's readings: one `weather` event (a
+    # WeatherResponse) per scheduler update, instead of polling /current.
+    return await _weather_stream_response(request, service)
+
+
+@weather_router.get("/forecast", response_model=ForecastResponse)
+async def get_weather_forecast(request: Request, service: WeatherService = Depends(get_weather_service)):
+    # Endpoint to fetch the upcoming forecast (and One Call alerts, when enabled) for the default farm.
+    return await _forecast_response(request, service)
+
+
+@weather_router.get("/history", response_model=Union[WeatherHistoryResponse, WeatherHistoryAggregateResponse])
 async def get_weather_data_history(
     limit: int = FastAPIQuery(10, ge=1, le=100),  # Limit for number of records to return (between 1 and 100)
     offset: int = FastAPIQuery(0, ge=0),  # Offset for pagination, defaults to 0
+    start: Optional[datetime] = FastAPIQuery(None),  # Only readings at or after this time
+    end: Optional[datetime] = FastAPIQuery(None),  # Only readings before this time
+    cursor: Optional[str] = FastAPIQuery(None),  # `next_cursor` of the previous page (takes precedence over offset)
+    bucket: Optional[Literal["hourly", "daily"]] = FastAPIQuery(None),  # Return min/mean/max aggregates instead of documents
+    recommendations: bool = FastAPIQuery(False),  # Include the recommendations of each reading
+    fields: Optional[str] = FastAPIQuery(None),  # Comma-separated columns to return (slim records without metadata)
     service: WeatherService = Depends(get_weather_service)
 ):
-    # Endpoint to fetch historical weather data.
-    history_result = await service.get_weather_history(limit=limit, offset=offset)
-    
-    # Validate the documents returned and convert them into WeatherHistoryRecord models
-    validated_documents = [WeatherHistoryRecord.model_validate(doc) for doc in history_result.get('documents', [])]
-    
-    # Return the total number of records and the list of validated weather history documents
-    return WeatherHistoryResponse(total=history_result.get('total', 0), documents=validated_documents)
+    # Endpoint to fetch historical weather data for the default farm.
+    return await _weather_history_response(
+        service, limit, offset, start=start, end=end, cursor=cursor, bucket=bucket, recommendations=recommendations,
+        fields=fields
+    )
+
+
+@weather_router.get("/export")
+async def export_weather_data(
+    format: Literal["csv", "arrow", "parquet"] = FastAPIQuery("csv"),  # Output format
+    start: Optional[datetime] = FastAPIQuery(None),  # Only readings at or after this time
+    end: Optional[datetime] = FastAPIQuery(None),  # Only readings before this time
+    service: WeatherService = Depends(get_weather_service)
+):
+    # Endpoint streaming the default farm's history (whole range by default) as a file.
+    return await _weather_export_response(service, format, start=start, end=end)
+
+
+@weather_router.get("/agronomy", response_model=AgronomyResponse)
+async def get_agronomy_metrics(
+    start: Optional[datetime] = FastAPIQuery(None),  # First day (defaults to HISTORY_DEFAULT_RANGE_DAYS before `end`)
+    end: Optional[datetime] = FastAPIQuery(None),  # End of the range (defaults to now)
+    service: WeatherService = Depends(get_weather_service)
+):
+    # Endpoint returning daily GDD, ET0, dew point, VPD and rolling temperature extremes for the default farm.
+    return await _agronomy_response(service, start=start, end=end)
+
+
+@weather_router.get("/writer-stats")
+async def get_writer_stats(service: WeatherService = Depends(get_weather_service)):
+    # Endpoint exposing buffer depth and counters of the batched observation writer.
+    return service.writer.stats()
+
+
+@weather_router.get("/recommendation-rules")
+async def get_recommendation_rules(service: WeatherService = Depends(get_weather_service)):
+    # Endpoint exposing the in-memory recommendation rules and texts.
+    return service.rule_table.as_dict()
+
+
+@weather_router.post("/recommendation-rules/reload")
+async def reload_recommendation_rules(service: WeatherService = Depends(get_weather_service)):
+    # Endpoint to reload the rules right after the recommendations collection was edited.
+    if not await service.load_recommendations():
+        raise HTTPException(status_code=503, detail="Could not load recommendations from Appwrite.")
+    return service.rule_table.as_dict()
+
+
+@weather_router.get("/stream-stats")
+async def get_stream_stats(service: WeatherService = Depends(get_weather_service)):
+    # Endpoint exposing open streams and delivered/dropped frame counters.
+    return service.broadcaster.stats()
+
+
+# --- Farm-Scoped Endpoints ---
+# Same resources as above, addressed by farm ID. A farm is created by POSTing its settings;
+# the weather endpoints of an unknown farm all answer 404 (see get_existing_farm_id).
+
+@farms_router.get("", response_model=List[FarmSettingsResponse])
+async def list_farms(service: FarmSettingsService = Depends(get_farm_settings_service)):
+    # Endpoint to list every farm with its settings.
+    farms = await service.list_farms()
+    return [FarmSettingsResponse(**farm_settings.model_dump(), id=farm_id) for farm_id, farm_settings in farms]
+
+
+@farms_router.get("/{farm_id}/settings", response_model=FarmSettingsResponse)
+async def get_farm_settings(farm_id: str, service: FarmSettingsService = Depends(get_farm_settings_service)):
+    # Endpoint to fetch the settings of one farm.
+    farm_settings_data = await service.get_settings(farm_id)
+    if not farm_settings_data:
+        raise HTTPException(status_code=404, detail=f"Farm '{farm_id}' not found.")
+    return FarmSettingsResponse(**farm_settings_data.model_dump(), id=farm_id)
+
+
+@farms_router.post("/{farm_id}/settings", response_model=FarmSettingsResponse)
+async def upsert_farm_settings(
+    farm_id: str,
+    settings_update: FarmSettingsData,  # Data to create or update the farm with
+    service: FarmSettingsService = Depends(get_farm_settings_service)
+):
+    # Endpoint to create a farm or update its settings.
+    updated_settings = await service.update_settings(settings_update, farm_id=farm_id, create=True)
+    if not updated_settings:
+        raise HTTPException(status_code=500, detail="Failed to update settings in Appwrite.")
+    return FarmSettingsResponse(**updated_settings.model_dump(), id=farm_id)
+
+
+@farms_router.get("/{farm_id}/weather/current", response_model=WeatherResponse)
+async def get_farm_current_weather(request: Request, farm_id: str = Depends(get_existing_farm_id),
+                                   service: WeatherService = Depends(get_weather_service)):
+    # Endpoint to fetch current weather data for one farm.
+    return await _current_weather_response(request, service, farm_id)
+
+
+@farms_router.get("/{farm_id}/weather/stream")
+async def stream_farm_weather(request: Request, farm_id: str = Depends(get_existing_farm_id),
+                              service: WeatherService = Depends(get_weather_service)):
+    # Server-Sent Events stream of one farm's readings.
+    return await _weather_stream_response(request, service, farm_id)
+
+
+@farms_router.get("/{farm_id}/weather/forecast", response_model=ForecastResponse)
+async def get_farm_weather_forecast(request: Request, farm_id: str = Depends(get_existing_farm_id),
+                                    service: WeatherService = Depends(get_weather_service)):
+    # Endpoint to fetch the upcoming forecast for one farm.
+    return await _forecast_response(request, service, farm_id)
+
+
+@farms_router.get("/{farm_id}/weather/history", response_model=Union[WeatherHistoryResponse, WeatherHistoryAggregateResponse])
+async def get_farm_weather_history(
+    limit: int = FastAPIQuery(10, ge=1, le=100),
+    offset: int = FastAPIQuery(0, ge=0),
+    start: Optional[datetime] = FastAPIQuery(None),
+    end: Optional[datetime] = FastAPIQuery(None),
+    cursor: Optional[str] = FastAPIQuery(None),
+    bucket: Optional[Literal["hourly", "daily"]] = FastAPIQuery(None),
+    recommendations: bool = FastAPIQuery(False),
+    fields: Optional[str] = FastAPIQuery(None),
+    farm_id: str = Depends(get_existing_farm_id),
+    service: WeatherService = Depends(get_weather_service)
+):
+    # Endpoint to fetch historical weather data for one farm.
+    return await _weather_history_response(
+        service, limit, offset, farm_id, start=start, end=end, cursor=cursor, bucket=bucket, recommendations=recommendations,
+        fields=fields
+    )
+
+
+@farms_router.get("/{farm_id}/weather/export")
+async def export_farm_weather(
+    format: Literal["csv", "arrow", "parquet"] = FastAPIQuery("csv"),
+    start: Optional[datetime] = FastAPIQuery(None),
+    end: Optional[datetime] = FastAPIQuery(None),
+    farm_id: str = Depends(get_existing_farm_id),
+    service: WeatherService = Depends(get_weather_service)
+):
+    # Endpoint streaming one farm's history as a file.
+    return await _weather_export_response(service, format, farm_id, start=start, end=end)
+
+
+@farms_router.get("/{farm_id}/weather/agronomy", response_model=AgronomyResponse)
+async def get_farm_agronomy_metrics(
+    start: Optional[datetime] = FastAPIQuery(None),
+    end: Optional[datetime] = FastAPIQuery(None),
+    farm_id: str = Depends(get_existing_farm_id),
+    service: WeatherService = Depends(get_weather_service)
+):
+    # Endpoint returning daily agronomic metrics for one farm.
+    return await _agronomy_response(service, farm_id, start=start, end=end)
+
+
+# --- Admin Endpoints ---
+@admin_router.get("/schedule")
+async def get_refresh_schedule(services: ServiceContainer = Depends(get_services)):
+    # Endpoint exposing the refresh plan: next run, adapted interval and reason per grid cell.
+    plan = services.planner.plan()
+    plan["owm_rate_limited_until"] = services.owm.rate_limited_until or None
+    return plan
+
+
+@admin_router.get("/upstreams")
+async def get_upstream_health(services: ServiceContainer = Depends(get_services)):
+    # Endpoint exposing circuit breaker state, rate limiter and retry counters of OWM and Appwrite.
+    return {
+        "openweathermap": services.owm.policy.stats(),
+        "appwrite": {**services.appwrite.policy.stats(), "healthy": services.appwrite.healthy, "last_error": services.appwrite.last_error},
+        "retry_budget": services.retry_budget.stats(),
+    }
+
+
+@admin_router.get("/coordination")
+async def get_coordination(services: ServiceContainer = Depends(get_services)):
+    # Endpoint exposing scheduler leadership and snapshot sharing between workers.
+    if services.coordinator is None:
+        return {"enabled": False}
+    return {"enabled": True, **await run_in_threadpool(services.coordinator.stats)}
+
+@admin_router.get("/retention")
+async def get_retention(services: ServiceContainer = Depends(get_services)):
+    # Endpoint exposing the retention cutoffs and history compaction counters.
+    if services.compactor is None:
+        return {"enabled": False}
+    return {"enabled": True, **services.compactor.stats()}
+
+@admin_router.get("/alerts")
+async def get_alerts(services: ServiceContainer = Depends(get_services)):
+    # Endpoint exposing active alerts and the delivery state of the alert outbox.
+    if services.alerts is None:
+        return {"enabled": False}
+    return {"enabled": True, **services.alerts.stats(), "outbox": await run_in_threadpool(services.outbox.stats)}
+
+# --- Health Endpoints ---
+@health_router.get("/live")
+async def get_liveness():
+    # Endpoint answering as long as the event loop is responsive.
+    return {"status": "ok"}
+
+
+@health_router.get("/ready")
+async def get_readiness(services: ServiceContainer = Depends(get_services)):
+    # Endpoint for readiness probes. The app serves requests as soon as it starts; `state`
+    # tells whether readings are already answered from memory ("warm": a refresh or a
+    # snapshot pull has published one for any farm) or still fall back to Appwrite ("cold",
+    # or "warming" while the startup loading is still running).
+    warmup = services.warmup_task
+    weather = services.weather
+    if weather.latest_snapshots:
+        state = "warm"
+    elif warmup is not None and not warmup.done():
+        state = "warming"
+    else:
+        state = "cold"
+    coordinator = services.coordinator
+    return {
+        "status": "ready",
+        "state": state,
+        "role": "standalone" if coordinator is None else ("leader" if coordinator.is_leader else "follower"),
+        "snapshots": len(weather.latest_snapshots),
+        "recommendation_rules": len(weather.rule_table.rules),
+        "uptime_seconds": round(time.time() - services.started_at, 1),
+    }
+
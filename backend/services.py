@@ -1,84 +1,423 @@
+import asyncio
 import httpx
 from appwrite.client import Client as AppwriteClientSDK
 from appwrite.services.databases import Databases
-from appwrite.id import ID as AppwriteID
 from appwrite.query import Query as AppwriteQuery
-from datetime import datetime
-from typing import Optional, Dict, Any, List
+from appwrite.exception import AppwriteException
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Awaitable, Callable, Dict, Any, List, NamedTuple, Tuple
 import json
+import logging
 import math
+import time
 
 from .config import settings
-from .models import FarmSettingsData, WeatherData, WeatherLocation, SunData
+from .models import FarmSettingsData, WeatherData, WeatherResponse
+from .cache import MISSING, AsyncTTLCache
+from .snapshot import WeatherSnapshot
+from .broadcast import SnapshotBroadcaster
+from .singleflight import SingleFlight
+from .resilience import CircuitBreaker, CircuitOpenError, DeadlineExceeded, ResiliencePolicy, RetryBudget, TokenBucket
+from .writer import ObservationWriter, new_document_id
+from .observation import Observation
+from .agronomy import AgronomyCache, day_number
+from .forecast import ForecastSeries, alerts_from_onecall, parse_max_age, points_from_forecast, points_from_onecall
+from .recommendations import DEFAULT_TABLE, RULE_METRICS, RuleTable, document_column
+from .history import AGGREGATED_METRICS, TIME_ATTRIBUTE, BucketAggregator, document_time, to_appwrite_datetime, to_utc
+from .retention import retention_cutoffs, rollup_queries
+from .observability import STAGE_SECONDS, UPSTREAM_SECONDS, record_cache, timed, timer
+
+logger = logging.getLogger(__name__)
 
 # --- Appwrite Client ---
+# Document ID that asks the server to generate one. Not appwrite.id.ID.unique(): since SDK 6 that
+# returns a new random ID on every call, so it cannot be compared against.
+SERVER_GENERATED_ID = "unique()"
+
+def appwrite_transient(error: Exception) -> bool:
+    # A 4xx answer (missing document, bad query...) still means the server is reachable
+    code = getattr(error, 'code', None)
+    return not (isinstance(error, AppwriteException) and isinstance(code, int) and 400 <= code < 500 and code != 429)
+
+def build_appwrite_policy(budget: Optional[RetryBudget] = None) -> ResiliencePolicy:
+    return ResiliencePolicy(
+        "appwrite",
+        CircuitBreaker("appwrite", settings.BREAKER_FAILURE_THRESHOLD, settings.BREAKER_RECOVERY_SECONDS),
+        budget or RetryBudget(settings.RETRY_BUDGET_RATIO, settings.RETRY_BUDGET_MIN_PER_SECOND),
+        settings.APPWRITE_DEADLINE_SECONDS,
+        max_attempts=settings.RETRY_MAX_ATTEMPTS, base_delay=settings.RETRY_BASE_DELAY_SECONDS,
+        max_delay=settings.RETRY_MAX_DELAY_SECONDS, is_transient=appwrite_transient
+    )
+
 class AppwriteService:
-    def __init__(self):
+    # Blocking client on the Appwrite SDK, for scripts (see migrate_observations.py); the app
+    # uses AsyncAppwriteService. Every SDK call goes through `policy` (retries, deadline,
+    # circuit breaker).
+    def __init__(self, policy: Optional[ResiliencePolicy] = None):
         client = AppwriteClientSDK()
         client.set_endpoint(settings.APPWRITE_ENDPOINT)
         client.set_project(settings.APPWRITE_PROJECT_ID)
         client.set_key(settings.APPWRITE_API_KEY)
         self.databases = Databases(client)
         self.db_id = settings.APPWRITE_DATABASE_ID
+        # Health of the remote, updated on every call. Errors are still swallowed below, so
+        # callers check this flag to tell "no documents" apart from "Appwrite is down".
+        self.healthy = True
+        self.last_error: Optional[str] = None
+        self.policy = policy or build_appwrite_policy()
+
+    def _record(self, error: Optional[Exception] = None):
+        if error is None:
+            self.healthy = True
+            return
+        self.last_error = str(error)
+        if appwrite_transient(error):
+            self.healthy = False
 
     def get_document(self, collection_id: str, document_id: str) -> Optional[Dict[str, Any]]:
         try:
-            return self.databases.get_document(self.db_id, collection_id, document_id)
+            doc = self.policy.call_sync(lambda: self.databases.get_document(self.db_id, collection_id, document_id))
+            self._record()
+            return doc
         except Exception as e:
-            print(f"Appwrite: Error getting document {document_id} from {collection_id}: {e}")
+            self._record(e)
+            logger.warning(f"Appwrite: Error getting document {document_id} from {collection_id}: {e}")
             return None
 
     def update_document(self, collection_id: str, document_id: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         try:
-            return self.databases.update_document(self.db_id, collection_id, document_id, data)
+            doc = self.policy.call_sync(lambda: self.databases.update_document(self.db_id, collection_id, document_id, data))
+            self._record()
+            return doc
         except Exception as e:
-            print(f"Appwrite: Error updating document {document_id} in {collection_id}: {e}")
+            self._record(e)
+            logger.warning(f"Appwrite: Error updating document {document_id} in {collection_id}: {e}")
             return None
     
     def create_document(self, collection_id: str, document_id:str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         try:
-            doc_id = document_id if document_id != AppwriteID.unique() else AppwriteID.unique()
-            return self.databases.create_document(self.db_id, collection_id, doc_id, data)
+            # A server-generated ID is not retried: a lost response would otherwise create a duplicate
+            doc = self.policy.call_sync(
+                lambda: self.databases.create_document(self.db_id, collection_id, document_id, data),
+                retry=document_id != SERVER_GENERATED_ID
+            )
+            self._record()
+            return doc
         except Exception as e:
-            print(f"Appwrite: Error creating document in {collection_id}: {e}")
+            self._record(e)
+            logger.warning(f"Appwrite: Error creating document in {collection_id}: {e}")
             return None
 
     def list_documents(self, collection_id: str, queries: Optional[List[str]] = None) -> Dict[str, Any]:
         try:
-            return self.databases.list_documents(self.db_id, collection_id, queries=queries)
+            result = self.policy.call_sync(lambda: self.databases.list_documents(self.db_id, collection_id, queries=queries))
+            self._record()
+            return result
+        except Exception as e:
+            self._record(e)
+            logger.warning(f"Appwrite: Error listing documents from {collection_id}: {e}")
+            return {'total': 0, 'documents': []}
+
+
+class AsyncAppwriteService:
+    # Same interface as AppwriteService, but awaitable: talks to the Appwrite REST API over a
+    # pooled httpx.AsyncClient, so database calls no longer hold a worker thread each and the
+    # thread-pool size stops being the API's concurrency ceiling. Requests get real timeouts
+    # (HTTP_CONNECT_TIMEOUT/HTTP_TIMEOUT), so the policy deadline can interrupt a slow call.
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None, policy: Optional[ResiliencePolicy] = None):
+        self.endpoint = settings.APPWRITE_ENDPOINT.rstrip('/')
+        self.db_id = settings.APPWRITE_DATABASE_ID
+        self.headers = {
+            'X-Appwrite-Project': settings.APPWRITE_PROJECT_ID,
+            'X-Appwrite-Key': settings.APPWRITE_API_KEY,
+            'X-Appwrite-Response-Format': '1.6.0',
+        }
+        self._owns_client = http_client is None
+        self.client = http_client or build_http_client(settings.APPWRITE_MAX_CONNECTIONS)
+        self.healthy = True
+        self.last_error: Optional[str] = None
+        self.policy = policy or build_appwrite_policy()
+
+    _record = AppwriteService._record  # Same health tracking as the SDK-based service
+
+    def _documents_url(self, collection_id: str, document_id: Optional[str] = None) -> str:
+        url = f"{self.endpoint}/databases/{self.db_id}/collections/{collection_id}/documents"
+        return f"{url}/{document_id}" if document_id else url
+
+    async def _request(self, operation: str, method: str, url: str, retry: bool = True, **kwargs) -> Dict[str, Any]:
+        # Errors are raised as AppwriteException, like the SDK does, so callers handle both alike.
+        # `operation` labels the call's latency histogram.
+        async def attempt() -> Dict[str, Any]:
+            try:
+                response = await self.client.request(method, url, headers=self.headers, **kwargs)
+            except httpx.RequestError as e:
+                raise AppwriteException(f"{type(e).__name__}: {e}")
+            if response.status_code >= 400:
+                try:
+                    body = response.json()
+                except ValueError:
+                    raise AppwriteException(response.text, response.status_code)
+                raise AppwriteException(body.get('message', response.text), response.status_code, body.get('type'), body)
+            return response.json() if response.content else {}  # Deletes answer 204 without a body
+        with timer(UPSTREAM_SECONDS, upstream="appwrite", operation=operation):
+            return await self.policy.call(attempt, retry=retry)
+
+    async def get_document(self, collection_id: str, document_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            doc = await self._request('get_document', 'GET', self._documents_url(collection_id, document_id))
+            self._record()
+            return doc
+        except Exception as e:
+            self._record(e)
+            logger.warning(f"Appwrite: Error getting document {document_id} from {collection_id}: {e}")
+            return None
+
+    async def update_document(self, collection_id: str, document_id: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        try:
+            doc = await self._request('update_document', 'PATCH', self._documents_url(collection_id, document_id), json={'data': data})
+            self._record()
+            return doc
+        except Exception as e:
+            self._record(e)
+            logger.warning(f"Appwrite: Error updating document {document_id} in {collection_id}: {e}")
+            return None
+
+    async def create_document(self, collection_id: str, document_id: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        try:
+            # A generated ID is not retried: a lost response would otherwise create a duplicate
+            doc = await self._request(
+                'create_document', 'POST', self._documents_url(collection_id), retry=document_id != SERVER_GENERATED_ID,
+                json={'documentId': document_id, 'data': data}
+            )
+            self._record()
+            return doc
+        except Exception as e:
+            self._record(e)
+            logger.warning(f"Appwrite: Error creating document in {collection_id}: {e}")
+            return None
+
+    async def create_documents(self, collection_id: str, documents: List[Tuple[str, Dict[str, Any]]]) -> List[Tuple[str, Dict[str, Any]]]:
+        # Writes a batch of (document_id, data) pairs, APPWRITE_WRITE_CONCURRENCY at a time, and
+        # returns the pairs that failed. A document that already exists (409) was written by an
+        # earlier attempt, so it counts as a success and retries stay idempotent. Once the
+        # remote looks unreachable the remaining chunks are returned untried.
+        failed: List[Tuple[str, Dict[str, Any]]] = []
+
+        async def create(document_id: str, data: Dict[str, Any]) -> Optional[Exception]:
+            try:
+                # No retries here: ObservationWriter retries whole batches itself
+                await self._request('create_document', 'POST', self._documents_url(collection_id), retry=False,
+                                    json={'documentId': document_id, 'data': data})
+            except Exception as e:
+                if isinstance(e, AppwriteException) and e.code == 409:
+                    return None
+                return e
+            return None
+
+        step = settings.APPWRITE_WRITE_CONCURRENCY
+        for start in range(0, len(documents), step):
+            chunk = documents[start:start + step]
+            errors = await asyncio.gather(*(create(document_id, data) for document_id, data in chunk))
+            for (document_id, data), error in zip(chunk, errors):
+                self._record(error)
+                if error is not None:
+                    logger.warning(f"Appwrite: Error creating document {document_id} in {collection_id}: {error}")
+                    failed.append((document_id, data))
+            if not self.healthy:
+                failed.extend(documents[start + step:])
+                break
+        return failed
+
+    async def delete_documents(self, collection_id: str, document_ids: List[str]) -> int:
+        # Deletes APPWRITE_WRITE_CONCURRENCY documents at a time and returns how many are gone
+        # (already missing ones included). Stops early once the remote looks unreachable.
+        async def delete(document_id: str) -> Optional[Exception]:
+            try:
+                await self._request('delete_document', 'DELETE', self._documents_url(collection_id, document_id), retry=False)
+            except Exception as e:
+                if isinstance(e, AppwriteException) and e.code == 404:
+                    return None
+                return e
+            return None
+
+        deleted = 0
+        step = settings.APPWRITE_WRITE_CONCURRENCY
+        for start in range(0, len(document_ids), step):
+            chunk = document_ids[start:start + step]
+            errors = await asyncio.gather(*(delete(document_id) for document_id in chunk))
+            for document_id, error in zip(chunk, errors):
+                self._record(error)
+                if error is not None:
+                    logger.warning(f"Appwrite: Error deleting document {document_id} from {collection_id}: {error}")
+                else:
+                    deleted += 1
+            if not self.healthy:
+                break
+        return deleted
+
+    async def list_documents(self, collection_id: str, queries: Optional[List[str]] = None) -> Dict[str, Any]:
+        try:
+            params = [('queries[]', query) for query in queries or []]
+            result = await self._request('list_documents', 'GET', self._documents_url(collection_id), params=params)
+            self._record()
+            return result
         except Exception as e:
-            print(f"Appwrite: Error listing documents from {collection_id}: {e}")
+            self._record(e)
+            logger.warning(f"Appwrite: Error listing documents from {collection_id}: {e}")
             return {'total': 0, 'documents': []}
 
+    async def aclose(self):
+        if self._owns_client:
+            await self.client.aclose()
+
 # --- OpenWeatherMap Client ---
+def build_http_client(max_connections: Optional[int] = None) -> httpx.AsyncClient:
+    # Builds a keep-alive client that lives as long as the app (one for OWM, one for Appwrite).
+    # Reusing one pool avoids a new TCP+TLS handshake per request.
+    max_connections = max_connections or settings.HTTP_MAX_CONNECTIONS
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=min(settings.HTTP_MAX_KEEPALIVE_CONNECTIONS, max_connections),
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+    )
+    timeout = httpx.Timeout(settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT)
+    http2 = settings.HTTP2_ENABLED
+    if http2:
+        try:
+            import h2  # noqa: F401  (optional dependency pulled in by httpx[http2])
+        except ImportError:
+            logger.warning("HTTP/2 requested but the 'h2' package is not installed; falling back to HTTP/1.1.")
+            http2 = False
+    return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2)
+
+class ConditionalResult(NamedTuple):
+    not_modified: bool
+    payload: Optional[Dict[str, Any]]
+    etag: Optional[str]
+    max_age: Optional[int]  # From Cache-Control; None when the upstream sent none
+
+def owm_transient(error: Exception) -> bool:
+    # Network errors, timeouts and 5xx are worth retrying; other answers are final
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return isinstance(error, httpx.RequestError)
+
+def build_owm_policy(budget: Optional[RetryBudget] = None) -> ResiliencePolicy:
+    return ResiliencePolicy(
+        "openweathermap",
+        CircuitBreaker("openweathermap", settings.BREAKER_FAILURE_THRESHOLD, settings.BREAKER_RECOVERY_SECONDS),
+        budget or RetryBudget(settings.RETRY_BUDGET_RATIO, settings.RETRY_BUDGET_MIN_PER_SECOND),
+        settings.OWM_DEADLINE_SECONDS,
+        limiter=TokenBucket(settings.OWM_RATE_LIMIT_PER_MINUTE / 60, settings.OWM_RATE_LIMIT_BURST),
+        max_attempts=settings.RETRY_MAX_ATTEMPTS, base_delay=settings.RETRY_BASE_DELAY_SECONDS,
+        max_delay=settings.RETRY_MAX_DELAY_SECONDS, is_transient=owm_transient
+    )
+
+# Failures that mean "no answer from OWM this time"; callers log them and return None
+OWM_ERRORS = (httpx.RequestError, CircuitOpenError, DeadlineExceeded, asyncio.TimeoutError)
+
 class OpenWeatherMapService:
-    def __init__(self):
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None, policy: Optional[ResiliencePolicy] = None):
         self.api_key = settings.OPENWEATHERMAP_API_KEY
         self.base_url = settings.OPENWEATHERMAP_BASE_URL
+        # When no shared client is injected the service owns its own pool and must close it.
+        self._owns_client = http_client is None
+        self.client = http_client or build_http_client()
+        self.rate_limited_until = 0.0  # Unix time until which OWM asked us to back off (429)
+        self.policy = policy or build_owm_policy()  # Rate limit, retries, deadline and circuit breaker
+        self.recorder = None  # PayloadRecorder that keeps every /weather payload (OWM_RECORD_PATH, see recorder.py)
 
     async def get_current_weather(self, lat: float, lon: float, units: str = "metric") -> Optional[Dict[str, Any]]:
         url = f"{self.base_url}/weather"
         params = {'lat': lat, 'lon': lon, 'appid': self.api_key, 'units': units}
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(url, params=params)
+        try:
+            response = await self._get(url, params, operation="current")
+            payload = response.json()
+            if self.recorder is not None:
+                self.recorder.record(lat, lon, units, payload)
+            return payload
+        except OWM_ERRORS as e:
+            logger.warning(f"OpenWeatherMap: Error fetching current weather: {e or type(e).__name__}")
+            return None
+        except ValueError as e:
+            logger.warning(f"OpenWeatherMap: Invalid current weather response: {e}")
+            return None
+        except httpx.HTTPStatusError as e:
+            self._check_rate_limit(e.response)
+            logger.warning(f"OpenWeatherMap: HTTP error fetching current weather: {e.response.status_code} - {e.response.text}")
+            return None
+
+    async def get_forecast(self, lat: float, lon: float, units: str = "metric", etag: Optional[str] = None) -> Optional[ConditionalResult]:
+        # 5 day / 3 hour forecast
+        params = {'lat': lat, 'lon': lon, 'appid': self.api_key, 'units': units}
+        return await self._get_conditional(f"{self.base_url}/forecast", params, etag, "forecast", "forecast")
+
+    async def get_one_call(self, lat: float, lon: float, units: str = "metric", etag: Optional[str] = None) -> Optional[ConditionalResult]:
+        # Hourly forecast and alerts in one request (OPENWEATHERMAP_ONECALL_URL)
+        params = {'lat': lat, 'lon': lon, 'appid': self.api_key, 'units': units, 'exclude': 'current,minutely,daily'}
+        return await self._get_conditional(settings.OPENWEATHERMAP_ONECALL_URL, params, etag, "one call", "onecall")
+
+    async def _get_conditional(self, url: str, params: Dict[str, Any], etag: Optional[str], label: str,
+                               operation: str) -> Optional[ConditionalResult]:
+        # GET with If-None-Match; a 304 comes back as not_modified without a payload
+        headers = {'If-None-Match': etag} if etag else None
+        try:
+            response = await self._get(url, params, headers, operation)
+            max_age = parse_max_age(response.headers.get("cache-control"))
+            if response.status_code == 304:
+                return ConditionalResult(True, None, response.headers.get("etag") or etag, max_age)
+            return ConditionalResult(False, response.json(), response.headers.get("etag"), max_age)
+        except OWM_ERRORS as e:
+            logger.warning(f"OpenWeatherMap: Error fetching {label}: {e or type(e).__name__}")
+            return None
+        except ValueError as e:  # A 200 whose body is not JSON, e.g. a proxy error page
+            logger.warning(f"OpenWeatherMap: Invalid {label} response: {e}")
+            return None
+        except httpx.HTTPStatusError as e:
+            self._check_rate_limit(e.response)
+            logger.warning(f"OpenWeatherMap: HTTP error fetching {label}: {e.response.status_code} - {e.response.text}")
+            return None
+
+    async def _get(self, url: str, params: Dict[str, Any], headers: Optional[Dict[str, str]] = None,
+                   operation: str = "current") -> httpx.Response:
+        # Raises for error statuses (304 is returned as-is)
+        async def attempt() -> httpx.Response:
+            response = await self.client.get(url, params=params, headers=headers)
+            if response.status_code != 304:
                 response.raise_for_status()
-                return response.json()
-            except httpx.RequestError as e:
-                print(f"OpenWeatherMap: Error fetching current weather: {e}")
-                return None
-            except httpx.HTTPStatusError as e:
-                print(f"OpenWeatherMap: HTTP error fetching current weather: {e.response.status_code} - {e.response.text}")
-                return None
+            return response
+
+        with timer(UPSTREAM_SECONDS, upstream="openweathermap", operation=operation):
+            if time.time() < self.rate_limited_until:
+                raise CircuitOpenError("OpenWeatherMap rate limit in effect")
+            return await self.policy.call(attempt)
+
+    def _check_rate_limit(self, response: httpx.Response):
+        # 429: remember how long to back off (Retry-After seconds, or the configured default)
+        if response.status_code != 429:
+            return
+        retry_after = response.headers.get("retry-after", "")
+        delay = int(retry_after) if retry_after.isdigit() else settings.SCHEDULER_RATE_LIMIT_BACKOFF_SECONDS
+        self.rate_limited_until = max(self.rate_limited_until, time.time() + delay)
+
+    async def aclose(self):
+        if self._owns_client:
+            await self.client.aclose()
 
 
 
 # --- Settings Service ---
+# Every farm is one document in the settings collection, keyed by its farm ID.
+# The farm whose ID is APPWRITE_SETTINGS_DOCUMENT_ID is the default farm served by the
+# legacy, un-scoped endpoints; it is created with default values on first use.
 class FarmSettingsService:
-    def __init__(self, appwrite_service: AppwriteService):
+    appwrite_meta_keys = ['$id', '$collectionId', '$databaseId', '$createdAt', '$updatedAt', '$permissions']
+
+    def __init__(self, appwrite_service: AsyncAppwriteService):
         self.appwrite = appwrite_service
         self.collection_id = settings.APPWRITE_COLLECTION_SETTINGS_ID
         self.document_id = settings.APPWRITE_SETTINGS_DOCUMENT_ID
+        self.default_farm_id = self.document_id
         self.default_settings = FarmSettingsData(
             farm_latitude=settings.DEFAULT_FARM_LATITUDE,
             farm_longitude=settings.DEFAULT_FARM_LONGITUDE,
@@ -87,209 +426,708 @@ class FarmSettingsService:
             extreme_weather_alerts=settings.DEFAULT_EXTREME_WEATHER_ALERTS,
             daily_report=settings.DEFAULT_DAILY_REPORT
         )
+        self.cache = AsyncTTLCache(self._load_settings, ttl_seconds=settings.SETTINGS_CACHE_TTL_SECONDS, name="settings",
+                                   negative_ttl_seconds=settings.SETTINGS_CACHE_NEGATIVE_TTL_SECONDS)
+        self.listeners: List[Callable[[str, FarmSettingsData], None]] = []  # Notified after a farm's settings are saved
+
+    def _to_settings(self, doc: Dict[str, Any]) -> FarmSettingsData:
+        filtered_doc_data = {k: v for k, v in doc.items() if k not in self.appwrite_meta_keys}
+        return FarmSettingsData(**filtered_doc_data)
+
+    @timed(STAGE_SECONDS, stage="settings_lookup")
+    async def get_settings(self, farm_id: Optional[str] = None) -> Optional[FarmSettingsData]:
+        # Served from the in-process cache; only a cold miss waits on Appwrite.
+        # The default farm always resolves (falling back to in-memory defaults); any other
+        # farm returns None when it does not exist.
+        farm_id = farm_id or self.default_farm_id
+        cached = await self.cache.get(farm_id)
+        if cached is None and farm_id == self.default_farm_id:
+            return self.default_settings
+        return cached
 
-    async def get_settings(self) -> FarmSettingsData:
-        doc = await run_in_threadpool(self.appwrite.get_document, self.collection_id, self.document_id)
+    async def _load_settings(self, document_id: str) -> Optional[FarmSettingsData]:
+        # Cache loader. Returns MISSING for a farm Appwrite answered it does not have, and None
+        # when the value should not be cached (Appwrite unavailable).
+        doc = await self.appwrite.get_document(self.collection_id, document_id)
         if doc:
-            appwrite_meta_keys = ['$id', '$collectionId', '$databaseId', '$createdAt', '$updatedAt', '$permissions']
-            filtered_doc_data = {k: v for k, v in doc.items() if k not in appwrite_meta_keys}
-            return FarmSettingsData(**filtered_doc_data)
+            return self._to_settings(doc)
+        if document_id != self.default_farm_id:
+            # get_document swallows errors; a healthy client means the answer was "not found"
+            return MISSING if self.appwrite.healthy else None
 
-        print(f"Settings document {self.document_id} not found, attempting to create with defaults.")
+        logger.info(f"Settings document {document_id} not found, attempting to create with defaults.")
         try:
-            created_doc = await run_in_threadpool(
-                self.appwrite.create_document,
+            created_doc = await self.appwrite.create_document(
                 self.collection_id,
-                self.document_id,
+                document_id,
                 self.default_settings.model_dump()
             )
             if created_doc:
-                print("Created default settings document.")
+                logger.info("Created default settings document.")
                 return self.default_settings
             else:
-                print("Failed to create default settings document. Returning in-memory defaults.")
-                return self.default_settings
+                logger.warning("Failed to create default settings document. Returning in-memory defaults.")
+                return None
         except Exception as e:
-            print(f"Error creating default settings: {e}. Returning in-memory defaults.")
-            return self.default_settings
+            logger.warning(f"Error creating default settings: {e}. Returning in-memory defaults.")
+            return None
 
 
-    async def update_settings(self, settings_data: FarmSettingsData) -> Optional[FarmSettingsData]:
-        updated_doc = await run_in_threadpool(
-            self.appwrite.update_document,
+    async def update_settings(self, settings_data: FarmSettingsData, farm_id: Optional[str] = None, create: bool = False) -> Optional[FarmSettingsData]:
+        # Updates a farm's settings document; with `create=True` a missing farm is created instead.
+        farm_id = farm_id or self.default_farm_id
+        updated_doc = await self.appwrite.update_document(
             self.collection_id,
-            self.document_id,
+            farm_id,
             settings_data.model_dump()
         )
+        if not updated_doc and create:
+            updated_doc = await self.appwrite.create_document(
+                self.collection_id,
+                farm_id,
+                settings_data.model_dump()
+            )
         if updated_doc:
-            appwrite_meta_keys = ['$id', '$collectionId', '$databaseId', '$createdAt', '$updatedAt', '$permissions']
-            filtered_doc_data = {k: v for k, v in updated_doc.items() if k not in appwrite_meta_keys}
-            return FarmSettingsData(**filtered_doc_data)
+            updated_settings = self._to_settings(updated_doc)
+            # Write-through so the next read sees the new settings without another round trip
+            self.cache.set(farm_id, updated_settings)
+            for listener in self.listeners:
+                listener(farm_id, updated_settings)
+            return updated_settings
         return None
 
+    async def list_farms(self, page_size: int = 100) -> List[Tuple[str, FarmSettingsData]]:
+        # Returns (farm_id, settings) for every farm, paging with cursorAfter so large
+        # collections stay cheap. Each page also primes the settings cache.
+        farms: List[Tuple[str, FarmSettingsData]] = []
+        cursor: Optional[str] = None
+        while True:
+            queries = [AppwriteQuery.limit(page_size)]
+            if cursor:
+                queries.append(AppwriteQuery.cursor_after(cursor))
+            page = await self.appwrite.list_documents(self.collection_id, queries)
+            documents = page.get('documents', []) if page else []
+            for doc in documents:
+                try:
+                    farm_settings = self._to_settings(doc)
+                except ValueError as e:
+                    logger.warning(f"Skipping farm {doc.get('$id')} with invalid settings: {e}")
+                    continue
+                self.cache.set(doc['$id'], farm_settings)
+                farms.append((doc['$id'], farm_settings))
+            if len(documents) < page_size:
+                break
+            cursor = documents[-1]['$id']
+
+        if not farms:
+            # Empty collection or Appwrite unavailable: keep serving the default farm
+            farms.append((self.default_farm_id, await self.get_settings()))
+        return farms
+
 # --- Weather Service ---
+def grid_cell(lat: float, lon: float, units: str) -> Tuple[float, float, str]:
+    # Snaps a coordinate to the OWM sharing grid (FARM_GRID_PRECISION decimal places).
+    # Farms in the same cell are served by a single upstream call.
+    precision = settings.FARM_GRID_PRECISION
+    return (round(lat, precision), round(lon, precision), units)
+
+async def run_until(deadline: Optional[float], work: Awaitable[Any]) -> Any:
+    # Awaits `work` until `deadline` (event loop time; None for no limit) and returns None
+    # past it. Single-flight work is shielded from its callers' cancellation, so a batch
+    # deadline has to be applied inside the flight to actually stop the OWM/Appwrite calls;
+    # such flights are keyed with flight_key() so that only callers sharing the deadline join them.
+    if deadline is None:
+        return await work
+    try:
+        return await asyncio.wait_for(work, deadline - asyncio.get_running_loop().time())
+    except asyncio.TimeoutError:
+        return None
+
+def flight_key(key: Tuple, deadline: Optional[float]) -> Tuple:
+    # Single-flight key of work bounded by `deadline`. A flight cut off by a batch deadline
+    # returns None to everyone awaiting it, so requests (no deadline) never join one.
+    return key if deadline is None else ("until", deadline) + key
+
 class WeatherService:
-    def __init__(self, appwrite_service: AppwriteService, owm_service: OpenWeatherMapService, settings_service: FarmSettingsService):
+    def __init__(self, appwrite_service: AsyncAppwriteService, owm_service: OpenWeatherMapService, settings_service: FarmSettingsService,
+                 writer: Optional[ObservationWriter] = None, broadcaster: Optional[SnapshotBroadcaster] = None):
         self.appwrite = appwrite_service
         self.owm = owm_service
         self.settings_service = settings_service
         self.weather_collection_id = settings.APPWRITE_COLLECTION_ID
+        # Hourly/daily rollups of compacted history (see retention.py); None reads raw readings only
+        self.rollup_collection_id = settings.APPWRITE_ROLLUP_COLLECTION_ID if settings.RETENTION_ENABLED else None
+        self.writer = writer or ObservationWriter(appwrite_service, self.weather_collection_id)
         self.reco_collection_id = settings.APPWRITE_RECOMMENDATIONS_COLLECTION_ID
+        self.rule_table: RuleTable = DEFAULT_TABLE  # Recommendation rules, reloaded by load_recommendations()
+        self.agronomy = AgronomyCache(  # Daily agronomic series, updated incrementally by _refresh_farm
+            settings.AGRONOMY_ROLLING_DAYS, settings.AGRONOMY_GDD_BASE_C, settings.AGRONOMY_GDD_CAP_C
+        )
+        self.latest_snapshots: Dict[str, WeatherSnapshot] = {}  # farm_id -> latest reading, published by update_weather_data
+        self.broadcaster = broadcaster or SnapshotBroadcaster(settings.STREAM_MAX_SUBSCRIBERS)  # Pushes new snapshots to open streams
+        self.refresh_flight = SingleFlight()  # Coalesces concurrent refreshes keyed by (farm_id, lat, lon, units)
+        self.fetch_flight = SingleFlight()  # Coalesces concurrent OWM fetches keyed by grid cell
+        self.forecasts: Dict[Tuple[float, float, str], ForecastSeries] = {}  # grid cell -> forecast, overwritten in place by refresh_forecast
+        self.snapshot_listeners: List[Callable[[str, WeatherSnapshot], None]] = []  # Notified of every snapshot published here
+
+    @property
+    def default_farm_id(self) -> str:
+        return self.settings_service.default_farm_id
 
-    def _transform_weather_data(self, raw_data: Dict[str, Any], lat: float, lon: float) -> Optional[WeatherData]:
+    @property
+    def latest_snapshot(self) -> Optional[WeatherSnapshot]:
+        # Snapshot of the default farm (legacy single-farm accessor)
+        return self.latest_snapshots.get(self.default_farm_id)
+
+    def _farm_filter(self, farm_id: str) -> List[str]:
+        # Weather documents of the default farm predate multi-farm support and carry no
+        # farm_id, so the default farm is selected by the attribute being null.
+        if farm_id == self.default_farm_id:
+            return [AppwriteQuery.is_null("farm_id")]
+        return [AppwriteQuery.equal("farm_id", farm_id)]
+
+    def _build_observation(self, raw_data: Dict[str, Any], lat: float, lon: float, farm_id: Optional[str] = None) -> Optional[Observation]:
+        # Parses the OWM payload once into the typed internal record
         if not raw_data: return None
         try:
-            main = raw_data.get('main', {})
-            wind = raw_data.get('wind', {})
-            weather_info = raw_data.get('weather', [{}])[0]
-            sys_info = raw_data.get('sys', {})
-
-            location = WeatherLocation(lat=str(lat), lon=str(lon), name=raw_data.get('name', 'Unknown'))
-            sun_data = SunData(sunrise=str(sys_info.get('sunrise', '')), sunset=str(sys_info.get('sunset', '')))
-
-            return WeatherData(
-                temperature=str(main.get('temp', '0')),
-                humidity=str(main.get('humidity', '0')),
-                wind_speed=str(wind.get('speed', '0')),
-                description=weather_info.get('description', ''),
-                icon=weather_info.get('icon', ''),
-                feels_like=str(main.get('feels_like', '0')),
-                wind_gust=str(wind.get('gust', '0')) if 'gust' in wind else None,
-                wind_direction=str(wind.get('deg', '0')) if 'deg' in wind else None,
-                pressure=str(main.get('pressure', '0')),
-                visibility=str(raw_data.get('visibility', '0')),
-                location=location.model_dump_json(),
-                sun=sun_data.model_dump_json(),
-                timestamp=datetime.utcnow()
-            )
+            with timer(STAGE_SECONDS, stage="observation_parse"):
+                return Observation.from_owm(raw_data, lat, lon, farm_id=farm_id if farm_id != self.default_farm_id else None)
         except Exception as e:
-            print(f"Error transforming weather data: {e}")
+            logger.warning(f"Error transforming weather data: {e}")
             return None
 
-    def _get_condition_value(self, temp: float, humidity: float, wind_speed: float) -> str:
-        if temp < 10: return "cold"
-        if temp > 30: return "hot"
-        if humidity < 30: return "dry"
-        if humidity > 80: return "humid"
-        if wind_speed > 10: return "windy"
-        return "normal"
-
-    async def _get_recommendations(self, weather_for_reco: Dict[str, Any]) -> List[str]:
-        temp = float(weather_for_reco.get('main', {}).get('temp', 0))
-        humidity = float(weather_for_reco.get('main', {}).get('humidity', 0))
-        wind_speed = float(weather_for_reco.get('wind', {}).get('speed', 0))
-        
-        condition = self._get_condition_value(temp, humidity, wind_speed)
-        
-        if settings.APPWRITE_RECOMMENDATIONS_COLLECTION_ID:
-            try:
-                queries = [AppwriteQuery.equal("condition_value", condition), AppwriteQuery.limit(5)]
-                reco_docs_result = await run_in_threadpool(
-                    self.appwrite.list_documents,
-                    self.reco_collection_id,
-                    queries
-                )
-                if reco_docs_result and reco_docs_result['total'] > 0:
-                    return [doc['recommendation_text'] for doc in reco_docs_result['documents'] if 'recommendation_text' in doc]
-            except Exception as e:
-                print(f"Could not fetch recommendations from Appwrite for condition '{condition}': {e}")
-
-        hardcoded_recommendations = {
-            "cold": ["Cold weather: Consider protecting sensitive plants."],
-            "hot": ["Hot weather: Increase watering frequency."],
-            "dry": ["Low humidity: Monitor soil moisture."],
-            "humid": ["High humidity: Watch for fungal diseases."],
-            "windy": ["Strong winds: Check plant support systems."],
-            "normal": ["Weather conditions are optimal."]
-        }
-        return hardcoded_recommendations.get(condition, [])
+    def _transform_weather_data(self, raw_data: Dict[str, Any], lat: float, lon: float, farm_id: Optional[str] = None) -> Optional[WeatherData]:
+        # Legacy string-typed model for an OWM payload (API boundary)
+        observation = self._build_observation(raw_data, lat, lon, farm_id)
+        return observation.to_weather_data() if observation else None
 
-    async def update_weather_data(self) -> Optional[Dict[str, Any]]:
-        current_settings = await self.settings_service.get_settings()
-        lat = current_settings.farm_latitude
-        lon = current_settings.farm_longitude
-        
-        raw_weather = await self.owm.get_current_weather(lat, lon, current_settings.units)
+    async def load_recommendations(self) -> bool:
+        # Loads the recommendations collection into the in-memory rule table. On failure the
+        # previous table (initially the built-in defaults) stays in use.
+        if not self.reco_collection_id:
+            return False
+        queries = [AppwriteQuery.limit(settings.RECOMMENDATIONS_MAX_DOCUMENTS)]
+        result = await self.appwrite.list_documents(self.reco_collection_id, queries)
+        if not self.appwrite.healthy:
+            logger.warning(f"Could not load recommendations from Appwrite, keeping {len(self.rule_table.rules)} rules in use.")
+            return False
+        self.rule_table = RuleTable.from_documents(result.get('documents', []))
+        return True
+
+    @timed(STAGE_SECONDS, stage="recommendations")
+    def _recommend(self, temp: float, humidity: float, wind_speed: float, units: str) -> List[str]:
+        # In-memory rule evaluation; no Appwrite query per reading
+        return self.rule_table.evaluate(temp, humidity, wind_speed, units)
+
+    async def recommend_for_documents(self, documents: List[Dict[str, Any]], farm_id: Optional[str] = None) -> List[List[str]]:
+        # Recommendations for a page of stored readings, evaluated column-wise in one pass
+        farm_settings = await self.settings_service.get_settings(farm_id or self.default_farm_id)
+        units = farm_settings.units if farm_settings else settings.DEFAULT_UNITS
+        with timer(STAGE_SECONDS, stage="recommendations"):
+            columns = [document_column(documents, metric) for metric in RULE_METRICS]
+            return self.rule_table.evaluate_batch(*columns, units=units)
+
+    async def update_weather_data(self, farm_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        farm_id = farm_id or self.default_farm_id
+        current_settings = await self.settings_service.get_settings(farm_id)
+        if not current_settings:
+            logger.info(f"Farm {farm_id} not found, skipping weather update.")
+            return None
+
+        # Concurrent refreshes for the same farm (requests racing each other or the
+        # scheduler) share one OWM fetch and one Appwrite write.
+        snapshot = await self.refresh_flight.do(
+            (farm_id, current_settings.farm_latitude, current_settings.farm_longitude, current_settings.units),
+            lambda: self._refresh_farm(farm_id, current_settings)
+        )
+        return snapshot.as_dict() if snapshot else None
+
+    async def _refresh_farm(self, farm_id: str, farm_settings: FarmSettingsData, raw_weather: Optional[Dict[str, Any]] = None) -> Optional[WeatherSnapshot]:
+        lat = farm_settings.farm_latitude
+        lon = farm_settings.farm_longitude
+        units = farm_settings.units
+
+        if raw_weather is None:
+            raw_weather = await self._fetch_cell(grid_cell(lat, lon, units))
         if not raw_weather:
-            print("Failed to fetch raw weather from OWM.")
+            logger.warning("Failed to fetch raw weather from OWM.")
             return None
 
-        transformed_weather = self._transform_weather_data(raw_weather, lat, lon)
-        if not transformed_weather:
-            print("Failed to transform weather data.")
+        observation = self._build_observation(raw_weather, lat, lon, farm_id)
+        if not observation:
+            logger.warning("Failed to transform weather data.")
             return None
 
-        data_for_appwrite = transformed_weather.model_dump(mode='json', exclude_none=True)
+        # Hand the reading to the buffered writer; the response does not wait on Appwrite.
+        # The document ID is assigned up front so the response can still carry it.
+        observation = observation._replace(id=new_document_id())
+        document = observation.to_document()
+        await self.writer.enqueue(observation.id, document)
+        self.agronomy.add_observation(farm_id, observation, units)
+        
+        recommendations = self._recommend(observation.temperature, observation.humidity, observation.wind_speed, units)
+
+        # Publish the new reading so /current can serve it without querying Appwrite
+        weather = observation.to_weather_data({**document, **self._document_metadata(observation)})
+        return self._publish_snapshot(farm_id, weather, recommendations, lat, lon, units, observation)
 
-        saved_doc = await run_in_threadpool(
-            self.appwrite.create_document,
-            self.weather_collection_id,
-            AppwriteID.unique(),
-            data_for_appwrite
+    def _document_metadata(self, observation: Observation) -> Dict[str, Any]:
+        # Appwrite metadata of a reading the writer has not stored yet. Its times are the
+        # observation time; Appwrite stamps the stored copy when the batch is written.
+        observed_at = to_appwrite_datetime(observation.timestamp)
+        return {
+            '$collectionId': self.weather_collection_id, '$databaseId': self.appwrite.db_id,
+            '$createdAt': observed_at, '$updatedAt': observed_at, '$permissions': [],
+        }
+
+    async def _fetch_cell(self, cell: Tuple[float, float, str], deadline: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        # One OWM call per grid cell; farms that round to the same cell share the payload
+        lat, lon, units = cell
+        return await self.fetch_flight.do(
+            flight_key(cell, deadline), lambda: run_until(deadline, self.owm.get_current_weather(lat, lon, units))
         )
 
-        if not saved_doc:
-            print("Failed to save weather data to Appwrite.")
+    async def update_all_farms(self, max_concurrency: Optional[int] = None, deadline_seconds: Optional[float] = None) -> Dict[str, int]:
+        # Refreshes every farm in one batch. Farms are grouped by grid cell so nearby farms
+        # share one OWM call, cells are processed with bounded concurrency, and a failing
+        # farm or cell never aborts the rest of the batch. Work still running when the
+        # deadline passes is abandoned so a tick never overruns the next one.
+        farms = await self.settings_service.list_farms()
+
+        cells: Dict[Tuple[float, float, str], List[Tuple[str, FarmSettingsData]]] = {}
+        for farm_id, farm_settings in farms:
+            cell = grid_cell(farm_settings.farm_latitude, farm_settings.farm_longitude, farm_settings.units)
+            cells.setdefault(cell, []).append((farm_id, farm_settings))
+        return await self.update_cells(cells, max_concurrency, deadline_seconds)
+
+    async def update_cells(self, cells: Dict[Tuple[float, float, str], List[Tuple[str, FarmSettingsData]]],
+                           max_concurrency: Optional[int] = None, deadline_seconds: Optional[float] = None,
+                           on_cell_fetched: Optional[Callable[[Tuple[float, float, str], Optional[Dict[str, Any]]], None]] = None
+                           ) -> Dict[str, int]:
+        # Refreshes the given cells and their farms; `on_cell_fetched` receives each cell's
+        # OWM payload (None when the fetch failed), e.g. for the refresh planner. The
+        # deadline bounds the fetches and refreshes themselves, so a cell holds its
+        # concurrency slot until its work has really stopped; farms cut off by it are
+        # counted as timed out. Requests never share these deadline-bound flights.
+        max_concurrency = max_concurrency or settings.SCHEDULER_MAX_CONCURRENCY
+        stats = {"farms": sum(len(members) for members in cells.values()), "cells": len(cells), "updated": 0, "failed": 0,
+                 "timed_out": 0, "forecasts_updated": 0, "forecasts_unchanged": 0}
+        semaphore = asyncio.Semaphore(max_concurrency)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + deadline_seconds if deadline_seconds is not None else None
+
+        def unfinished() -> str:
+            # Outcome of a farm that produced no reading
+            return "timed_out" if deadline is not None and loop.time() >= deadline else "failed"
+
+        async def run_cell(cell, members):
+            async with semaphore:
+                if unfinished() == "timed_out":
+                    stats["timed_out"] += len(members)
+                    return
+                # The forecast of the cell is refreshed alongside its current reading; an error
+                # in either one leaves the other's result intact
+                raw_weather, forecast_status = await asyncio.gather(
+                    self._fetch_cell(cell, deadline), self._scheduled_forecast(cell, deadline), return_exceptions=True
+                )
+                if isinstance(forecast_status, BaseException):
+                    logger.warning(f"Batch update: forecast for cell {cell} failed: {forecast_status!r}")
+                    forecast_status = "failed"
+                fetch_failed = isinstance(raw_weather, BaseException)
+                if fetch_failed:
+                    logger.warning(f"Batch update: cell {cell} failed: {raw_weather!r}")
+                    raw_weather = None
+                if on_cell_fetched is not None:
+                    on_cell_fetched(cell, raw_weather)
+                if forecast_status == "updated":
+                    stats["forecasts_updated"] += 1
+                elif forecast_status in ("fresh", "not_modified"):
+                    stats["forecasts_unchanged"] += 1
+                if not raw_weather:
+                    stats["failed" if fetch_failed else unfinished()] += len(members)
+                    return
+                results = await asyncio.gather(
+                    *(
+                        self.refresh_flight.do(
+                            flight_key((farm_id, farm_settings.farm_latitude, farm_settings.farm_longitude, farm_settings.units), deadline),
+                            lambda farm_id=farm_id, farm_settings=farm_settings: run_until(
+                                deadline, self._refresh_farm(farm_id, farm_settings, raw_weather)
+                            )
+                        )
+                        for farm_id, farm_settings in members
+                    ),
+                    return_exceptions=True
+                )
+            for (farm_id, _), result in zip(members, results):
+                if isinstance(result, BaseException):
+                    logger.warning(f"Batch update: farm {farm_id} failed: {result}")
+                    stats["failed"] += 1
+                elif result is None:
+                    stats[unfinished()] += 1
+                else:
+                    stats["updated"] += 1
+
+        results = await asyncio.gather(*(run_cell(cell, members) for cell, members in cells.items()), return_exceptions=True)
+        for (cell, members), result in zip(cells.items(), results):
+            if isinstance(result, BaseException):
+                # Raised before any of the cell's farms were counted
+                logger.warning(f"Batch update: cell {cell} failed: {result!r}")
+                stats["failed"] += len(members)
+        return stats
+
+    async def _scheduled_forecast(self, cell: Tuple[float, float, str], deadline: Optional[float] = None) -> Optional[str]:
+        if not settings.FORECAST_ENABLED:
             return None
-        
-        recommendations = await self._get_recommendations(raw_weather)
-        weather_data_for_response = WeatherData.model_validate(saved_doc)
+        return await self.refresh_forecast(cell, deadline)
+
+    async def refresh_forecast(self, cell: Tuple[float, float, str], deadline: Optional[float] = None) -> Optional[str]:
+        # Returns "fresh" (no request made), "not_modified" (304), "updated" or "failed";
+        # None when `deadline` cut it off. A failed refresh keeps serving the previous forecast.
+        return await self.fetch_flight.do(
+            flight_key(("forecast",) + cell, deadline), lambda: run_until(deadline, self._refresh_forecast(cell))
+        )
+
+    async def _refresh_forecast(self, cell: Tuple[float, float, str]) -> str:
+        series = self.forecasts.get(cell)
+        if series is not None and series.is_fresh():
+            return "fresh"
+        lat, lon, units = cell
+        use_one_call = bool(settings.OPENWEATHERMAP_ONECALL_URL)
+        source = "onecall" if use_one_call else "forecast"
+        # The stored ETag is only valid for the endpoint that issued it
+        etag = series.upstream_etag if series is not None and series.source == source else None
+        fetch = self.owm.get_one_call if use_one_call else self.owm.get_forecast
+        result = await fetch(lat, lon, units, etag=etag)
+        if result is None:
+            return "failed"
+        max_age = result.max_age if result.max_age is not None else settings.FORECAST_DEFAULT_MAX_AGE_SECONDS
+        if result.not_modified:
+            if series is None:
+                return "failed"
+            series.revalidated(max_age)
+            return "not_modified"
+        try:
+            if use_one_call:
+                points, alerts = points_from_onecall(result.payload), alerts_from_onecall(result.payload)
+            else:
+                points, alerts = points_from_forecast(result.payload), []
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Forecast: invalid {source} payload for cell {cell}: {e}")
+            return "failed"
+        if series is None:
+            series = ForecastSeries(lat, lon, units)
+        series.overwrite(source, points, alerts, result.etag, max_age)
+        self.forecasts[cell] = series
+        return "updated"
+
+    async def get_forecast(self, farm_id: Optional[str] = None) -> Optional[ForecastSeries]:
+        # Served from memory; fetched on demand only when the farm's cell has no fresh forecast.
+        # A stale forecast is still returned when the upstream is unavailable; returns None for
+        # an unknown farm and raises RuntimeError when no forecast could be fetched at all.
+        farm_id = farm_id or self.default_farm_id
+        current_settings = await self.settings_service.get_settings(farm_id)
+        if not current_settings:
+            return None
+        cell = grid_cell(current_settings.farm_latitude, current_settings.farm_longitude, current_settings.units)
+        series = self.forecasts.get(cell)
+        if series is None or not series.is_fresh():
+            record_cache("forecast", "miss" if series is None else "stale")
+            await self.refresh_forecast(cell)
+            series = self.forecasts.get(cell)
+        else:
+            record_cache("forecast", "hit")
+        if series is None or not series.ready:
+            raise RuntimeError("Forecast unavailable")
+        return series
+
+    def _publish_snapshot(self, farm_id: str, weather: WeatherData, recommendations: List[str], lat: float, lon: float, units: str,
+                          observation: Optional[Observation] = None) -> WeatherSnapshot:
+        response = WeatherResponse.model_construct(weather=weather, recommendations=recommendations)
+        with timer(STAGE_SECONDS, stage="serialization"):
+            snapshot = WeatherSnapshot.build(response, lat, lon, units, observation)
+        self.latest_snapshots[farm_id] = snapshot
+        self.broadcaster.publish(farm_id, snapshot)
+        for listener in self.snapshot_listeners:
+            listener(farm_id, snapshot)
+        return snapshot
+
+    def install_snapshot(self, farm_id: str, snapshot: WeatherSnapshot):
+        # A snapshot published by another worker (see coordination.py): served and streamed
+        # like a local one, and its reading is folded into the agronomy series
+        self.latest_snapshots[farm_id] = snapshot
+        self.broadcaster.publish(farm_id, snapshot)
+        if snapshot.observation is not None:
+            self.agronomy.add_observation(farm_id, snapshot.observation, snapshot.units)
 
-        return {"weather": weather_data_for_response, "recommendations": recommendations}
+    async def get_latest_snapshot(self, farm_id: Optional[str] = None) -> Optional[WeatherSnapshot]:
+        # Hot path for /current: the in-memory snapshot, if it is for the farm's configured location.
+        # Appwrite is only queried on a cold start (or right after a location change).
+        farm_id = farm_id or self.default_farm_id
+        current_settings = await self.settings_service.get_settings(farm_id)
+        if not current_settings:
+            return None
+        snapshot = self.latest_snapshots.get(farm_id)
+        if snapshot and snapshot.matches(current_settings.farm_latitude, current_settings.farm_longitude, current_settings.units):
+            record_cache("snapshot", "hit")
+            return snapshot
+        record_cache("snapshot", "miss")
+
+        return await self.refresh_flight.do(
+            ("latest", farm_id, current_settings.farm_latitude, current_settings.farm_longitude, current_settings.units),
+            lambda: self._load_snapshot_from_db(farm_id, current_settings)
+        )
+
+    async def _load_snapshot_from_db(self, farm_id: str, current_settings: FarmSettingsData) -> Optional[WeatherSnapshot]:
+        data = await self._get_latest_weather_from_db(farm_id, current_settings)
+        if not data:
+            return None
+        return self._publish_snapshot(
+            farm_id, data["weather"], data["recommendations"],
+            current_settings.farm_latitude, current_settings.farm_longitude, current_settings.units,
+            data.get("observation")
+        )
 
+    async def get_latest_weather(self, farm_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        snapshot = await self.get_latest_snapshot(farm_id)
+        return snapshot.as_dict() if snapshot else None
 
-    async def get_latest_weather(self) -> Optional[Dict[str, Any]]:
-        current_settings = await self.settings_service.get_settings()
-        queries = [AppwriteQuery.order_desc("$createdAt"), AppwriteQuery.limit(1)]
-        latest_docs_result = await run_in_threadpool(self.appwrite.list_documents, self.weather_collection_id, queries)
+    async def _get_latest_weather_from_db(self, farm_id: str, current_settings: FarmSettingsData) -> Optional[Dict[str, Any]]:
+        queries = self._farm_filter(farm_id) + [AppwriteQuery.order_desc(TIME_ATTRIBUTE), AppwriteQuery.limit(1)]
+        latest_docs_result = await self._list_weather(farm_id, queries, limit=1)
         
         if latest_docs_result and latest_docs_result['total'] > 0:
             latest_weather_doc = latest_docs_result['documents'][0]
 
-            # Verifica se a localização no registro mais recente corresponde às configurações atuais.
+            # Parse the stored document once; location and metrics come back as numbers
             try:
-                location_from_db_str = latest_weather_doc.get('location', '{}')
-                location_from_db = json.loads(location_from_db_str)
-                db_lat = float(location_from_db.get('lat', 0.0))
-                db_lon = float(location_from_db.get('lon', 0.0))
-
-                # Se a localização não corresponder, retorna None para forçar o roteador a buscar dados novos.
-                if not math.isclose(db_lat, current_settings.farm_latitude) or \
-                   not math.isclose(db_lon, current_settings.farm_longitude):
-                    print("Location in DB is stale. Settings have been updated. Forcing refresh.")
-                    return None
+                observation = Observation.from_document(latest_weather_doc)
             except (json.JSONDecodeError, AttributeError, TypeError, ValueError) as e:
                 # Se não for possível analisar ou comparar, é mais seguro forçar a atualização.
-                print(f"Error comparing locations ({e}), forcing refresh.")
+                logger.warning(f"Error comparing locations ({e}), forcing refresh.")
+                return None
+
+            # Se a localização não corresponder, retorna None para forçar o roteador a buscar dados novos.
+            if not math.isclose(observation.lat, current_settings.farm_latitude) or \
+               not math.isclose(observation.lon, current_settings.farm_longitude):
+                logger.info("Location in DB is stale. Settings have been updated. Forcing refresh.")
                 return None
             
             # Se as localizações corresponderem, prossiga para construir a resposta com os dados em cache.
-            raw_data_for_reco = {
-                'main': {
-                    'temp': float(latest_weather_doc.get('temperature', '0')),
-                    'humidity': float(latest_weather_doc.get('humidity', '0'))
-                },
-                'wind': {
-                    'speed': float(latest_weather_doc.get('wind_speed', '0'))
-                }
-            }
-            recommendations = await self._get_recommendations(raw_data_for_reco)
+            recommendations = self._recommend(observation.temperature, observation.humidity, observation.wind_speed, current_settings.units)
             
-            weather_data_model = WeatherData.model_validate(latest_weather_doc)
-            return {"weather": weather_data_model, "recommendations": recommendations}
+            with timer(STAGE_SECONDS, stage="validation"):
+                weather_data_model = WeatherData.model_validate(latest_weather_doc)
+            return {"weather": weather_data_model, "recommendations": recommendations, "observation": observation}
 
-        print("No latest weather found in Appwrite.")
+        logger.info("No latest weather found in Appwrite.")
         return None
 
-    async def get_weather_history(self, limit: int = 10, offset: int = 0) -> Dict[str, Any]:
-        queries = [
-            AppwriteQuery.order_desc("$createdAt"),
-            AppwriteQuery.limit(limit),
-            AppwriteQuery.offset(offset)
+    def _range_filter(self, start: Optional[datetime], end: Optional[datetime]) -> List[str]:
+        # Readings observed in [start, end)
+        queries = []
+        if start is not None:
+            queries.append(AppwriteQuery.greater_than_equal(TIME_ATTRIBUTE, to_appwrite_datetime(start)))
+        if end is not None:
+            queries.append(AppwriteQuery.less_than(TIME_ATTRIBUTE, to_appwrite_datetime(end)))
+        return queries
+
+    async def get_weather_history(self, limit: int = 10, offset: int = 0, farm_id: Optional[str] = None,
+                                  start: Optional[datetime] = None, end: Optional[datetime] = None,
+                                  cursor: Optional[str] = None) -> Dict[str, Any]:
+        # Newest-first page of readings in [start, end). Deep pages should use `cursor`
+        # (the last $id of the previous page) instead of `offset`, which Appwrite has to skip over.
+        farm_id = farm_id or self.default_farm_id
+        queries = self._farm_filter(farm_id) + self._range_filter(start, end) + [
+            AppwriteQuery.order_desc(TIME_ATTRIBUTE),
+            AppwriteQuery.limit(limit)
         ]
-        history_docs_result = await run_in_threadpool(self.appwrite.list_documents, self.weather_collection_id, queries)
-        
-        return history_docs_result
+        if cursor:
+            queries.append(AppwriteQuery.cursor_after(cursor))
+        elif offset:
+            queries.append(AppwriteQuery.offset(offset))
+        result = await self._list_weather(farm_id, queries, limit=limit, offset=offset, start=start, end=end, cursor=cursor)
+        documents = result.get('documents', [])
+        next_cursor = documents[-1]['$id'] if len(documents) == limit else None
+        return {**result, 'next_cursor': next_cursor}
+
+    async def _list_weather(self, farm_id: str, queries: List[str], limit: int, offset: int = 0,
+                            start: Optional[datetime] = None, end: Optional[datetime] = None,
+                            cursor: Optional[str] = None) -> Dict[str, Any]:
+        # Newest-first weather documents from Appwrite, or from the local store while Appwrite is unavailable
+        result = await self.appwrite.list_documents(self.weather_collection_id, queries)
+        store = self.writer.store
+        if not self.appwrite.healthy and store is not None:
+            logger.warning("Appwrite unavailable, serving weather data from the local store.")
+            local_farm_id = None if farm_id == self.default_farm_id else farm_id
+            return await run_in_threadpool(
+                store.history, self.weather_collection_id, local_farm_id, limit, offset,
+                to_utc(start).timestamp() if start else None, to_utc(end).timestamp() if end else None, cursor
+            )
+        return result
+
+    async def iter_weather_documents(self, farm_id: Optional[str] = None, start: Optional[datetime] = None,
+                                     end: Optional[datetime] = None, page_size: Optional[int] = None,
+                                     select: Optional[List[str]] = None):
+        # Async generator over every reading in [start, end), oldest first, one cursor page at a time.
+        # Only one page is held in memory, so callers can stream arbitrarily long ranges.
+        farm_id = farm_id or self.default_farm_id
+        queries = self._farm_filter(farm_id) + self._range_filter(start, end) + [AppwriteQuery.order_asc(TIME_ATTRIBUTE)]
+        if select:
+            queries.append(AppwriteQuery.select(select))
+        async for documents in self._iter_pages(self.weather_collection_id, queries, page_size):
+            yield documents
+
+    async def iter_rollups(self, farm_id: Optional[str], tier: str, start: Optional[datetime] = None,
+                           end: Optional[datetime] = None, page_size: Optional[int] = None):
+        # Same as iter_weather_documents, over the hourly or daily rollups overlapping [start, end)
+        farm_id = farm_id or self.default_farm_id
+        queries = rollup_queries(self._farm_filter(farm_id), tier, start, end) + [AppwriteQuery.order_asc("bucket_start")]
+        async for documents in self._iter_pages(self.rollup_collection_id, queries, page_size):
+            yield documents
+
+    async def iter_history(self, farm_id: Optional[str] = None, start: Optional[datetime] = None,
+                           end: Optional[datetime] = None, select: Optional[List[str]] = None):
+        # Async generator of (tier, documents) pages covering [start, end) across the retention
+        # tiers: daily rollups, then hourly rollups, then raw readings. Rollup tiers are only
+        # read when the range reaches back past their cutoff, so recent ranges cost what they
+        # did before. Documents of a bucket a coarser rollup already covers are skipped
+        # (compaction writes the rollup before it deletes the sources).
+        if self.rollup_collection_id is None:
+            async for documents in self.iter_weather_documents(farm_id, start, end, select=select):
+                yield "raw", documents
+            return
+        raw_cutoff, hourly_cutoff = retention_cutoffs(settings.RETENTION_RAW_DAYS, settings.RETENTION_HOURLY_DAYS)
+        covered_days, covered_hours = set(), set()
+        # Keys are UTC ISO strings: [:10] is the day, [:13] the hour
+        if start is None or to_utc(start) < hourly_cutoff:
+            async for documents in self.iter_rollups(farm_id, "daily", start, end):
+                covered_days.update(document["bucket_start"][:10] for document in documents)
+                yield "daily", documents
+        if start is None or to_utc(start) < raw_cutoff:
+            async for documents in self.iter_rollups(farm_id, "hourly", start, end):
+                documents = [document for document in documents if document["bucket_start"][:10] not in covered_days]
+                covered_hours.update(document["bucket_start"][:13] for document in documents)
+                if documents:
+                    yield "hourly", documents
+        async for documents in self.iter_weather_documents(farm_id, start, end, select=select):
+            if covered_days or covered_hours:
+                documents = [document for document in documents if not self._covered(document, covered_days, covered_hours)]
+            if documents:
+                yield "raw", documents
+
+    @staticmethod
+    def _covered(document: Dict[str, Any], covered_days: set, covered_hours: set) -> bool:
+        observed_at = document_time(document)
+        if observed_at is None:
+            return False
+        key = to_appwrite_datetime(observed_at)
+        return key[:10] in covered_days or key[:13] in covered_hours
+
+    def history_tier(self, end: Optional[datetime]) -> str:
+        # Finest tier that still holds readings just before `end`
+        if self.rollup_collection_id is None or end is None:
+            return "raw"
+        raw_cutoff, hourly_cutoff = retention_cutoffs(settings.RETENTION_RAW_DAYS, settings.RETENTION_HOURLY_DAYS)
+        end = to_utc(end)
+        if end > raw_cutoff:
+            return "raw"
+        return "hourly" if end > hourly_cutoff else "daily"
+
+    async def _iter_pages(self, collection_id: str, base_queries: List[str], page_size: Optional[int] = None):
+        page_size = page_size or settings.HISTORY_SCAN_PAGE_SIZE
+        base_queries = base_queries + [AppwriteQuery.limit(page_size)]
+        cursor = None
+        while True:
+            queries = base_queries + ([AppwriteQuery.cursor_after(cursor)] if cursor else [])
+            page = await self.appwrite.list_documents(collection_id, queries)
+            documents = page.get('documents', []) if page else []
+            if not documents:
+                return
+            yield documents
+            if len(documents) < page_size:
+                return
+            cursor = documents[-1]['$id']
+
+    async def agronomy_metrics(self, farm_id: Optional[str] = None, start: Optional[datetime] = None,
+                               end: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        # Daily GDD/ET0/dew point/VPD/rolling extremes for [start, end). The first query of a
+        # farm scans its history once; later readings are folded in by _refresh_farm, so
+        # repeated queries only recompute days that changed. Raises RuntimeError if the
+        # history scan could not complete.
+        farm_id = farm_id or self.default_farm_id
+        farm_settings = await self.settings_service.get_settings(farm_id)
+        if not farm_settings:
+            return None
+        end = to_utc(end) if end else datetime.now(timezone.utc)
+        start = to_utc(start) if start else end - timedelta(days=settings.HISTORY_DEFAULT_RANGE_DAYS)
+        first_day = day_number(start)
+        last_day = day_number(end - timedelta(microseconds=1))
+        units = farm_settings.units
+
+        series = self.agronomy.series(farm_id)
+        async with series.lock:
+            # Rolling windows of the first day reach back before `start`
+            needed_from = first_day - settings.AGRONOMY_ROLLING_DAYS + 1
+            if series.loaded_from is None or needed_from < series.loaded_from:
+                record_cache("agronomy", "miss")
+                scan_start = datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(days=needed_from)
+                scan_end = None
+                if series.loaded_from is not None:
+                    scan_end = datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(days=series.loaded_from)
+                await self._load_agronomy(farm_id, series, units, scan_start, scan_end)
+                series.loaded_from = needed_from
+            else:
+                record_cache("agronomy", "hit")
+            rows = series.compute(first_day, last_day, farm_settings.farm_latitude, units,
+                                  settings.AGRONOMY_GDD_BASE_C, settings.AGRONOMY_GDD_CAP_C)
+
+        degree_scale = 1.8 if units == "imperial" else 1.0
+        offset = 32 if units == "imperial" else 0
+        return {
+            "farm_id": farm_id, "units": units, "start": start, "end": end,
+            "gdd_base": settings.AGRONOMY_GDD_BASE_C * degree_scale + offset,
+            "gdd_cap": settings.AGRONOMY_GDD_CAP_C * degree_scale + offset,
+            "rolling_days": settings.AGRONOMY_ROLLING_DAYS,
+            "days": rows,
+        }
+
+    async def _load_agronomy(self, farm_id: str, series, units: str, start: datetime, end: Optional[datetime]):
+        # Folds [start, end) of the stored history into the series, one page of columns at a time
+        select = ["$id", "$createdAt", TIME_ATTRIBUTE, "temperature", "humidity", "wind_speed", "pressure"]
+        latest_day = day_number(datetime.now(timezone.utc))
+        series.loading = True
+        try:
+            async for tier, documents in self.iter_history(farm_id, start, end, select=select):
+                if tier == "raw":
+                    series.add_columns(*self.agronomy.page_columns(documents, units), latest_day=latest_day)
+                else:
+                    series.add_rollups(*self.agronomy.rollup_rows(documents, units))
+            if not self.appwrite.healthy:
+                # A partial scan would be cached as if complete; start over on the next query
+                self.agronomy.farms.pop(farm_id, None)
+                raise RuntimeError(f"History scan failed: {self.appwrite.last_error}")
+        finally:
+            series.finish_loading()
+
+    async def aggregate_weather_history(self, bucket: str, farm_id: Optional[str] = None,
+                                        start: Optional[datetime] = None, end: Optional[datetime] = None) -> Dict[str, Any]:
+        # Downsamples [start, end) into hourly/daily min/mean/max buckets on the server.
+        # Only the aggregated attributes are selected from Appwrite. Compacted periods are
+        # served from rollups, at the rollup's resolution when that is coarser than `bucket`.
+        end = to_utc(end) if end else datetime.now(timezone.utc)
+        start = to_utc(start) if start else end - timedelta(days=settings.HISTORY_DEFAULT_RANGE_DAYS)
+        aggregator = BucketAggregator(bucket)
+        truncated = False
+        select = ["$id", "$createdAt", TIME_ATTRIBUTE, *AGGREGATED_METRICS]
+        async for tier, documents in self.iter_history(farm_id, start, end, select=select):
+            aggregator.extend(documents, tier)
+            if aggregator.scanned >= settings.HISTORY_MAX_SCAN_DOCUMENTS:
+                truncated = True
+                break
+        return {
+            "bucket": bucket, "start": start, "end": end,
+            "total": aggregator.total, "truncated": truncated, "buckets": aggregator.result()
+        }
 
 # Helper to run sync Appwrite calls in a thread pool
 from fastapi.concurrency import run_in_threadpool
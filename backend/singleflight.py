@@ -0,0 +1,34 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+# --- Single-Flight ---
+# Coalesces concurrent calls that share a key: the first caller starts the work, every
+# caller arriving while it is in flight awaits the same task and gets the same result
+# (or exception). Once the task finishes the key is released, so the next call runs again.
+# The shared task is shielded: a cancelled caller does not cancel the work the others wait on.
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.executed = 0  # Calls that actually ran the work
+        self.coalesced = 0  # Calls that joined an in-flight task instead
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.executed += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._release(k, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _release(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Mark as retrieved so an unobserved failure does not warn at GC
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
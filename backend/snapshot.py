@@ -0,0 +1,57 @@
+import hashlib
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .models import WeatherResponse
+from .observation import Observation
+
+# --- Latest Weather Snapshot ---
+# The most recent validated WeatherResponse, published by `update_weather_data` and served
+# by `/api/weather/current` without touching Appwrite. The JSON body and its ETag are
+# computed once at publish time, so each poll is a dictionary lookup plus a bytes write.
+# Snapshots are immutable; publishing replaces the whole object atomically.
+
+@dataclass(frozen=True)
+class WeatherSnapshot:
+    response: WeatherResponse  # Validated response model (do not mutate)
+    body: bytes  # Pre-serialized JSON body of `response`
+    etag: str  # Strong ETag derived from `body`
+    lat: float  # Location the reading was taken for
+    lon: float
+    units: str  # Units the reading was requested in
+    observation: Optional[Observation] = None  # Typed record behind `response`, when available
+    published_at: float = field(default_factory=time.time)  # Unix time of publication
+
+    @classmethod
+    def build(cls, response: WeatherResponse, lat: float, lon: float, units: str,
+              observation: Optional[Observation] = None) -> "WeatherSnapshot":
+        body = response.model_dump_json(by_alias=True).encode("utf-8")
+        etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        return cls(response=response, body=body, etag=etag, lat=lat, lon=lon, units=units, observation=observation)
+
+    def matches(self, lat: float, lon: float, units: Optional[str] = None) -> bool:
+        # True if this snapshot was taken for the given location (and units, when provided)
+        if not math.isclose(self.lat, lat) or not math.isclose(self.lon, lon):
+            return False
+        return units is None or self.units == units
+
+    def as_dict(self):
+        # Legacy dict shape returned by WeatherService methods
+        return {"weather": self.response.weather, "recommendations": self.response.recommendations}
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # Evaluates an If-None-Match header against an ETag (weak comparison, RFC 9110 13.1.2)
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
@@ -0,0 +1,22 @@
+import os
+
+# The settings are read on the first backend import, so the required ones are set first. Unlike
+# the benchmarks, tests override backend/.env: Appwrite and OpenWeatherMap are always the
+# stand-ins of backend.fakes, whatever endpoint the settings name.
+for _name in ("OPENWEATHERMAP_API_KEY", "APPWRITE_PROJECT_ID", "APPWRITE_DATABASE_ID", "APPWRITE_API_KEY",
+              "APPWRITE_COLLECTION_ID", "APPWRITE_COLLECTION_SETTINGS_ID", "APPWRITE_SETTINGS_DOCUMENT_ID"):
+    os.environ[_name] = "test"
+os.environ["APPWRITE_ENDPOINT"] = "http://appwrite.test/v1"
+os.environ["OPENWEATHERMAP_BASE_URL"] = "http://owm.test/owm"
+os.environ["COORDINATION_ENABLED"] = "false"
+
+from backend.resilience import CircuitBreaker, ResiliencePolicy, RetryBudget  # noqa: E402
+from backend.services import appwrite_transient  # noqa: E402
+
+
+def fast_policy(failure_threshold: int = 5, recovery_seconds: float = 30.0, max_attempts: int = 3) -> ResiliencePolicy:
+    # The production Appwrite policy without backoff sleeps
+    return ResiliencePolicy(
+        "appwrite", CircuitBreaker("appwrite", failure_threshold, recovery_seconds), RetryBudget(), deadline_seconds=5.0,
+        max_attempts=max_attempts, base_delay=0.0, max_delay=0.0, is_transient=appwrite_transient
+    )
@@ -0,0 +1,58 @@
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from backend import container, services as services_module
+from backend.config import settings
+from backend.fakes import FakeState, asgi_client
+from backend.routers import admin_router, farms_router, health_router, settings_router, weather_router
+from backend.services import AsyncAppwriteService
+
+from . import fast_policy
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def fake_state() -> FakeState:
+    return FakeState()
+
+
+@pytest.fixture
+async def appwrite(fake_state):
+    # Async client bound in-process to the fake Appwrite
+    service = AsyncAppwriteService(http_client=asgi_client(fake_state), policy=fast_policy())
+    yield service
+    await service.client.aclose()
+
+
+@pytest.fixture
+async def services(fake_state, monkeypatch):
+    # The app's service container with both upstreams served by the fakes and nothing on disk
+    monkeypatch.setattr(settings, "LOCAL_STORE_ENABLED", False)
+    monkeypatch.setattr(settings, "ALERTS_ENABLED", False)
+    monkeypatch.setattr(services_module, "build_http_client", lambda max_connections=None: asgi_client(fake_state))
+    monkeypatch.setattr(container, "build_http_client", lambda max_connections=None: asgi_client(fake_state))
+    built = container.ServiceContainer()
+    built.start()
+    yield built
+    await built.aclose()
+
+
+@pytest.fixture
+def app(services) -> FastAPI:
+    # The API routers without the lifespan: no scheduler or warm-up runs unless a test starts it
+    application = FastAPI()
+    for router in (settings_router, weather_router, farms_router, admin_router, health_router):
+        application.include_router(router)
+    application.state.services = services
+    return application
+
+
+@pytest.fixture
+async def api(app):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api.test") as client:
+        yield client
@@ -0,0 +1,92 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from backend.agronomy import (
+    AgronomyCache, FarmSeries, day_number, dew_point, extraterrestrial_radiation, growing_degree_days, reference_et0,
+    saturation_vapour_pressure
+)
+from backend.observation import Observation
+
+# Worked examples of FAO Irrigation and Drainage Paper 56, chapter 3
+
+
+def test_saturation_vapour_pressure_example_3():
+    assert saturation_vapour_pressure(np.array([24.5, 15.0])) == pytest.approx([3.075, 1.705], abs=0.001)
+
+
+def test_dew_point_inverts_example_6():
+    # Tdew 14.8 °C gives ea = e°(14.8) = 1.68 kPa
+    assert dew_point(np.array([1.68])) == pytest.approx([14.8], abs=0.05)
+
+
+def test_extraterrestrial_radiation_examples_8_and_15():
+    # 3 September at 20°S; mid-July at 45°43'N
+    assert extraterrestrial_radiation(np.radians(-20.0), np.array([246])) == pytest.approx([32.2], abs=0.05)
+    assert extraterrestrial_radiation(np.radians(45 + 43 / 60), np.array([196])) == pytest.approx([40.6], abs=0.1)
+
+
+def test_reference_et0_example_18():
+    # Brussels, 6 July: 3.9 mm/day with Rs from sunshine hours (22.1 MJ m-2). Without a
+    # radiation sensor Rs is estimated from the temperature range (19.9 MJ m-2), which
+    # lowers ET0 to about 3.65 mm/day; wind is measured at 10 m (2.78 m/s, 2.078 m/s at 2 m)
+    et0 = reference_et0(np.array([12.3]), np.array([21.5]), np.array([63.0]), np.array([84.0]), np.array([2.78]),
+                        100.1, np.radians(50.8), np.array([187]))
+    assert et0 == pytest.approx([3.65], abs=0.05)
+
+
+def test_growing_degree_days_clip_to_base_and_cap():
+    t_min, t_max = np.array([10.0, 10.0, 5.0, 2.0]), np.array([30.0, 35.0, 20.0, 8.0])
+    assert growing_degree_days(t_min, t_max, 10.0, 30.0).tolist() == [10.0, 10.0, 5.0, 0.0]
+
+
+def test_daily_vpd_and_dew_point_example_5():
+    # Tmin 18 °C with RHmax 82 %, Tmax 25 °C with RHmin 54 %: ea = 1.70 kPa, es = 2.616 kPa
+    series = FarmSeries(rolling_days=3)
+    day = day_number(datetime(2026, 7, 1, tzinfo=timezone.utc))
+    series.add_columns(["a", "b"], np.array([day, day]), np.array([18.0, 25.0]), np.array([82.0, 54.0]),
+                       np.array([2.0, 2.0]), np.array([1013.0, 1013.0]))
+    [row] = series.compute(day, day, 50.8, "metric", 10.0, 30.0)
+    assert row["vpd"] == pytest.approx(2.616 - 1.70, abs=0.01)
+    assert row["dew_point"] == pytest.approx(dew_point(np.array([1.70]))[0], abs=0.05)
+    assert (row["temperature_min"], row["temperature_max"], row["readings"]) == (18.0, 25.0, 2)
+
+
+def observations(units: str):
+    # Four readings a day over six days, with IDs as the writer assigns them
+    rng = random.Random(units)
+    start = datetime(2026, 7, 1, tzinfo=timezone.utc)
+    scale, offset = (1.8, 32) if units == "imperial" else (1.0, 0)
+    return [
+        Observation(
+            start + timedelta(hours=6 * i), 50.8, 4.35, "Brussels", rng.uniform(8, 28) * scale + offset, 0.0,
+            rng.uniform(40, 95), rng.uniform(1000, 1025), rng.uniform(0.5, 6), 10000, "clear sky", "01d", id=f"reading-{i}"
+        )
+        for i in range(24)
+    ]
+
+
+@pytest.mark.parametrize("units", ["metric", "imperial"])
+def test_incremental_readings_match_a_full_recompute(units):
+    readings = observations(units)
+    documents = [{**observation.to_document(), "$id": observation.id} for observation in readings]
+    first_day, last_day = day_number(readings[0].timestamp), day_number(readings[-1].timestamp)
+
+    full = AgronomyCache(rolling_days=3, gdd_base_c=10.0, gdd_cap_c=30.0)
+    full.series("farm-1").add_columns(*AgronomyCache.page_columns(documents, units))
+    expected = full.series("farm-1").compute(first_day, last_day, 50.8, units, 10.0, 30.0)
+
+    # Part of the history is loaded and queried, then the rest arrives reading by reading
+    incremental = AgronomyCache(rolling_days=3, gdd_base_c=10.0, gdd_cap_c=30.0)
+    series = incremental.series("farm-1")
+    series.add_columns(*AgronomyCache.page_columns(documents[:10], units))
+    series.compute(first_day, last_day, 50.8, units, 10.0, 30.0)
+    for observation in readings[10:]:
+        incremental.add_observation("farm-1", observation, units)
+        incremental.add_observation("farm-1", observation, units)  # Repeats are counted once
+    rows = series.compute(first_day, last_day, 50.8, units, 10.0, 30.0)
+    assert len(rows) == len(expected) == 6
+    for row, expected_row in zip(rows, expected):
+        assert row == pytest.approx(expected_row)
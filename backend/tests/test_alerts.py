@@ -0,0 +1,96 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from backend.alerts import AlertEngine, AlertOutbox, AlertRule, WebhookSink, _RuleState
+from backend.fakes import asgi_client, owm_payload
+from backend.localstore import LocalStore
+from backend.models import WeatherResponse
+from backend.observation import Observation
+from backend.snapshot import WeatherSnapshot
+
+FROST = AlertRule("frost_risk", "Frost risk", "temperature", "threshold", "below", 2.0, 4.0)
+HEAT = AlertRule("heat_stress", "Heat stress", "temperature", "duration", "above", 32.0, 30.0, 3600)
+PRESSURE_DROP = AlertRule("pressure_drop", "Rapidly falling pressure", "pressure", "rate", "below", -5.0, -2.5, 10800)
+
+
+def evaluate(rule: AlertRule, readings, cooldown_seconds: float = 3600.0):
+    # Feeds (seconds, value) readings to one rule; returns the status of each
+    engine, state = AlertEngine(outbox=None, rules=[rule], cooldown_seconds=cooldown_seconds), _RuleState()
+    return [engine._evaluate(rule, state, value, at)[0] for at, value in readings]
+
+
+def test_threshold_resolves_only_past_the_clear_value():
+    statuses = evaluate(FROST, [(0, 5.0), (600, 2.0), (1200, 3.5), (1800, 1.0), (2400, 4.5)])
+    assert statuses == [None, "triggered", None, None, "resolved"]
+
+
+def test_resolved_rule_waits_for_the_cooldown():
+    statuses = evaluate(FROST, [(0, 1.0), (600, 5.0), (1200, 1.0), (1800, 5.0), (600 + 3600, 1.0)])
+    assert statuses == ["triggered", "resolved", None, None, "triggered"]
+
+
+def test_duration_keeps_its_timer_through_dips_above_the_clear_value():
+    statuses = evaluate(HEAT, [(0, 33.0), (1200, 31.0), (2400, 33.0), (3600, 33.0), (4200, 31.0), (4800, 29.0)])
+    assert statuses == [None, None, None, "triggered", None, "resolved"]
+
+
+def test_duration_restarts_after_a_recovery():
+    statuses = evaluate(HEAT, [(0, 33.0), (600, 29.0), (1200, 33.0), (3600, 33.0), (4800, 33.0)])
+    assert statuses == [None, None, None, None, "triggered"]
+
+
+def test_rate_measures_the_change_over_the_window():
+    engine, state = AlertEngine(outbox=None, rules=[PRESSURE_DROP]), _RuleState()
+    hourly = [1015, 1014, 1013, 1012, 1010, 1008, 1005, 1005, 1006, 1007]
+    results = [engine._evaluate(PRESSURE_DROP, state, value, hour * 3600.0) for hour, value in enumerate(hourly)]
+    statuses = [status for status, _ in results]
+    assert statuses == [None] * 6 + ["triggered", None, None, "resolved"]
+    assert results[6][1] == pytest.approx(-7.0)  # 1005 hPa against 1012 three hours earlier
+
+
+def test_rate_ignores_an_anchor_older_than_two_windows():
+    state = _RuleState()
+    assert state.change(1015, 0, 3600) is None
+    assert state.change(1013, 1800, 3600) is None  # No reading a window old yet
+    assert state.change(1010, 3600, 3600) == pytest.approx(-5.0)
+    assert state.change(1000, 4 * 3600, 3600) is None
+
+
+def snapshot(temperature: float, at: datetime) -> WeatherSnapshot:
+    payload = owm_payload(41.16, -8.63)
+    payload["main"]["temp"] = temperature
+    observation = Observation.from_owm(payload, 41.16, -8.63, farm_id="farm-1", timestamp=at)
+    response = WeatherResponse.model_construct(weather=observation.to_weather_data(), recommendations=[])
+    return WeatherSnapshot.build(response, 41.16, -8.63, "metric", observation)
+
+
+@pytest.mark.anyio
+async def test_alerts_reach_the_webhook_once_despite_failures(fake_state, tmp_path):
+    store = LocalStore(str(tmp_path / "local_store.sqlite3"))
+    client = asgi_client(fake_state)
+    outbox = AlertOutbox(store, WebhookSink(client, "http://hooks.test/hooks/alerts"), retry_seconds=0.01)
+    engine = AlertEngine(outbox, rules=[FROST])
+    try:
+        fake_state.webhook_failures = 1
+        outbox.start()
+        reading = snapshot(1.0, datetime(2026, 1, 10, 6, 0, tzinfo=timezone.utc))
+        engine.observe("farm-1", reading)
+        engine.observe("farm-1", reading)  # Re-published reading
+        await outbox.close()
+        assert (engine.triggered, outbox.submitted, outbox.retries, outbox.delivered) == (1, 1, 1, 0)
+
+        await asyncio.sleep(0.02)
+        assert await outbox.deliver_due() == 1
+        [delivered] = fake_state.webhook_deliveries
+        assert (delivered["rule"], delivered["status"], delivered["value"]) == ("frost_risk", "triggered", 1.0)
+
+        outbox.start()
+        outbox.submit(delivered)  # The same message again, as after a restart
+        await outbox.close()
+        assert outbox.duplicates == 1
+        assert len(fake_state.webhook_deliveries) == 1
+    finally:
+        await client.aclose()
+        store.close()
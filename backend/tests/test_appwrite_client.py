@@ -0,0 +1,58 @@
+import pytest
+
+from backend.config import settings
+from backend.services import SERVER_GENERATED_ID
+
+pytestmark = pytest.mark.anyio
+
+
+def documents(count: int) -> list:
+    return [(f"reading-{i}", {"farm_id": "farm-1", "temperature": float(i)}) for i in range(count)]
+
+
+async def test_create_with_caller_chosen_id_is_retried(appwrite, fake_state):
+    fake_state.appwrite_down = True
+    assert await appwrite.create_document("weather", "reading-1", {"farm_id": "farm-1"}) is None
+    assert fake_state.appwrite_calls == 3
+    assert not appwrite.healthy
+
+
+async def test_create_with_server_generated_id_is_not_retried(appwrite, fake_state):
+    fake_state.appwrite_down = True
+    assert await appwrite.create_document("weather", SERVER_GENERATED_ID, {"farm_id": "farm-1"}) is None
+    assert fake_state.appwrite_calls == 1
+
+    fake_state.appwrite_down = False
+    document = await appwrite.create_document("weather", SERVER_GENERATED_ID, {"farm_id": "farm-1"})
+    assert list(fake_state.collections["weather"]) == [document["$id"]]
+    assert appwrite.healthy
+
+
+async def test_create_documents_treats_existing_documents_as_written(appwrite, fake_state):
+    batch = documents(3)
+    await appwrite.create_document("weather", *batch[0])
+    assert await appwrite.create_documents("weather", batch) == []
+    assert sorted(fake_state.collections["weather"]) == sorted(document_id for document_id, _ in batch)
+
+
+async def test_create_documents_returns_the_untried_rest_once_appwrite_is_down(appwrite, fake_state, monkeypatch):
+    monkeypatch.setattr(settings, "APPWRITE_WRITE_CONCURRENCY", 4)
+    fake_state.appwrite_down = True
+    batch = documents(10)
+    assert await appwrite.create_documents("weather", batch) == batch
+    assert fake_state.appwrite_calls == 4  # One chunk, each document tried once
+
+
+async def test_delete_documents_counts_missing_documents_as_deleted(appwrite, fake_state):
+    batch = documents(3)
+    await appwrite.create_documents("weather", batch)
+    assert await appwrite.delete_documents("weather", ["reading-0", "reading-1", "never-written"]) == 3
+    assert list(fake_state.collections["weather"]) == ["reading-2"]
+
+
+async def test_list_documents_reports_an_outage_as_unhealthy(appwrite, fake_state):
+    await appwrite.create_documents("weather", documents(2))
+    assert (await appwrite.list_documents("weather"))["total"] == 2
+    fake_state.appwrite_down = True
+    assert await appwrite.list_documents("weather") == {"total": 0, "documents": []}
+    assert not appwrite.healthy
@@ -0,0 +1,148 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import pytest
+
+from backend.broadcast import SnapshotBroadcaster
+from backend.config import settings
+from backend.fakes import owm_payload
+from backend.models import FarmSettingsData, WeatherResponse
+from backend.observation import Observation
+from backend.snapshot import WeatherSnapshot
+
+pytestmark = pytest.mark.anyio
+
+STREAM = "/api/farms/farm-1/weather/stream"
+
+
+def snapshot(temperature: float) -> WeatherSnapshot:
+    payload = owm_payload(41.16, -8.63)
+    payload["main"]["temp"] = temperature
+    at = datetime(2026, 1, 10, 6, 0, tzinfo=timezone.utc)
+    observation = Observation.from_owm(payload, 41.16, -8.63, farm_id="farm-1", timestamp=at)
+    response = WeatherResponse.model_construct(weather=observation.to_weather_data(), recommendations=[])
+    return WeatherSnapshot.build(response, 41.16, -8.63, "metric", observation)
+
+
+class StreamClient:
+    # Drives one GET against the ASGI app like a client that reads at its own pace and can
+    # hang up at any time; with `reset_on_start` the connection is gone before the headers
+    def __init__(self, app, path: str, headers: Optional[Dict[str, str]] = None, reset_on_start: bool = False):
+        self.app = app
+        self.scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+            "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+            "headers": [(b"host", b"api.test")] + [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+            "client": ("127.0.0.1", 50000), "server": ("api.test", 80),
+        }
+        self.reset_on_start = reset_on_start
+        self.status: Optional[int] = None
+        self.chunks: "asyncio.Queue[bytes]" = asyncio.Queue()
+        self.hung_up = asyncio.Event()
+        self._requested = False
+        self.task: Optional[asyncio.Task] = None
+
+    def open(self) -> "StreamClient":
+        self.task = asyncio.create_task(self.app(self.scope, self.receive, self.send))
+        return self
+
+    async def receive(self):
+        if not self._requested:
+            self._requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self.hung_up.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            if self.reset_on_start:
+                raise OSError("Connection reset by peer")
+            self.status = message["status"]
+        elif message.get("body"):
+            await self.chunks.put(message["body"])
+
+    async def events(self, count: int) -> List[bytes]:
+        return [await asyncio.wait_for(self.chunks.get(), 1.0) for _ in range(count)]
+
+    async def hang_up(self):
+        self.hung_up.set()
+        await asyncio.wait_for(asyncio.gather(self.task, return_exceptions=True), 1.0)
+
+
+@pytest.fixture
+async def farm(services, monkeypatch):
+    monkeypatch.setattr(settings, "STREAM_HEARTBEAT_SECONDS", 0.05)
+    farm_settings = FarmSettingsData(farm_latitude=41.16, farm_longitude=-8.63)
+    assert await services.farm_settings.update_settings(farm_settings, "farm-1", create=True) is not None
+    return "farm-1"
+
+
+def test_slow_subscriber_keeps_only_the_newest_frame():
+    broadcaster = SnapshotBroadcaster()
+    slow, other = broadcaster.subscribe("farm-1"), broadcaster.subscribe("farm-2")
+    frames = [snapshot(10.0), snapshot(11.0), snapshot(12.0)]
+    for frame in frames:
+        broadcaster.publish("farm-1", frame)
+    broadcaster.publish("farm-1", frames[-1])  # Unchanged reading: not sent again
+    assert slow.queue.qsize() == 1 and slow.queue.get_nowait() is frames[-1]
+    assert (slow.dropped, other.queue.qsize()) == (2, 0)
+    assert broadcaster.stats() == {"subscribers": 2, "farms": 2, "published": 3, "delivered": 3, "dropped": 2}
+
+
+def test_subscriber_limit():
+    broadcaster = SnapshotBroadcaster(max_subscribers=1)
+    first = broadcaster.subscribe("farm-1")
+    assert broadcaster.subscribe("farm-2") is None
+    first.close()
+    assert broadcaster.subscribe("farm-2") is not None
+
+
+async def test_stream_sends_the_current_reading_then_new_ones(app, services, farm):
+    current = snapshot(10.0)
+    services.weather.install_snapshot(farm, current)
+    client = StreamClient(app, STREAM).open()
+    retry, first = await client.events(2)
+    assert client.status == 200
+    assert retry == f"retry: {settings.STREAM_RETRY_MS}\n\n".encode()
+    assert first == b"id: " + current.etag.encode() + b"\nevent: weather\ndata: " + current.body + b"\n\n"
+
+    newer = snapshot(11.0)
+    services.weather.install_snapshot(farm, newer)
+    [event] = await client.events(1)
+    assert event.startswith(b"id: " + newer.etag.encode())
+    await client.hang_up()
+
+
+async def test_idle_stream_sends_heartbeats(app, farm):
+    client = StreamClient(app, STREAM).open()
+    assert await client.events(3) == [f"retry: {settings.STREAM_RETRY_MS}\n\n".encode(), b": heartbeat\n\n", b": heartbeat\n\n"]
+    await client.hang_up()
+
+
+async def test_reconnect_with_last_event_id_skips_the_current_reading(app, services, farm):
+    current = snapshot(10.0)
+    services.weather.install_snapshot(farm, current)
+    client = StreamClient(app, STREAM, headers={"Last-Event-ID": current.etag}).open()
+    assert (await client.events(2))[1] == b": heartbeat\n\n"
+    await client.hang_up()
+
+
+async def test_subscription_is_removed_when_the_client_hangs_up(app, services, farm):
+    client = StreamClient(app, STREAM).open()
+    await client.events(1)
+    assert services.broadcaster.subscriber_count == 1
+    await client.hang_up()
+    assert services.broadcaster.subscriber_count == 0
+
+
+async def test_subscription_is_removed_when_the_response_never_starts(app, services, farm):
+    client = StreamClient(app, STREAM, reset_on_start=True).open()
+    await asyncio.wait_for(asyncio.gather(client.task, return_exceptions=True), 1.0)
+    assert client.status is None
+    assert services.broadcaster.subscriber_count == 0
+
+
+async def test_unknown_farm_gets_no_subscription(api, services):
+    assert (await api.get("/api/farms/no-such-farm/weather/stream")).status_code == 404
+    assert services.broadcaster.subscriber_count == 0
@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+from backend.cache import MISSING, AsyncTTLCache
+from backend.models import FarmSettingsData
+from backend.services import FarmSettingsService
+
+pytestmark = pytest.mark.anyio
+
+
+class Loader:
+    # Cache loader that answers from `values` (MISSING for other keys); with `gate` set,
+    # each load waits for the gate to open
+    def __init__(self, **values):
+        self.values = values
+        self.calls = 0
+        self.gate = None
+        self.started = asyncio.Event()
+
+    async def __call__(self, key):
+        self.calls += 1
+        self.started.set()
+        value = self.values.get(key, MISSING)
+        if self.gate is not None:
+            await self.gate.wait()
+        return value
+
+
+async def test_stale_refresh_does_not_overwrite_a_write_through_value():
+    loader = Loader(farm="old")
+    cache = AsyncTTLCache(loader, ttl_seconds=0.0)
+    assert await cache.get("farm") == "old"
+
+    loader.gate = asyncio.Event()
+    loader.started.clear()
+    assert await cache.get("farm") == "old"  # Stale: starts a background refresh that reads "old"
+    await loader.started.wait()
+    cache.set("farm", "new")
+    cache.ttl_seconds = 60.0
+    loader.gate.set()
+    await asyncio.sleep(0.01)
+    assert cache._entries["farm"][0] == "new"
+    assert await cache.get("farm") == "new"
+
+
+async def test_cold_load_finishing_after_a_write_returns_the_written_value():
+    loader = Loader(farm="old")
+    loader.gate = asyncio.Event()
+    cache = AsyncTTLCache(loader, ttl_seconds=60.0)
+    lookup = asyncio.create_task(cache.get("farm"))
+    await loader.started.wait()
+    cache.set("farm", "new")
+    loader.gate.set()
+    assert await lookup == "new"
+    assert await cache.get("farm") == "new"
+
+
+async def test_invalidated_key_is_not_refilled_by_a_load_in_flight():
+    loader = Loader(farm="old")
+    loader.gate = asyncio.Event()
+    cache = AsyncTTLCache(loader, ttl_seconds=60.0)
+    lookup = asyncio.create_task(cache.get("farm"))
+    await loader.started.wait()
+    cache.invalidate("farm")  # Saved on another worker
+    loader.gate.set()
+    await lookup
+    assert "farm" not in cache._entries
+
+    loader.values["farm"] = "saved elsewhere"
+    assert await cache.get("farm") == "saved elsewhere"
+
+
+async def test_concurrent_misses_share_one_load_and_leave_nothing_behind():
+    loader = Loader(farm="value")
+    loader.gate = asyncio.Event()
+    cache = AsyncTTLCache(loader, ttl_seconds=60.0)
+    lookups = [asyncio.create_task(cache.get("farm")) for _ in range(10)]
+    await loader.started.wait()
+    loader.gate.set()
+    assert await asyncio.gather(*lookups) == ["value"] * 10
+    assert loader.calls == 1
+    assert cache._loads.in_flight() == 0
+
+
+async def test_unknown_keys_are_remembered_briefly_and_bounded():
+    loader = Loader()
+    cache = AsyncTTLCache(loader, ttl_seconds=60.0, negative_ttl_seconds=60.0, max_negative_entries=100)
+    for _ in range(3):
+        assert await cache.get("unknown") is None
+    assert loader.calls == 1
+
+    for i in range(500):
+        await cache.get(f"unknown-{i}")
+    assert len(cache._missing) <= 100
+    assert cache._loads.in_flight() == 0
+
+    cache.set("unknown", "created")
+    assert await cache.get("unknown") == "created"
+
+
+async def test_none_results_are_not_cached():
+    loader = Loader()
+    loader.values["farm"] = None  # Upstream unavailable
+    cache = AsyncTTLCache(loader, ttl_seconds=60.0, negative_ttl_seconds=60.0)
+    await cache.get("farm")
+    await cache.get("farm")
+    assert loader.calls == 2
+
+
+async def test_unknown_farm_reaches_appwrite_once(appwrite, fake_state):
+    service = FarmSettingsService(appwrite)
+    for _ in range(5):
+        assert await service.get_settings("no-such-farm") is None
+    assert fake_state.appwrite_calls == 1
+
+    farm = FarmSettingsData(farm_latitude=38.7, farm_longitude=-9.1)
+    assert await service.update_settings(farm, "no-such-farm", create=True) is not None
+    assert (await service.get_settings("no-such-farm")).farm_latitude == 38.7
+
+
+async def test_unknown_farm_is_not_remembered_during_an_outage(appwrite, fake_state):
+    service = FarmSettingsService(appwrite)
+    fake_state.appwrite_down = True
+    assert await service.get_settings("farm-1") is None
+    fake_state.appwrite_down = False
+    await appwrite.create_document(service.collection_id, "farm-1", FarmSettingsData().model_dump())
+    assert await service.get_settings("farm-1") is not None
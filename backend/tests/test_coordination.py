@@ -0,0 +1,120 @@
+import asyncio
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+
+from backend.coordination import SCHEDULER_LEASE, CoordinationStore, Coordinator
+from backend.fakes import owm_payload
+from backend.models import WeatherResponse
+from backend.observation import Observation
+from backend.services import FarmSettingsService, OpenWeatherMapService, WeatherService
+from backend.snapshot import WeatherSnapshot
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def workers(appwrite, tmp_path):
+    # Builds coordinators sharing one store file, like the workers of one host
+    path = str(tmp_path / "coordination.sqlite3")
+    created = []
+
+    def worker(lease_seconds: float = 15.0) -> Coordinator:
+        weather = WeatherService(appwrite, OpenWeatherMapService(http_client=appwrite.client), FarmSettingsService(appwrite))
+        coordinator = Coordinator(CoordinationStore(path), weather, lease_seconds=lease_seconds, interval_seconds=0.01)
+        coordinator.events = []
+        coordinator.on_elected.append(lambda: coordinator.events.append("elected"))
+        coordinator.on_demoted.append(lambda: coordinator.events.append("demoted"))
+        created.append(coordinator)
+        return coordinator
+
+    yield worker
+    for coordinator in created:
+        if coordinator._task is not None:
+            coordinator._task.cancel()
+        coordinator.store._conn.close()
+
+
+def snapshot(at: datetime) -> WeatherSnapshot:
+    observation = Observation.from_owm(owm_payload(41.16, -8.63), 41.16, -8.63, farm_id="farm-1", timestamp=at)
+    response = WeatherResponse.model_construct(weather=observation.to_weather_data(), recommendations=[])
+    return WeatherSnapshot.build(response, 41.16, -8.63, "metric", observation)
+
+
+async def test_one_worker_is_elected(workers):
+    first, second = workers(), workers()
+    await first.step()
+    await second.step()
+    await first.step()
+    assert (first.is_leader, second.is_leader) == (True, False)
+    assert (first.events, second.events) == (["elected"], [])
+    assert first.store.holder(SCHEDULER_LEASE) == first.holder
+
+
+async def test_follower_takes_over_when_the_leader_stops(workers):
+    first, second = workers(lease_seconds=0.05), workers(lease_seconds=0.05)
+    await first.step()
+    await second.step()
+    assert not second.is_leader
+
+    await asyncio.sleep(0.1)  # The leader stops renewing and its lease runs out
+    await second.step()
+    assert second.is_leader
+    await first.step()
+    assert not first.is_leader
+    assert first.events == ["elected", "demoted"]
+
+
+async def test_closing_hands_the_lease_over_right_away(workers):
+    first, second = workers(), workers()
+    await first.step()
+    await first.close()
+    await second.step()
+    assert second.is_leader
+
+
+async def test_leader_steps_down_when_it_cannot_renew(workers):
+    leader = workers(lease_seconds=0.1)
+    await leader.step()
+    assert leader.is_leader
+
+    def locked(*args):
+        raise sqlite3.OperationalError("database is locked")
+
+    leader.store.acquire = locked
+    leader.start()
+    await asyncio.sleep(0.03)
+    assert leader.is_leader  # Still inside the lease it last renewed
+
+    await asyncio.sleep(0.2)
+    assert not leader.is_leader
+    assert leader.events == ["elected", "demoted"]
+    assert leader.stats()["demotions"] == 1
+
+
+async def test_followers_serve_the_leaders_snapshots(workers):
+    leader, follower = workers(), workers()
+    await leader.step()
+    await follower.step()
+
+    published = snapshot(datetime(2026, 1, 10, 6, 0, tzinfo=timezone.utc))
+    leader.snapshot_published("farm-1", published)
+    follower.snapshot_published("farm-1", snapshot(datetime(2026, 1, 10, 5, 0, tzinfo=timezone.utc)))  # Not shared
+    await leader.step()
+    await follower.step()
+    installed = follower.weather.latest_snapshots["farm-1"]
+    assert (installed.etag, installed.body) == (published.etag, published.body)
+    assert (leader.snapshots_written, follower.snapshots_installed) == (1, 1)
+
+
+async def test_saved_settings_reach_every_worker(workers):
+    first, second = workers(), workers()
+    changed = []
+    second.on_settings_changed.append(lambda: changed.append(True))
+    await first.step()
+    await second.step()
+    first.settings_saved("farm-1", None)
+    await first.step()
+    await second.step()
+    assert changed == [True]
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from backend.config import settings
+from backend.fakes import asgi_client
+from backend.models import FarmSettingsData
+from backend.services import FarmSettingsService, OpenWeatherMapService, WeatherService
+
+pytestmark = pytest.mark.anyio
+
+CELL = (41.16, -8.63, "metric")
+
+
+@pytest.fixture
+async def weather(appwrite, fake_state, monkeypatch):
+    monkeypatch.setattr(settings, "OPENWEATHERMAP_ONECALL_URL", None)
+    owm = OpenWeatherMapService(http_client=asgi_client(fake_state))
+    yield WeatherService(appwrite, owm, FarmSettingsService(appwrite))
+    await owm.client.aclose()
+
+
+def expire(weather):
+    weather.forecasts[CELL].expires_at = 0.0
+
+
+async def test_expired_forecast_is_revalidated_with_its_etag(weather, fake_state):
+    assert await weather.refresh_forecast(CELL) == "updated"
+    series = weather.forecasts[CELL]
+    body, etag = series.body, series.etag
+
+    expire(weather)
+    assert await weather.refresh_forecast(CELL) == "not_modified"
+    assert (fake_state.forecast_calls, fake_state.forecast_not_modified) == (2, 1)
+    assert weather.forecasts[CELL] is series
+    assert (series.body, series.etag) == (body, etag)
+    assert series.is_fresh()
+
+    fake_state.forecast_version += 1
+    expire(weather)
+    assert await weather.refresh_forecast(CELL) == "updated"
+    assert series.etag != etag
+
+
+async def test_fresh_forecast_makes_no_request(weather, fake_state):
+    assert await weather.refresh_forecast(CELL) == "updated"
+    assert await weather.refresh_forecast(CELL) == "fresh"
+    assert fake_state.forecast_calls == 1
+
+
+async def test_freshness_follows_cache_control(weather, fake_state):
+    fake_state.forecast_max_age = 120
+    await weather.refresh_forecast(CELL)
+    series = weather.forecasts[CELL]
+    assert series.expires_at - series.fetched_at == 120
+
+    fake_state.forecast_max_age = 0  # No Cache-Control header
+    expire(weather)
+    assert await weather.refresh_forecast(CELL) == "not_modified"
+    assert series.expires_at - series.fetched_at == settings.FORECAST_DEFAULT_MAX_AGE_SECONDS
+
+
+async def test_html_forecast_page_counts_as_failed(weather, fake_state):
+    fake_state.forecast_html = True
+    assert await weather.refresh_forecast(CELL) == "failed"
+    assert CELL not in weather.forecasts
+
+
+async def run_batch(weather):
+    # Runs one scheduler batch over a single farm in CELL; returns the stats and the payloads seen
+    fetched = []
+    members = [("farm-1", FarmSettingsData(farm_latitude=CELL[0], farm_longitude=CELL[1], units=CELL[2]))]
+    stats = await weather.update_cells({CELL: members}, on_cell_fetched=lambda cell, raw: fetched.append((cell, raw)))
+    return stats, fetched
+
+
+async def test_forecast_error_keeps_the_current_reading(weather, fake_state):
+    async def broken(cell):
+        raise RuntimeError("forecast parser bug")
+
+    weather._refresh_forecast = broken
+    stats, fetched = await run_batch(weather)
+    assert (stats["updated"], stats["failed"], stats["forecasts_updated"]) == (1, 0, 0)
+    assert "farm-1" in weather.latest_snapshots
+    [(cell, raw)] = fetched
+    assert cell == CELL and raw is not None
+
+
+async def test_current_reading_error_counts_the_cell_as_failed(weather, fake_state):
+    async def broken(lat, lon, units):
+        raise RuntimeError("unexpected payload")
+
+    weather.owm.get_current_weather = broken
+    stats, fetched = await run_batch(weather)
+    assert (stats["updated"], stats["failed"], stats["forecasts_updated"]) == (0, 1, 1)
+    assert fetched == [(CELL, None)]
+
+
+async def test_request_does_not_join_a_batch_cut_off_by_its_deadline(weather, fake_state):
+    farm = FarmSettingsData(farm_latitude=CELL[0], farm_longitude=CELL[1], units=CELL[2])
+    await weather.settings_service.update_settings(farm, "farm-1", create=True)
+    fake_state.owm_latency = 0.1
+    batch = asyncio.create_task(weather.update_cells({CELL: [("farm-1", farm)]}, deadline_seconds=0.05))
+    await asyncio.sleep(0.01)
+    assert await weather.update_weather_data("farm-1") is not None  # Outlives the batch deadline
+    stats = await batch
+    assert (stats["updated"], stats["timed_out"]) == (0, 1)
+    assert fake_state.owm_calls == 2
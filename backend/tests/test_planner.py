@@ -0,0 +1,105 @@
+import random
+
+from backend.fakes import owm_payload
+from backend.models import FarmSettingsData
+from backend.planner import RefreshPlanner
+from backend.recommendations import DEFAULT_TABLE
+from backend.services import grid_cell
+
+NOW = 1_800_000_000.0
+SENSITIVITIES = {"temperature": 2.0, "humidity": 10.0, "pressure": 3.0, "wind_speed": 3.0}
+
+
+def weather(temperature: float = 20.0, humidity: int = 50, pressure: int = 1015, wind_speed: float = 3.0, units: str = "metric") -> dict:
+    # A fake OWM /weather payload with pinned readings, clear of every default rule threshold
+    payload = owm_payload(41.16, -8.63, units)
+    payload["main"].update(temp=temperature, humidity=humidity, pressure=pressure)
+    payload["wind"]["speed"] = wind_speed
+    return payload
+
+
+def planned(units: str = "metric", jitter_fraction: float = 0.0):
+    # Planner with one farm polled every 10 minutes; returns the planner and the farm's cell
+    planner = RefreshPlanner(SENSITIVITIES, jitter_fraction=jitter_fraction, min_factor=0.5, max_factor=3.0,
+                             stable_runs=3, rng=random.Random(7))
+    farm = FarmSettingsData(farm_latitude=41.1579, farm_longitude=-8.6291, update_frequency=10, units=units)
+    planner.update_farm("farm-1", farm, NOW)
+    return planner, grid_cell(farm.farm_latitude, farm.farm_longitude, units)
+
+
+def test_failed_fetches_retry_sooner_and_back_off_to_the_full_interval():
+    planner, cell = planned()
+    plan = planner.cells[cell]
+    planner.record(cell, None, now=NOW)
+    assert (plan.reason, plan.failures, plan.next_run) == ("failed", 1, NOW + 300)
+    planner.record(cell, None, now=NOW)
+    planner.record(cell, None, now=NOW)
+    assert (plan.failures, plan.next_run) == (3, NOW + 600)
+
+    planner.record(cell, weather(), now=NOW)
+    assert (plan.reason, plan.failures, plan.next_run) == ("scheduled", 0, NOW + 600)
+
+
+def test_volatile_reading_halves_the_interval():
+    planner, cell = planned()
+    plan = planner.cells[cell]
+    planner.record(cell, weather(temperature=20.0), now=NOW)
+    planner.record(cell, weather(temperature=20.5, humidity=55), now=NOW)
+    assert (plan.reason, plan.interval) == ("scheduled", 600)
+
+    planner.record(cell, weather(temperature=23.0, humidity=55), now=NOW)
+    assert (plan.reason, plan.interval, plan.stable_runs, plan.next_run) == ("volatile", 300, 0, NOW + 300)
+
+
+def test_stable_readings_double_the_interval_up_to_the_cap():
+    planner, cell = planned()
+    plan = planner.cells[cell]
+    intervals = []
+    for _ in range(6):
+        planner.record(cell, weather(), now=NOW)
+        intervals.append((plan.reason, plan.interval))
+    assert intervals == [
+        ("scheduled", 600), ("scheduled", 600), ("stable", 1200), ("stable", 1800), ("stable", 1800), ("stable", 1800)
+    ]
+
+    planner.record(cell, weather(wind_speed=9.0), now=NOW)
+    assert (plan.reason, plan.interval) == ("volatile", 300)
+
+
+def test_reading_near_a_rule_threshold_polls_faster():
+    planner, cell = planned()
+    plan = planner.cells[cell]
+    planner.record(cell, weather(temperature=11.0), now=NOW)
+    assert plan.reason == "scheduled"  # Without a rule table there is no threshold to watch
+
+    planner.record(cell, weather(temperature=11.0), DEFAULT_TABLE, now=NOW)
+    assert (plan.reason, plan.interval) == ("near_threshold", 300)
+
+
+def test_imperial_readings_use_scaled_sensitivities():
+    planner, cell = planned(units="imperial")
+    plan = planner.cells[cell]
+    planner.record(cell, weather(temperature=68.0, units="imperial"), now=NOW)
+    planner.record(cell, weather(temperature=71.0, units="imperial"), now=NOW)  # 3 °F is under 2 °C
+    assert plan.reason == "scheduled"
+    planner.record(cell, weather(temperature=75.0, units="imperial"), now=NOW)
+    assert plan.reason == "volatile"
+
+
+def test_run_times_are_jittered_within_the_fraction():
+    planner, cell = planned(jitter_fraction=0.1)
+    plan = planner.cells[cell]
+    offsets = set()
+    for _ in range(20):
+        planner.record(cell, weather(), now=NOW)
+        offsets.add(plan.next_run - NOW)
+        plan.stable_runs = 0  # Stay on the base interval
+    assert all(540 <= offset <= 660 for offset in offsets)
+    assert len(offsets) > 1
+
+
+def test_unknown_cell_is_ignored():
+    planner, _ = planned()
+    planner.record((0.0, 0.0, "metric"), weather(), now=NOW)
+    assert (0.0, 0.0, "metric") not in planner.cells
+
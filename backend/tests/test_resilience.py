@@ -0,0 +1,164 @@
+import asyncio
+import socket
+
+import pytest
+from appwrite.exception import AppwriteException
+
+from backend.config import settings
+from backend.fakes import FakeServer, FakeState
+from backend.resilience import CircuitBreaker, CircuitOpenError, ResiliencePolicy, RetryBudget
+from backend.services import SERVER_GENERATED_ID, AppwriteService, appwrite_transient
+
+from . import fast_policy
+
+
+class Flaky:
+    # Raises `errors` in order, then returns "ok"; counts every attempt
+    def __init__(self, *errors: Exception):
+        self.errors = list(errors)
+        self.attempts = 0
+
+    def __call__(self):
+        self.attempts += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+    async def call_async(self):
+        return self()
+
+
+def unavailable() -> AppwriteException:
+    return AppwriteException("Service unavailable", 503)
+
+
+@pytest.mark.anyio
+async def test_transient_errors_are_retried():
+    policy, flaky = fast_policy(), Flaky(unavailable(), unavailable())
+    assert await policy.call(flaky.call_async) == "ok"
+    assert (flaky.attempts, policy.retries, policy.breaker.state) == (3, 2, CircuitBreaker.CLOSED)
+
+
+@pytest.mark.anyio
+async def test_attempts_are_bounded():
+    policy, flaky = fast_policy(), Flaky(*(unavailable() for _ in range(5)))
+    with pytest.raises(AppwriteException):
+        await policy.call(flaky.call_async)
+    assert flaky.attempts == 3
+
+
+@pytest.mark.anyio
+async def test_client_errors_are_final_and_keep_the_circuit_closed():
+    policy = fast_policy(failure_threshold=1)
+    flaky = Flaky(AppwriteException("Document not found", 404))
+    with pytest.raises(AppwriteException):
+        await policy.call(flaky.call_async)
+    assert flaky.attempts == 1
+    assert policy.breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.anyio
+async def test_retry_false_makes_a_single_attempt():
+    policy, flaky = fast_policy(), Flaky(unavailable())
+    with pytest.raises(AppwriteException):
+        await policy.call(flaky.call_async, retry=False)
+    assert flaky.attempts == 1
+
+
+@pytest.mark.anyio
+async def test_empty_retry_budget_stops_retries():
+    budget = RetryBudget(ratio=0.0, min_per_second=0.0)
+    budget.balance = 0.0
+    policy = ResiliencePolicy("appwrite", CircuitBreaker("appwrite"), budget, deadline_seconds=5.0,
+                              base_delay=0.0, max_delay=0.0, is_transient=appwrite_transient)
+    flaky = Flaky(unavailable())
+    with pytest.raises(AppwriteException):
+        await policy.call(flaky.call_async)
+    assert (flaky.attempts, budget.denied) == (1, 1)
+
+
+@pytest.mark.anyio
+async def test_deadline_interrupts_a_slow_attempt():
+    policy = ResiliencePolicy("appwrite", CircuitBreaker("appwrite"), RetryBudget(), deadline_seconds=0.05,
+                              base_delay=0.0, max_delay=0.0)
+    attempts = 0
+
+    async def slow():
+        nonlocal attempts
+        attempts += 1
+        await asyncio.sleep(1)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await policy.call(slow)
+    assert attempts == 1
+
+
+@pytest.mark.anyio
+async def test_open_circuit_fails_fast_then_lets_one_trial_through():
+    policy = fast_policy(failure_threshold=2, recovery_seconds=0.05, max_attempts=1)
+    for _ in range(2):
+        with pytest.raises(AppwriteException):
+            await policy.call(Flaky(unavailable()).call_async)
+    assert policy.breaker.state == CircuitBreaker.OPEN
+
+    flaky = Flaky()
+    with pytest.raises(CircuitOpenError):
+        await policy.call(flaky.call_async)
+    assert flaky.attempts == 0
+
+    await asyncio.sleep(0.06)
+    assert policy.breaker.allow()  # Half-open: the first caller is the trial...
+    assert not policy.breaker.allow()  # ...and everyone else waits for its outcome
+    policy.breaker.record_success()
+    assert await policy.call(flaky.call_async) == "ok"
+    assert policy.breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.anyio
+async def test_failed_trial_reopens_the_circuit():
+    policy = fast_policy(failure_threshold=1, recovery_seconds=0.05, max_attempts=1)
+    with pytest.raises(AppwriteException):
+        await policy.call(Flaky(unavailable()).call_async)
+    await asyncio.sleep(0.06)
+    with pytest.raises(AppwriteException):
+        await policy.call(Flaky(unavailable()).call_async)
+    assert (policy.breaker.state, policy.breaker.opened) == (CircuitBreaker.OPEN, 2)
+
+
+def test_call_sync_retries_transient_errors():
+    policy, flaky = fast_policy(), Flaky(unavailable())
+    assert policy.call_sync(flaky) == "ok"
+    assert flaky.attempts == 2
+
+
+# The blocking SDK client needs a real socket, so it talks to the fake over uvicorn
+@pytest.fixture(scope="module")
+def fake_server():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    with FakeServer(port=port, state=FakeState()) as server:
+        yield server
+
+
+@pytest.fixture
+def sync_appwrite(fake_server, monkeypatch):
+    fake_server.state.reset()
+    monkeypatch.setattr(settings, "APPWRITE_ENDPOINT", fake_server.appwrite_endpoint)
+    return AppwriteService(policy=fast_policy())
+
+
+def test_sync_create_with_caller_chosen_id_is_retried(fake_server, sync_appwrite):
+    fake_server.state.appwrite_down = True
+    assert sync_appwrite.create_document("weather", "reading-1", {"farm_id": "farm-1"}) is None
+    assert fake_server.state.appwrite_calls == 3
+
+
+def test_sync_create_with_server_generated_id_is_not_retried(fake_server, sync_appwrite):
+    fake_server.state.appwrite_down = True
+    assert sync_appwrite.create_document("weather", SERVER_GENERATED_ID, {"farm_id": "farm-1"}) is None
+    assert fake_server.state.appwrite_calls == 1
+
+    fake_server.state.appwrite_down = False
+    document = sync_appwrite.create_document("weather", SERVER_GENERATED_ID, {"farm_id": "farm-1"})
+    assert document["$id"] in fake_server.state.collections["weather"]
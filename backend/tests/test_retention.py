@@ -0,0 +1,140 @@
+import csv
+import io
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend.config import settings
+from backend.export import EXPORT_SELECT, stream_export
+from backend.fakes import owm_payload
+from backend.history import bucket_start
+from backend.observation import Observation
+from backend.retention import RollupCompactor, retention_cutoffs
+from backend.services import FarmSettingsService, OpenWeatherMapService, WeatherService
+from backend.writer import new_document_id
+
+pytestmark = pytest.mark.anyio
+
+RAW_DAYS, HOURLY_DAYS = 30, 35
+DAY = bucket_start(datetime.now(timezone.utc) - timedelta(days=40), "daily")  # Old enough for daily rollups
+
+
+@pytest.fixture
+def weather(appwrite, monkeypatch):
+    monkeypatch.setattr(settings, "RETENTION_ENABLED", True)
+    monkeypatch.setattr(settings, "RETENTION_RAW_DAYS", RAW_DAYS)
+    monkeypatch.setattr(settings, "RETENTION_HOURLY_DAYS", HOURLY_DAYS)
+    return WeatherService(appwrite, OpenWeatherMapService(http_client=appwrite.client), FarmSettingsService(appwrite))
+
+
+@pytest.fixture
+def compactor(weather):
+    return RollupCompactor(weather, settings.APPWRITE_ROLLUP_COLLECTION_ID, RAW_DAYS, HOURLY_DAYS)
+
+
+async def seed(weather, farm_id: str, times) -> list:
+    # Stores one fake OWM reading per time; returns the document IDs
+    rng = random.Random(farm_id)
+    documents = [
+        (new_document_id(), Observation.from_owm(owm_payload(41.16, -8.63, rng=rng), 41.16, -8.63, farm_id, at).to_document())
+        for at in times
+    ]
+    assert await weather.appwrite.create_documents(weather.weather_collection_id, documents) == []
+    return [document_id for document_id, _ in documents]
+
+
+def readings(hours, per_hour: int = 3):
+    return [DAY + timedelta(hours=hour, minutes=20 * i) for hour in hours for i in range(per_hour)]
+
+
+def summary(result) -> list:
+    # Aggregated buckets without the tier they were read from
+    return [{key: value for key, value in bucket.items() if key != "tier"} for bucket in result["buckets"]]
+
+
+async def daily_history(weather, farm_id: str):
+    return await weather.aggregate_weather_history("daily", farm_id, DAY - timedelta(days=1), datetime.now(timezone.utc))
+
+
+async def test_compaction_keeps_aggregates_and_removes_sources(weather, compactor, fake_state):
+    old = await seed(weather, "farm-1", readings([6, 7, 13]))
+    recent = await seed(weather, "farm-1", [datetime.now(timezone.utc) - timedelta(days=1)])
+    other_farm = await seed(weather, "farm-2", readings([6]))
+    before = summary(await daily_history(weather, "farm-1"))
+    raw_cutoff, hourly_cutoff = retention_cutoffs(RAW_DAYS, HOURLY_DAYS)
+
+    assert await compactor.compact("farm-1", "raw", raw_cutoff) == len(old)
+    stored = fake_state.collections[weather.weather_collection_id]
+    assert sorted(stored) == sorted(recent + other_farm)
+    hourly = list(fake_state.collections[compactor.rollup_collection_id].values())
+    assert sorted((rollup["bucket_start"][11:13], rollup["count"]) for rollup in hourly) == [("06", 3), ("07", 3), ("13", 3)]
+    assert summary(await daily_history(weather, "farm-1")) == before
+
+    assert await compactor.compact("farm-1", "hourly", hourly_cutoff) == 3
+    [daily] = fake_state.collections[compactor.rollup_collection_id].values()
+    assert (daily["tier"], daily["count"]) == ("daily", 9)
+    after = await daily_history(weather, "farm-1")
+    assert summary(after) == before
+    assert [bucket["tier"] for bucket in after["buckets"]] == ["daily", "raw"]
+
+
+async def test_interrupted_run_is_finished_without_counting_twice(weather, compactor, fake_state):
+    old = await seed(weather, "farm-1", readings([6, 7]))
+    before = summary(await daily_history(weather, "farm-1"))
+    raw_cutoff, _ = retention_cutoffs(RAW_DAYS, HOURLY_DAYS)
+
+    # The run stops after writing the rollups, before deleting their sources
+    async def interrupted(collection_id, document_ids):
+        return 0
+
+    weather.appwrite.delete_documents = interrupted
+    assert await compactor.compact("farm-1", "raw", raw_cutoff) == 0
+    assert len(fake_state.collections[weather.weather_collection_id]) == len(old)
+    assert summary(await daily_history(weather, "farm-1")) == before
+
+    # The next run finds the rollups already written (409) and only deletes the leftovers
+    del weather.appwrite.delete_documents
+    assert await compactor.compact("farm-1", "raw", raw_cutoff) == len(old)
+    assert (compactor.rollups_written, compactor.failed) == (4, 0)
+    assert len(fake_state.collections[compactor.rollup_collection_id]) == 2
+    assert summary(await daily_history(weather, "farm-1")) == before
+
+
+async def test_sources_are_kept_while_appwrite_is_down(weather, compactor, fake_state):
+    old = await seed(weather, "farm-1", readings([6]))
+    raw_cutoff, _ = retention_cutoffs(RAW_DAYS, HOURLY_DAYS)
+    fake_state.appwrite_down = True
+    assert await compactor.compact("farm-1", "raw", raw_cutoff) == 0
+    fake_state.appwrite_down = False
+    assert sorted(fake_state.collections[weather.weather_collection_id]) == sorted(old)
+    assert compactor.rollup_collection_id not in fake_state.collections
+
+
+async def test_batch_limit_leaves_the_last_bucket_for_the_next_run(weather, compactor, fake_state):
+    old = await seed(weather, "farm-1", readings([6, 7, 8]))
+    compactor.batch_documents = 5
+    raw_cutoff, _ = retention_cutoffs(RAW_DAYS, HOURLY_DAYS)
+    # The limit is checked per page: the scan stops past it and the newest bucket waits
+    assert await compactor.compact("farm-1", "raw", raw_cutoff) == 6
+    assert len(fake_state.collections[weather.weather_collection_id]) == 3
+    assert await compactor.compact("farm-1", "raw", raw_cutoff) == 3
+    assert not fake_state.collections[weather.weather_collection_id]
+    assert len(fake_state.collections[compactor.rollup_collection_id]) == len(old) // 3
+
+
+async def test_export_includes_compacted_periods_as_rollup_rows(weather, compactor, fake_state):
+    old = await seed(weather, "farm-1", readings([6, 7]))
+    await seed(weather, "farm-1", [datetime.now(timezone.utc) - timedelta(days=1)])
+    documents = fake_state.collections[weather.weather_collection_id].values()
+    six_oclock = [float(document["temperature"]) for document in documents if document["timestamp"][11:13] == "06"]
+    raw_cutoff, _ = retention_cutoffs(RAW_DAYS, HOURLY_DAYS)
+    assert await compactor.compact("farm-1", "raw", raw_cutoff) == len(old)
+
+    pages = weather.iter_history("farm-1", DAY - timedelta(days=1), None, select=EXPORT_SELECT)
+    body = b"".join([chunk async for chunk in stream_export("csv", pages, batch_rows=100)])
+    rows = list(csv.DictReader(io.StringIO(body.decode("utf-8"))))
+    assert [(row["timestamp"][11:16], row["tier"]) for row in rows[:2]] == [("06:00", "hourly"), ("07:00", "hourly")]
+    assert [row["tier"] for row in rows[2:]] == ["raw"]
+    assert float(rows[0]["temperature"]) == pytest.approx(sum(six_oclock) / len(six_oclock))
+    assert (rows[0]["lat"], rows[0]["farm_id"]) == ("", "farm-1")
@@ -0,0 +1,36 @@
+import io
+from datetime import datetime, timezone
+
+import pytest
+
+from backend.fakes import owm_payload
+from backend.models import WeatherResponse
+from backend.observation import Observation
+from backend.snapshot import WeatherSnapshot
+
+pytestmark = pytest.mark.anyio
+
+
+def snapshot(farm_id: str) -> WeatherSnapshot:
+    at = datetime(2026, 1, 10, 6, 0, tzinfo=timezone.utc)
+    observation = Observation.from_owm(owm_payload(41.16, -8.63), 41.16, -8.63, farm_id=farm_id, timestamp=at)
+    response = WeatherResponse.model_construct(weather=observation.to_weather_data(), recommendations=[])
+    return WeatherSnapshot.build(response, 41.16, -8.63, "metric", observation)
+
+
+async def test_readiness_is_warm_once_any_farm_has_a_snapshot(api, services):
+    assert (await api.get("/api/health/ready")).json()["state"] == "cold"
+    services.weather.install_snapshot("farm-2", snapshot("farm-2"))  # Not the default farm
+    ready = (await api.get("/api/health/ready")).json()
+    assert (ready["state"], ready["snapshots"]) == ("warm", 1)
+
+
+async def test_parquet_export_has_a_tier_column(api, services):
+    pq = pytest.importorskip("pyarrow.parquet")
+    reading = snapshot(None).observation
+    assert await services.appwrite.create_documents(services.weather.weather_collection_id, [("reading-1", reading.to_document())]) == []
+    response = await api.get("/api/weather/export", params={"format": "parquet"})
+    assert response.status_code == 200
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.column("tier").to_pylist() == ["raw"]
+    assert table.column("temperature").to_pylist() == [reading.temperature]
@@ -0,0 +1,37 @@
+from datetime import datetime, timezone
+
+from backend.fakes import owm_payload
+from backend.models import WeatherResponse
+from backend.observation import Observation
+from backend.snapshot import WeatherSnapshot, etag_matches
+
+ETAG = '"5d41402abc4b2a76b9719d91"'
+
+
+def test_etag_matches_exact_and_weak_validators():
+    assert etag_matches(ETAG, ETAG)
+    assert etag_matches(f"W/{ETAG}", ETAG)
+    assert etag_matches(f'"stale", W/{ETAG}', ETAG)
+    assert etag_matches(" * ", ETAG)
+
+
+def test_etag_matches_rejects_other_or_missing_validators():
+    assert not etag_matches(None, ETAG)
+    assert not etag_matches("", ETAG)
+    assert not etag_matches('"stale"', ETAG)
+    assert not etag_matches(ETAG.strip('"'), ETAG)  # Unquoted
+
+
+def snapshot(temperature: float) -> WeatherSnapshot:
+    payload = owm_payload(41.16, -8.63)
+    payload["main"]["temp"] = temperature
+    observation = Observation.from_owm(payload, 41.16, -8.63, timestamp=datetime(2026, 1, 10, 6, 0, tzinfo=timezone.utc))
+    response = WeatherResponse.model_construct(weather=observation.to_weather_data(), recommendations=[])
+    return WeatherSnapshot.build(response, 41.16, -8.63, "metric", observation)
+
+
+def test_snapshot_etag_follows_the_body():
+    first, second = snapshot(12.5), snapshot(13.0)
+    assert first.etag != second.etag
+    assert etag_matches(first.etag, WeatherSnapshot.build(first.response, 41.16, -8.63, "metric").etag)
+    assert not etag_matches(first.etag, second.etag)
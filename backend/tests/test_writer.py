@@ -0,0 +1,80 @@
+import pytest
+
+from backend.config import settings
+from backend.localstore import LocalStore
+from backend.writer import ObservationWriter, new_document_id
+
+pytestmark = pytest.mark.anyio
+
+
+def reading(farm_id: str, timestamp: str) -> dict:
+    return {"farm_id": farm_id, "timestamp": timestamp, "temperature": 12.5}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LocalStore(str(tmp_path / "local_store.sqlite3"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def writer(appwrite, store, monkeypatch):
+    # No grace period: rows deferred by a finished flush are replayable right away
+    monkeypatch.setattr(settings, "LOCAL_STORE_SYNC_GRACE_SECONDS", 0.0)
+    return ObservationWriter(appwrite, "weather", batch_size=10, flush_interval=0.01, max_retries=0, store=store)
+
+
+async def write_during_outage(writer, fake_state, documents):
+    fake_state.appwrite_down = True
+    writer.start()
+    for document_id, data in documents:
+        await writer.enqueue(document_id, data)
+    await writer.close()
+    fake_state.appwrite_down = False
+
+
+async def test_outage_defers_to_local_store_and_replays(writer, store, fake_state):
+    documents = [(new_document_id(), reading("farm-1", f"2026-03-01T0{hour}:00:00+00:00")) for hour in range(3)]
+    await write_during_outage(writer, fake_state, documents)
+    assert (writer.written, writer.deferred, writer.dropped) == (0, 3, 0)
+    assert store.counts() == {"pending": 3, "synced": 0}
+    assert "weather" not in fake_state.collections
+
+    assert await writer.replay_pending() == 3
+    assert writer.replayed == 3
+    assert store.counts() == {"pending": 0, "synced": 3}
+    stored = fake_state.collections["weather"]
+    assert sorted(stored) == sorted(document_id for document_id, _ in documents)
+    # Stored as Appwrite normalizes datetimes, not as the replay time
+    assert stored[documents[0][0]]["timestamp"] == "2026-03-01T00:00:00.000+00:00"
+
+
+async def test_replay_keeps_rows_pending_while_appwrite_is_down(writer, store, fake_state):
+    await write_during_outage(writer, fake_state, [(new_document_id(), reading("farm-1", "2026-03-01T00:00:00+00:00"))])
+    fake_state.appwrite_down = True
+    assert await writer.replay_pending() == 0
+    assert store.counts() == {"pending": 1, "synced": 0}
+
+
+async def test_replay_counts_documents_already_in_appwrite_as_written(writer, store, fake_state, appwrite):
+    # A flush whose response was lost: the document exists remotely but is still pending locally
+    document_id = new_document_id()
+    await write_during_outage(writer, fake_state, [(document_id, reading("farm-1", "2026-03-01T00:00:00+00:00"))])
+    await appwrite.create_document("weather", document_id, reading("farm-1", "2026-03-01T00:00:00+00:00"))
+
+    assert await writer.replay_pending() == 1
+    assert store.counts() == {"pending": 0, "synced": 1}
+    assert list(fake_state.collections["weather"]) == [document_id]
+
+
+async def test_local_history_follows_observation_time_not_replay_order(writer, store, fake_state):
+    late, early = new_document_id(), new_document_id()
+    await write_during_outage(writer, fake_state, [(late, reading("farm-1", "2026-03-01T12:00:00+00:00"))])
+    await write_during_outage(writer, fake_state, [(early, reading("farm-1", "2026-03-01T06:00:00+00:00"))])
+    await writer.replay_pending()
+
+    page = store.history("weather", "farm-1", limit=10)
+    assert [document["$id"] for document in page["documents"]] == [late, early]
+    cutoff = 1772366400.0  # 2026-03-01T12:00:00Z
+    assert [document["$id"] for document in store.history("weather", "farm-1", limit=10, end=cutoff)["documents"]] == [early]
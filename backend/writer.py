@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import random
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from .config import settings
+from .localstore import LocalStore
+
+logger = logging.getLogger(__name__)
+
+# --- Buffered Observation Writer ---
+# Weather readings are not written to Appwrite on the request/scheduler path. They are
+# appended to a bounded queue and a single background task flushes them in batches,
+# either when BATCH_SIZE documents are waiting or FLUSH_INTERVAL seconds have passed.
+# Documents of a batch are sent over the async Appwrite client with bounded parallelism;
+# only the local store (SQLite) is touched from worker threads.
+#
+# When a LocalStore is attached, each batch is recorded there first (write-ahead). Batches
+# that still fail after the retries are kept as pending instead of being dropped, and a
+# second background task replays them to Appwrite once it is reachable again.
+#
+# Document IDs are assigned before enqueueing. That lets callers return the ID right
+# away and makes retries idempotent: a document that already exists counts as written.
+
+def new_document_id() -> str:
+    # Same shape as Appwrite's own unique IDs (20 hex characters)
+    return uuid.uuid4().hex[:20]
+
+_STOP = object()  # Sentinel that tells the flush loop to drain and exit
+
+class ObservationWriter:
+    def __init__(self, appwrite_service, collection_id: str,
+                 batch_size: Optional[int] = None, flush_interval: Optional[float] = None,
+                 max_buffer: Optional[int] = None, max_retries: Optional[int] = None,
+                 retry_backoff: Optional[float] = None, store: Optional[LocalStore] = None):
+        self.appwrite = appwrite_service
+        self.collection_id = collection_id
+        self.store = store
+        self.batch_size = batch_size or settings.WRITER_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.WRITER_FLUSH_INTERVAL_SECONDS
+        self.max_retries = settings.WRITER_MAX_RETRIES if max_retries is None else max_retries
+        self.retry_backoff = retry_backoff or settings.WRITER_RETRY_BACKOFF_SECONDS
+        # Bounded: when Appwrite falls behind, producers wait in enqueue() (backpressure)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffer or settings.WRITER_MAX_BUFFER)
+        self._task: Optional[asyncio.Task] = None
+        self._sync_task: Optional[asyncio.Task] = None
+
+        # Counters exposed for monitoring
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.retries = 0
+        self.dropped = 0
+        self.deferred = 0  # Left pending in the local store for the replay task
+        self.replayed = 0
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        if self.store is not None and (self._sync_task is None or self._sync_task.done()):
+            self._sync_task = asyncio.create_task(self._sync_loop())
+
+    async def enqueue(self, document_id: str, data: Dict[str, Any]):
+        # Blocks only while the buffer is full
+        await self._queue.put((document_id, data))
+        self.enqueued += 1
+
+    async def close(self):
+        # Flushes everything still buffered, then stops the background task
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            await asyncio.gather(self._sync_task, return_exceptions=True)
+            self._sync_task = None
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                await self._flush(batch)
+            except Exception as e:
+                self.dropped += len(batch)
+                logger.exception(f"Writer: Unexpected error flushing {len(batch)} observations: {e}")
+
+        # Drain whatever was enqueued before the stop signal
+        remaining = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                remaining.append(item)
+        for start in range(0, len(remaining), self.batch_size):
+            await self._flush(remaining[start:start + self.batch_size])
+
+    async def _flush(self, batch: List[Tuple[str, Dict[str, Any]]]):
+        pending = batch
+        for attempt in range(self.max_retries + 1):
+            pending = await self._write_batch(pending, attempt == 0)
+            if not pending:
+                break
+            if attempt < self.max_retries:
+                self.retries += 1
+                # Exponential backoff with full jitter
+                await asyncio.sleep(random.uniform(0, self.retry_backoff * (2 ** attempt)))
+        self.batches += 1
+        self.written += len(batch) - len(pending)
+        if pending and self.store is not None:
+            self.deferred += len(pending)
+            logger.warning(f"Writer: Deferred {len(pending)} observations to the local replay queue.")
+        elif pending:
+            self.dropped += len(pending)
+            logger.error(f"Writer: Dropped {len(pending)} observations after {self.max_retries} retries.")
+
+    async def _write_batch(self, batch: List[Tuple[str, Dict[str, Any]]], first_attempt: bool) -> List[Tuple[str, Dict[str, Any]]]:
+        # Write-ahead to the local store (in a worker thread), then Appwrite
+        if self.store is not None and first_attempt:
+            await run_in_threadpool(self.store.append, self.collection_id, batch)
+        failed = await self.appwrite.create_documents(self.collection_id, batch)
+        if self.store is not None:
+            failed_ids = {document_id for document_id, _ in failed}
+            await run_in_threadpool(self._settle, [document_id for document_id, _ in batch if document_id not in failed_ids], list(failed_ids))
+        return failed
+
+    def _settle(self, synced_ids: List[str], failed_ids: List[str]):
+        self.store.mark_synced(synced_ids)
+        self.store.mark_failed(failed_ids)
+
+    async def _sync_loop(self):
+        # Replays rows still pending in the local store and prunes old synced rows
+        while True:
+            await asyncio.sleep(settings.LOCAL_STORE_SYNC_INTERVAL_SECONDS)
+            try:
+                await self.replay_pending()
+                await run_in_threadpool(self.store.prune, settings.LOCAL_STORE_RETENTION_HOURS * 3600)
+            except Exception as e:
+                logger.warning(f"Writer: Local store sync failed: {e}")
+
+    async def replay_pending(self) -> int:
+        # Sends pending local rows to Appwrite, one batch per loop until none are left or a batch fails.
+        # Rows younger than the grace period may still be in an in-flight flush and are skipped.
+        replayed = 0
+        while True:
+            rows = await run_in_threadpool(self.store.pending, settings.LOCAL_STORE_SYNC_GRACE_SECONDS, self.batch_size)
+            if not rows:
+                return replayed
+            by_collection: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+            for document_id, collection_id, data in rows:
+                by_collection.setdefault(collection_id, []).append((document_id, data))
+            failed_total = 0
+            for collection_id, documents in by_collection.items():
+                failed = await self.appwrite.create_documents(collection_id, documents)
+                failed_ids = {document_id for document_id, _ in failed}
+                await run_in_threadpool(self._settle, [d for d, _ in documents if d not in failed_ids], list(failed_ids))
+                replayed += len(documents) - len(failed)
+                self.replayed += len(documents) - len(failed)
+                failed_total += len(failed)
+            if failed_total:
+                return replayed  # Appwrite still unhealthy; try again next interval
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": self._queue.qsize(),
+            "capacity": self._queue.maxsize,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "batches": self.batches,
+            "retries": self.retries,
+            "dropped": self.dropped,
+            "deferred": self.deferred,
+            "replayed": self.replayed,
+            "local_store": self.store.counts() if self.store is not None else None,
+        }
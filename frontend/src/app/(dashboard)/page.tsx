@@ -2,8 +2,11 @@
 
 import { WeatherCard } from "@/components/weather-card"
 import { WeatherHistory } from "@/components/weather-history"
+import { useWeatherStream } from "@/lib/weather-stream"
 
 export default function DashboardPage() {
+  useWeatherStream()
+
   return (
     <div className="space-y-6">
       <div className="flex items-center justify-between">
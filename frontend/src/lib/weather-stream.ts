@@ -0,0 +1,27 @@
+// Em lib/weather-stream.ts
+import { useEffect } from "react";
+import { mutate } from "swr";
+import { CurrentWeatherDataResponse } from "../types/weather";
+
+const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000/api";
+
+// Assina o stream SSE do backend e atualiza o cache SWR 'currentWeather' a cada nova leitura.
+// O EventSource reconecta sozinho (enviando Last-Event-ID); o refreshInterval dos componentes
+// continua como fallback caso o stream não esteja disponível.
+export function useWeatherStream() {
+  useEffect(() => {
+    if (typeof window === "undefined" || !("EventSource" in window)) return;
+
+    const source = new EventSource(`${API_BASE_URL}/weather/stream`);
+    source.addEventListener("weather", (event) => {
+      try {
+        const data = JSON.parse((event as MessageEvent).data) as CurrentWeatherDataResponse;
+        mutate("currentWeather", { ...data, recommendations: data.recommendations || [] }, false);
+      } catch (error) {
+        console.error("Error parsing weather stream event:", error);
+      }
+    });
+
+    return () => source.close();
+  }, []);
+}